@@ -0,0 +1,257 @@
+"""
+Audio pack
+
+This module puts a whole set of audio clips in one file, so a voice set ships, opens and is read as a single file
+instead of thousands of small ones (no directory scans, one open() and one inode for every clip).
+
+Format (little-endian):
+    - header: MAGIC, FORMAT_VERSION, number of clips
+    - index: per clip its offset and length in the file, the sha256 of its bytes, its key (the file name it had)
+      and its flags (CHOSEN: the clip its stem resolves to)
+    - the clip bytes. Clips with the same content are stored once.
+
+    - 'build()' packs the .mp3/.wav files of an audio directory (clips the audio manifest lists as superseded are left out).
+      Of the clips sharing a stem (the name up to the first dot), the one the manifest records for it is CHOSEN,
+      or else the newest.
+    - 'AudioPack' maps a pack into memory and reads the index once: 'view()' returns the bytes of a clip (or of a range of
+      them) straight from the mapping, 'find()' the key of the CHOSEN clip of a stem.
+    - 'shared()' opens a pack once per process; a missing pack is None.
+
+Run from the directory of this file:
+    python audio_pack.py build audio_repr audio.pack
+    python audio_pack.py list audio.pack
+    python audio_pack.py verify audio.pack
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'EPTAUDIO'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sII')
+ENTRY = struct.Struct('<QQ32sHB')
+CHOSEN = 1
+EXTENSIONS = ('.mp3', '.wav')
+MANIFEST_NAME = '.manifest.json'
+
+
+class PackError(ValueError):
+    pass
+
+
+class PackEntry:
+    __slots__ = ('key', 'offset', 'length', 'digest', 'flags')
+
+    def __init__(self, key, offset, length, digest, flags = 0):
+        self.key = key
+        self.offset = offset
+        self.length = length
+        self.digest = digest
+        self.flags = flags
+
+    @property
+    def etag(self):
+        return f'"{self.digest.hex()[:16]}"'
+
+
+def stem(key):
+    return key.split('.', 1)[0]
+
+
+class AudioPack:
+    """A pack mapped read-only into memory, with its index in a dict."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            try:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise PackError(f'{self.path} is empty') from None
+        try:
+            self.entries = self.read_index()
+        except (PackError, struct.error, UnicodeDecodeError) as e:
+            self.map.close()
+            raise PackError(f'{self.path} is not a valid audio pack: {e}') from None
+        self.stems = {stem(key): key for key, entry in self.entries.items() if entry.flags & CHOSEN}
+
+    def read_index(self):
+        magic, version, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise PackError('bad magic')
+        if version != FORMAT_VERSION:
+            raise PackError(f'format version {version}, expected {FORMAT_VERSION}')
+        entries = {}
+        position = HEADER.size
+        for _ in range(count):
+            offset, length, digest, key_length, flags = ENTRY.unpack_from(self.map, position)
+            position += ENTRY.size
+            key = bytes(self.map[position:position + key_length]).decode('utf-8')
+            position += key_length
+            if offset + length > len(self.map):
+                raise PackError(f'{key} runs past the end of the file')
+            entries[key] = PackEntry(key, offset, length, digest, flags)
+        return entries
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return self.entries.keys()
+
+    def entry(self, key):
+        return self.entries.get(key)
+
+    def find(self, clip_stem):
+        """Key of the clip '<clip_stem>.<...>' chosen when the pack was built, None if the pack has none."""
+        return self.stems.get(clip_stem)
+
+    def view(self, key, start = 0, end = None):
+        """Memoryview of the bytes 'start' to 'end' (exclusive, default: the end) of clip 'key'."""
+        entry = self.entries[key]
+        end = entry.length if end is None else min(end, entry.length)
+        return memoryview(self.map)[entry.offset + start:entry.offset + end]
+
+    def read(self, key):
+        return bytes(self.view(key))
+
+    def verify(self):
+        """Keys of the clips whose bytes don't match their hash."""
+        return [key for key, entry in self.entries.items()
+                if hashlib.sha256(self.view(key)).digest() != entry.digest]
+
+    def close(self):
+        self.map.close()
+
+
+_packs = {}
+_lock = threading.Lock()
+
+
+def shared(path):
+    """The pack at 'path', opened once for the whole process; None if there is no (valid) pack there."""
+    path = Path(path)
+    with _lock:
+        if path not in _packs:
+            try:
+                _packs[path] = AudioPack(path)
+                logger.info(f'Audio pack {path} opened ({len(_packs[path])} clips)')
+            except FileNotFoundError:
+                _packs[path] = None
+            except (OSError, PackError) as e:
+                logger.error(f'Audio pack unusable, clips will be looked for elsewhere -> {e}')
+                _packs[path] = None
+        return _packs[path]
+
+
+def read_manifest(directory):
+    try:
+        return json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def superseded(directory):
+    """Files the audio manifest of 'directory' lists as replaced by a processed clip."""
+    return {entry['source_file'] for entry in read_manifest(directory).values()
+            if entry.get('source_file') and entry['source_file'] != entry.get('file')}
+
+
+def chosen(directory, paths):
+    """Names of the clips each stem resolves to: the file the audio manifest records for it, else the newest one."""
+    choice = {}
+    for path in sorted(paths, key=lambda path: (path.stat().st_mtime, path.name)):
+        choice[stem(path.name)] = path.name
+    names = {path.name for path in paths}
+    for clip_stem, entry in read_manifest(directory).items():
+        if entry.get('file') in names and stem(entry['file']) == clip_stem:
+            choice[clip_stem] = entry['file']
+    return set(choice.values())
+
+
+def clips(directory):
+    skip = superseded(directory)
+    return sorted(path for path in Path(directory).iterdir()
+                  if path.suffix in EXTENSIONS and not path.name.startswith('.') and path.name not in skip
+                  and path.is_file())
+
+
+def build(directory, out):
+    """Pack the clips of 'directory' into the file 'out'. Return the number of clips and of bytes of clip data."""
+    sources = {}  # digest: (first file with that content, its size)
+    index = []
+    paths = clips(directory)
+    choice = chosen(directory, paths)
+    for path in paths:
+        content = path.read_bytes()
+        digest = hashlib.sha256(content).digest()
+        sources.setdefault(digest, (path, len(content)))
+        index.append((path.name.encode('utf-8'), digest, CHOSEN if path.name in choice else 0))
+
+    offset = HEADER.size + sum(ENTRY.size + len(key) for key, _, _ in index)
+    offsets = {}
+    for digest, (_, size) in sources.items():
+        offsets[digest] = offset
+        offset += size
+
+    out = Path(out)
+    temporary = out.with_name(f'.{out.name}.tmp')
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index)))
+        for key, digest, flags in index:
+            f.write(ENTRY.pack(offsets[digest], sources[digest][1], digest, len(key), flags))
+            f.write(key)
+        for path, _ in sources.values():
+            f.write(path.read_bytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, out)
+    return {'clips': len(index), 'stored': len(sources), 'bytes': sum(size for _, size in sources.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='pack the clips of a directory')
+    build_parser.add_argument('directory')
+    build_parser.add_argument('out')
+    commands.add_parser('list', help='list the clips of a pack').add_argument('pack')
+    commands.add_parser('verify', help='check every clip against its hash').add_argument('pack')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        report = build(args.directory, args.out)
+        print(f"{report['clips']} clips ({report['stored']} distinct, {report['bytes']} bytes) packed into {args.out}")
+        return
+    try:
+        pack = AudioPack(args.pack)
+    except (OSError, PackError) as e:
+        sys.exit(str(e))
+    if args.command == 'list':
+        for key, entry in sorted(pack.entries.items()):
+            print(f"{entry.length:>10}  {entry.digest.hex()[:12]}  {'*' if entry.flags & CHOSEN else ' '} {key}")
+    else:
+        damaged = pack.verify()
+        for key in damaged:
+            print(f'damaged: {key}')
+        print(f'{len(pack)} clips, {len(damaged)} damaged')
+        sys.exit(1 if damaged else 0)
+
+
+if __name__ == '__main__':
+    main()
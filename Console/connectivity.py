@@ -0,0 +1,112 @@
+"""
+Connectivity module
+
+This module provides 'ConnectivityMonitor', which keeps track of whether the Free Dictionary API can be reached.
+Probes run in a background thread every 'ttl' seconds, so asking for the state never waits on the network:
+only the very first call waits, at most for one probe timeout.
+The API host itself is probed rather than a third-party site, since it is the only server the app talks to.
+Listeners registered with 'add_listener()' are called from the monitor thread whenever the state changes.
+
+Dependencies:
+    requests
+"""
+
+import logging
+import threading
+import time
+from lazy_import import lazy_import
+
+requests = lazy_import('requests')
+
+
+logger = logging.getLogger(__name__)
+
+PROBE_URL = 'https://api.dictionaryapi.dev'
+PROBE_TIMEOUT = 3
+TTL = 30
+
+
+class ConnectivityMonitor:
+    """Cached, background-refreshed internet connection state.
+
+    Args:
+        url (str): URL probed with a HEAD request. Any HTTP response counts as online.
+        ttl (float): Seconds after which the cached state is refreshed.
+        timeout (float): Timeout of each probe.
+    """
+
+    def __init__(self, url = PROBE_URL, ttl = TTL, timeout = PROBE_TIMEOUT):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.state = None
+        self.checked_at = 0.0
+        self.listeners = []
+        self.thread = None
+        self.ready = threading.Event()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, name='connectivity', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(self.timeout + 1)
+
+    def add_listener(self, callback):
+        """Call 'callback(is_online)' every time the state changes."""
+        self.listeners.append(callback)
+
+    def is_online(self):
+        """Return the last known state and schedule a refresh if it is older than 'ttl'.
+
+        Returns:
+            bool: True if the last probe reached the API, False if not (or if the first probe timed out).
+        """
+        if not self.ready.is_set():
+            self.start()
+            self.ready.wait(self.timeout + 1)
+        if time.monotonic() - self.checked_at > self.ttl:
+            self.wake.set()
+        return bool(self.state)
+
+    def probe(self):
+        try:
+            requests.head(self.url, timeout=self.timeout)
+            online = True
+        except requests.RequestException:
+            online = False
+        self.update(online)
+        return online
+
+    def update(self, online):
+        previous, self.state = self.state, online
+        self.checked_at = time.monotonic()
+        self.ready.set()
+        if previous == online:
+            return
+        logger.info('Accessed internet connection' if online else 'No internet connection')
+        if previous is None:
+            return
+        for callback in self.listeners:
+            try:
+                callback(online)
+            except Exception:
+                logger.exception('Connectivity listener failed')
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.probe()
+            self.wake.wait(self.ttl)
+            self.wake.clear()
@@ -0,0 +1,38 @@
+"""
+Lazy import module
+
+This module provides 'lazy_import()', which returns a stand-in for a module that is only imported when one of its attributes is first used.
+Heavy dependencies ('requests' pulls in urllib3, certifi, ssl...) are only needed once the app goes online,
+so importing them this way keeps them out of startup.
+
+The stand-in forwards every attribute to the real module, so 'patch("phoneme_api.requests.get")' keeps working in the tests.
+Exceptions must be referenced through it ('except requests.RequestException'),
+since 'from requests.exceptions import ...' would import the module straight away.
+importlib's LazyLoader is not used on purpose: importing a submodule of a package it hasn't loaded yet
+executes that submodule twice, and 'requests.RequestException' would then not catch 'requests.exceptions.RequestException'.
+"""
+
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self._name), attribute)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}>'
+
+
+def lazy_import(name):
+    """Return a stand-in for module 'name', imported on first attribute access.
+
+    Args:
+        name (str): Absolute name of the module.
+
+    Returns:
+        LazyModule: Object forwarding attribute access to the module.
+    """
+    return LazyModule(name)
@@ -5,22 +5,22 @@ This module configures logging for the project.
 Since it is small and handled by me, the lowest level is intentionally set to logging.INFO.
 
 encoding='utf-8' is included in the handler to make sure the logger correctly handles the phonetic symbols in the project.
+Nothing happens on import: the entry point calls 'activate_handler()' when the app starts,
+so importing a module (in the tests, the benchmarks or a one-off script) never creates log_file.log.
 """
 
 import logging 
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 def activate_handler(file = 'log_file.log'):
+    if any(isinstance(handler, logging.FileHandler) for handler in logger.handlers):
+        return
+    logger.setLevel(logging.INFO)
     handler = logging.FileHandler(file, encoding='utf-8')
     handler.setLevel(logging.INFO)
     
     formatter = logging.Formatter('%(asctime)s - %(filename)s - %(levelname)s - %(message)s')
     handler.setFormatter(formatter)
     
-    logger.addHandler(handler)
-    
-    
-if not logger.handlers:
-    activate_handler()
\ No newline at end of file
+    logger.addHandler(handler)
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Lookup cache
+
+This module keeps what the Free Dictionary API answers for a word on disk, so a word is looked up once and
+everything in its entries (the IPA in 'phonetics[].text', every audio URL, the definitions) is available afterwards
+without another call.
+    - Entries are stored content-addressed: their canonical JSON, compressed, keyed by its sha256, and each word
+      points to a hash. The same entries fetched again, or shared by two words, are stored once.
+    - A lookup is fresh for TTL seconds (NEGATIVE_TTL for a word the API doesn't know). A stale one is revalidated
+      with the ETag/Last-Modified the API sent with it ('validators()'); a 304 only renews it ('renew()').
+    - A stale lookup can still be used when the API can't be reached.
+The same file is used by the Console and the Web app; it only needs the standard library.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+
+
+TTL = 30 * 24 * 3600
+NEGATIVE_TTL = 24 * 3600
+
+SCHEMA = ('''CREATE TABLE IF NOT EXISTS entries (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL
+) WITHOUT ROWID''',
+'''CREATE TABLE IF NOT EXISTS lookups (
+    word TEXT PRIMARY KEY,
+    hash TEXT,
+    fetched_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+) WITHOUT ROWID''')
+
+
+class Lookup:
+    """A cached lookup. 'entries' is the parsed JSON list the API returned, None if it didn't know the word."""
+    __slots__ = ('word', 'entries', 'hash', 'fetched_at', 'etag', 'last_modified')
+
+    def __init__(self, word, entries, hash, fetched_at, etag = None, last_modified = None):
+        self.word = word
+        self.entries = entries
+        self.hash = hash
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def found(self):
+        return self.entries is not None
+
+    def fresh(self, now = None):
+        ttl = TTL if self.found else NEGATIVE_TTL
+        return (now or time.time()) - self.fetched_at < ttl
+
+
+_ready = set()  # databases already in WAL mode with their tables created
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=10)
+    if path not in _ready:
+        db.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            db.execute(statement)
+        _ready.add(path)
+    return db
+
+
+def canonical(entries):
+    return json.dumps(entries, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode()
+
+
+def get(path, word):
+    """Return the cached 'Lookup' of 'word', fresh or not, or None if it was never looked up."""
+    with closing(connect(path)) as db:
+        row = db.execute('SELECT l.hash, l.fetched_at, l.etag, l.last_modified, e.body FROM lookups l '
+                         'LEFT JOIN entries e ON e.hash = l.hash WHERE l.word = ?', (word,)).fetchone()
+    if row is None:
+        return None
+    hash, fetched_at, etag, last_modified, body = row
+    if hash is not None and body is None:  # entries lost: as good as never looked up
+        return None
+    entries = json.loads(zlib.decompress(body)) if body is not None else None
+    return Lookup(word, entries, hash, fetched_at, etag, last_modified)
+
+
+def store(path, word, entries, etag = None, last_modified = None):
+    """Cache the 'entries' the API returned for 'word' (None: the API doesn't know it) and return the 'Lookup'."""
+    hash = None
+    now = time.time()
+    with closing(connect(path)) as db, db:
+        if entries is not None:
+            body = canonical(entries)
+            hash = hashlib.sha256(body).hexdigest()
+            db.execute('INSERT OR IGNORE INTO entries (hash, body) VALUES (?, ?)', (hash, zlib.compress(body)))
+        previous = db.execute('SELECT hash FROM lookups WHERE word = ?', (word,)).fetchone()
+        db.execute('INSERT OR REPLACE INTO lookups (word, hash, fetched_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)',
+                   (word, hash, now, etag, last_modified))
+        if previous and previous[0] not in (None, hash):
+            db.execute('DELETE FROM entries WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM lookups WHERE hash = ?)',
+                       (previous[0], previous[0]))
+    return Lookup(word, entries, hash, now, etag, last_modified)
+
+
+def renew(path, lookup):
+    """Mark 'lookup' as fetched now (the API answered 304 Not Modified) and return it."""
+    lookup.fetched_at = time.time()
+    with closing(connect(path)) as db, db:
+        db.execute('UPDATE lookups SET fetched_at = ? WHERE word = ?', (lookup.fetched_at, lookup.word))
+    return lookup
+
+
+def validators(lookup):
+    """Headers making a request conditional on 'lookup' having changed."""
+    headers = {}
+    if lookup.etag:
+        headers['If-None-Match'] = lookup.etag
+    if lookup.last_modified:
+        headers['If-Modified-Since'] = lookup.last_modified
+    return headers
+
+
+def ipa(entries):
+    """The phonetic transcriptions in 'entries', in order and without repetitions."""
+    texts = []
+    for entry in entries or []:
+        for phonetics_block in entry.get('phonetics', []):
+            text = phonetics_block.get('text')
+            if text and text not in texts:
+                texts.append(text)
+    return texts
@@ -6,7 +6,7 @@ spelling-pronunciation patterns of English phonemes(=sounds).
 
 Overview:
     1.Requires previous technical knowledge of pronunciation and it is based on Standard BRITISH ENGLISH.
-    2.Checks for an internet connection:
+    2.Checks for an internet connection in the background (see 'connectivity.py'):
         -Plays audio retrieved through the Free Dictionary API if online.
         -Marks audio 'offline' and continues.
         -Updates audio status when the connection is restored.
@@ -16,7 +16,7 @@ Overview:
     6.Drills homophones.
 
 Features:
-    1.Progress is saved to a JSON file for future review and to avoid repetition.
+    1.Progress is saved to a JSON file for future review and to avoid repetition (once per run, atomically, see 'progress.py').
     2.Only 1 new phoneme can be studied per session to promote gradual learning.
     3.Compulsory review of previously studied phonemes at the beginning of each session.
     3.The dictionary 'phonemes' and all its content are manually curated to ensure accuracy.
@@ -29,17 +29,23 @@ Dependencies:
 
 Modules:
 1. main : core exercises and review. 
-2. phoneme_api : handling of the Free Dictionary API to reproduce the sound of phonemes if available. """
+2. phoneme_api : handling of the Free Dictionary API to reproduce the sound of phonemes if available. 
+3. connectivity : background monitor of the internet connection. 
+4. player : non-blocking audio playback, so prompts never wait for a clip to end. 
+5. progress : batched, atomic and journaled persistence of the progress. 
+6. phonemes_dict : the curated content, loaded from cached bytecode. 
+7. lazy_import : 'requests' and 'playsound' are only loaded when first needed, so an offline review starts faster. """
 
 import random
-from phoneme_api import get_phoneme
-import json
+from phoneme_api import get_phoneme, AUDIO_PACK
 import time
 from pathlib import Path
 import log_file
 import logging
-from playsound import playsound
-import requests
+from connectivity import ConnectivityMonitor
+from player import AudioPlayer
+from progress import ProgressSession
+from phonemes_dict import phonemes
 
 logger = logging.getLogger(__name__)
 
@@ -47,130 +53,77 @@ DATA_DIR = Path.home() / ".english_pronunciation_trainer"
 
 file_path = DATA_DIR / "progress.json"
 
-phonemes = {
-    '/ɔ:/': {
-        'patterns': {
-            'aw': ('saw', 'yawn', 'draw'),
-            'ore': ('core', 'snore', 'before'),
-            'oar': ('board', 'coarse', 'soar'),
-            'or': ('port', 'absorb', 'corn'),
-            'au': ('august', 'autumn', 'flaunt'),
-            'oor': ('door', 'floor', 'poor'),
-            'our': ('mourn', 'pour', 'four'),
-            'war': ('war', 'award', 'swarm'),
-        },
-        'spelling': {
-            "/'ɔ:də/": ('order', 'aurder', 'awder'),
-            "/'kɔ:ʃən/": ('caution', 'courtion', 'coretion'),
-            '/wɔ:d/': ('ward', 'word', 'woard'),
-            '/lɔ:ntʃ/': ('launch', 'lunch', 'lawnch'),
-            '/dɔ:n/': ('dawn', 'down', 'daun'),
-            '/dʒɔ:/': ('jaw', 'jore', 'joor'),
-            "/dɪ'vɔ:s/": ('divorce', 'divauce', 'divawrce'),
-            "/ə'fɔ:d/": ('afford', 'affawd', 'affaud'),
-            '/stɔ:/': ('store', 'stoar', 'stour'),
-            '/swɔ:/': ('swore', 'swar', 'swor'),
-        },
-        'homophones': {
-            '/ɔ:/': {'or', 'oar', 'awe', 'ore'},
-            '/sɔ:/': {'saw', 'sore', 'soar'},
-            '/bɔ:d/': {'bored', 'board'},
-            '/flɔ:/': {'floor', 'flaw'},
-            '/ʃɔ:/': {'shore', 'sure'},
-            '/pɔ:/': {'poor', 'paw', 'pore', 'pour'},
-            '/sɔ:s/': {'sauce', 'source'},
-            "/'mɔ:nɪŋ/": {'morning', 'mourning'},
-            '/stɔ:k/': {'stalk', 'stork'},
-            '/wɔ:/': {'war', 'wore'},
-        },
-        'api': 'or'
-    },
-    '/ɜ:/': {
-        'patterns': {
-            'er + con': ('alert', 'deserve', 'universe'),
-            'ir + con': ('girl', 'third', 'dirt'),
-            'wor + con': ('word', 'work', 'worse'),
-            'ur + con': ('curl', 'burden', 'lurk'),
-            'ear + con': ('pearl', 'hearse', 'learn'),
-        },
-        'spelling': {
-            '/wɜ:m/': ('worm', 'warm', 'werm'),
-            '/ʃɜ:t/': ('shirt', 'shert', 'short'),
-            '/bɜ:st/': ('burst', 'birst', 'berst'),
-            '/pɜ:k/': ('perk', 'purk', 'pirk'),
-            '/fɜ:m/': ('firm', 'furm', 'ferm'),
-        },
-        'homophones': {
-            '/hɜ:d/': {'heard', 'herd'},
-            '/fɜ:/': {'fir', 'fur'},
-            '/wɜ:d/': {'word', 'whirred'},
-            '/kɜ:b/': {'kerb', 'curb'},
-        },
-        'api': 'err'
-    },
-    '/eə/': {
-        'patterns': {
-            'are': ('care', 'stare', 'ware'),
-            'air': ('affair', 'chair', 'repair'),
-            'ear': ('swear', 'pear', 'bear'),
-        },
-        'spelling': {
-            '/leə/': ('lair', 'lare', 'lere'),
-            '/preə/': ('prayer', 'prarre', 'prair'),
-            "/ˌvedʒə'teəriən/": ('vegetarian', 'vegetearian', 'vegetairian'),
-            "/'peərənt/": ('parent', 'pairent', 'perent'),
-            "/'veəri/": ('vary', 'very', 'veary'),
-        },
-        'homophones': {
-            '/feə/': {'fair', 'fare'},
-            '/peə/': {'pare', 'pair', 'pear'},
-            '/heə/': {'hair', 'hare'},
-            '/steə/': {'stare', 'stair'},
-            '/fleə/': {'flair', 'flare'},
-        },
-        'api': 'air'
-    },
-    '/i:/': {
-        'patterns': {
-            'ee': ('green', 'proceed', 'tree'),
-            'ie': ('believe', 'grief', 'priest'),
-            'ea': ('each', 'bleak', 'dream'),
-            'e.e': ('complete', 'phoneme', 'theme'),
-            'i.e': ('police', 'prestige', 'unique'),
-        },
-        'spelling': {
-            '/tʃi:t/': ('cheat', 'cheet', 'chete'),
-            "/ə'tʃi:v/": ('achieve', 'acheive', 'achive'),
-            '/fli:t/': ('fleet', 'fleat', 'fliet'),
-            "/kən'si:t/": ('conceit', 'conciet', 'concete'),
-            '/pli:/': ('plea', 'plee', 'ply'),
-        },
-        'homophones': {
-            '/si:/': {'sea', 'see'},
-            '/pi:/': {'pea', 'pee'},
-            '/bi:t/': {'beet', 'beat'},
-            '/bi:/': {'bee', 'be'},
-            '/ri:d/':{'read', 'reed'},
-            '/si:m/': {'seam', 'seem'},
-            '/fli:/': {'flee', 'flea'},
-        },
-        'api': 'e'
-    }
-}
+monitor = ConnectivityMonitor()
+
+player = AudioPlayer(pack = AUDIO_PACK)
+
+session = ProgressSession(file_path)
+
+notice = None  # set by 'connectivity_changed()' in the monitor thread, printed by 'ask()' at the next prompt
+
 
 def online():
     """Checks for an internet connection as it affects how the app behaves. 
+    
+    The state is cached and refreshed by the background 'monitor', so this never waits on the network
+    (except the very first call of a run, for at most one probe).
 
     Returns:
         bool: True if connection exists, False if not.
     """
-    try:
-        requests.head("https://www.google.com", timeout=3)
-        logger.info('Accessed internet connection')
-        return True
-    except requests.RequestException:
-        logger.error('No internet connection')
-        return False
+    return monitor.is_online()
+
+
+def connectivity_changed(is_online):
+    """Listener of 'monitor', called from its thread: only keep a notice for the next prompt.
+    
+    Printing here would cut into whatever the exercise is printing; the audio itself follows 'online()',
+    which 'learn()', 'review()' and 'update_audio()' read before fetching anything.
+
+    Args:
+        is_online (bool): New state of the connection.
+    """
+    global notice
+    if is_online:
+        notice = '(Back online: audio is available again)'
+    else:
+        notice = '(Connection lost: audio will be marked offline)'
+
+
+def ask(prompt):
+    """'input()', telling the user first if the connection dropped or came back since the last prompt.
+
+    Args:
+        prompt (str): Prompt passed to 'input()'.
+
+    Returns:
+        str: What the user typed.
+    """
+    global notice
+    message, notice = notice, None
+    if message:
+        print(message)
+    return input(prompt)
+
+
+def fetch_audio(phoneme):
+    """Download the audio of 'phoneme' through 'get_phoneme()' unless the connection is down.
+
+    Args:
+        phoneme (str): Phoneme whose audio is needed.
+
+    Returns:
+        str | None:
+            - Path to downloaded file if available.
+            - 'offline' if there is no internet connection, or it dropped during the download: it is fetched again later.
+            - None if audio is unavailable or an error occurred.
+    """
+    if not online():
+        return 'offline'
+    audio = get_phoneme(phonemes[phoneme]['api'])
+    if not audio and not online():
+        return 'offline'
+    return audio
     
         
 def learn(phoneme):
@@ -187,16 +140,14 @@ def learn(phoneme):
     """
 
     print(f'New phoneme = {phoneme}\n')
-    if online():
-        audio = get_phoneme(phonemes[phoneme]['api'])
-        if audio:
-            playsound(audio)
-            logger.info(f'Successful reproduction of {phoneme}')
-        else:
-            print('Audio unavailable\n')
-    else:
-        audio = 'offline'
+    audio = fetch_audio(phoneme)
+    if audio == 'offline':
         logger.info(f"learn() returns 'offline'")
+    elif audio:
+        player.play(audio)
+        logger.info(f'Successful reproduction of {phoneme}')
+    else:
+        print('Audio unavailable\n')
     print('The most common spelling patterns for this phoneme are: \n')
 
     for pattern, example in phonemes[phoneme]['patterns'].items():
@@ -217,11 +168,11 @@ def spell(phoneme, audio):
     """
     if audio and audio != 'offline':
         while True:
-            ask = input('Do you want to listen to the phoneme one more time before we start? (y/n): ').lower().strip()
-            if ask == 'y':
-                playsound(audio)
+            choice = ask('Do you want to listen to the phoneme one more time before we start? (y/n): ').lower().strip()
+            if choice == 'y':
+                player.play(audio)
                 break
-            elif ask == 'n':
+            elif choice == 'n':
                 break
             else:
                 print('Invalid entry. Only y/n')
@@ -263,7 +214,7 @@ def test_no_help(word, retry_list, phoneme):
     """
     attempts = 5
     while attempts > 0:
-        answer = input(f'{attempts}. ').lower().strip()
+        answer = ask(f'{attempts}. ').lower().strip()
         solution = phonemes[phoneme]['spelling'][word][0]
         if answer == solution:
             print('Yes!\n')
@@ -295,7 +246,7 @@ def test_with_help(word, phoneme):
     random.shuffle(options)
     print(', '.join(options))
     while attempts > 0:
-        answer = input(f'{attempts}. ').lower().strip()
+        answer = ask(f'{attempts}. ').lower().strip()
         if answer == solution:
             print('Yes!\n')
             return
@@ -337,7 +288,7 @@ def find_homs(homoph, all_spellings):
     attempts = 5
     full_len = len(all_spellings)
     while attempts > 0:
-        answer = input(f'{attempts}. ').lower().strip()
+        answer = ask(f'{attempts}. ').lower().strip()
         if not answer.isalpha():
             print('Only letters')
             continue
@@ -357,7 +308,9 @@ def find_homs(homoph, all_spellings):
     
     
 def save_progress(phoneme, seen, audio):
-    """Save phoneme studied to a JSON file for future review and to avoid repetition.
+    """Save phoneme studied for future review and to avoid repetition.
+    
+    The change is kept in memory and journaled: the JSON file is only rewritten once, by 'session.commit()' at the end of the run.
 
     Args:
         phoneme (str): Phoneme being studied.
@@ -367,30 +320,19 @@ def save_progress(phoneme, seen, audio):
             - 'offline' if there is no internet connection.
             - None if audio is unavailable or an error occurred.
     """
-    file_path.parent.mkdir(parents=True, exist_ok=True)
     seen[phoneme] = audio
-    data = {'Phonemes seen' : seen}
-    
-    with open(file_path, 'w') as f:
-        json.dump(data, f)
-        logger.info(f'{phoneme} successfully saved/updated to {file_path}')
+    session.record(phoneme, audio)
+    logger.info(f'{phoneme} successfully saved/updated')
 
        
 def load_progress():
-    """Look for JSON file with previously covered phonemes.
+    """Look for JSON file with previously covered phonemes, recovering the changes of an interrupted run.
 
     Returns:
         dict : Mapping of previously covered phonemes to their audio.
                Return an empty dictionary if the file doesn't exist. 
     """
-    try:
-        with open(file_path) as f:
-            data = json.load(f)
-            logger.info(f'English_Pronunciation_Trainer.json successfully loaded from {file_path}')
-            return data['Phonemes seen']
-    except FileNotFoundError:
-        logger.info('Empty dictionary created since English_Pronunciation_Trainer.json does not exist')
-        return {}
+    return session.load()
 
 
 def review(seen):
@@ -408,7 +350,7 @@ def review(seen):
             update_audio(phoneme, seen)
         else:
             print(f'-{phoneme}')
-            playsound(seen[phoneme])
+            player.play(seen[phoneme])
     print()        
     review_spell(seen)
     review_homophones(seen)
@@ -416,15 +358,20 @@ def review(seen):
                 
 def update_audio(phoneme, seen):
     """Update the real status of the audio for each phoneme in the JSON file if an internet connection is accessed.
+    
+    If the connection is lost again before the download, the audio stays 'offline' and is fetched at the next review.
 
     Args:
         phoneme (str): Previously covered phoneme.
         seen (dict): Mapping of previously covered phonemes to their audio.
     """
-    audio_sound = get_phoneme(phonemes[phoneme]['api'])
+    audio_sound = fetch_audio(phoneme)
+    if audio_sound == 'offline':
+        print(f'-{phoneme} : audio unavailable')
+        return
     if audio_sound:
         print(f'-{phoneme}')
-        playsound(audio_sound)  
+        player.play(audio_sound)  
     else:
         print(f'-{phoneme} : audio unavailable')
     save_progress(phoneme, seen, audio_sound)
@@ -507,13 +454,13 @@ def activities(seen):
             logger.info('Review ended and ending program as there are no new phonemes to study')
             return None
         
-        ask = input('Do you want to simply review old phonemes or learn a new one as well?  r = only review, l = review and learn: ').lower().strip()
-        if ask == 'r':
+        choice = ask('Do you want to simply review old phonemes or learn a new one as well?  r = only review, l = review and learn: ').lower().strip()
+        if choice == 'r':
             review(seen)
             print('End of review. See you soon!')
             logger.info('Ending program after review as requested by user')
             return None
-        if ask == 'l':
+        if choice == 'l':
             review(seen)
             print('End of review\n')
             if phonemes_pool:
@@ -534,6 +481,8 @@ def main():
     """
     
     logger.info('App successfully started')
+    monitor.add_listener(connectivity_changed)
+    monitor.start()
     print('Welcome to the English Pronunciation Trainer!\n')
     if not online():
         print('We are offline so the audio of new sounds can not be played\n')
@@ -562,9 +511,20 @@ def main():
     homophones(phoneme = phoneme)
     
     print('\nGreat work and see you soon!')
+    if audio == 'offline':
+        audio = fetch_audio(phoneme)
     save_progress(phoneme, seen, audio)
+    session.commit()
     logger.info(f'Session for {phoneme} ended')
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    log_file.activate_handler()
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('\nSession interrupted. Your progress so far has been saved.')
+        logger.info('Session interrupted by user')
+    finally:
+        session.commit()
+        player.close()
\ No newline at end of file
@@ -3,23 +3,33 @@ Phoneme API
 
 This module provides the function 'get_phoneme()' that fetches the audio reproduction of the given phoneme, 
 if available, from the Free Dictionary API.
-'download_audio()' downloads the audio into the local directory to reduce API calls.
+'download_audio()' downloads the audio into the local directory to reduce API calls; a clip of the audio pack counts
+as downloaded. API answers are kept in 'lookup_cache' (see 'lookup()').
 
 Dependencies:
     requests
 """
 
-import requests
-from requests.exceptions import RequestException
 from json import JSONDecodeError
 import logging
 from pathlib import Path
+from lazy_import import lazy_import
+import audio_pack
+import http_client
+import lookup_cache
+
+requests = lazy_import('requests')
 
 
 logger = logging.getLogger(__name__)
 
 AUDIO_DIR = Path(__file__).parent / 'audio_repr'
-AUDIO_DIR.mkdir(exist_ok = True)
+
+AUDIO_PACK = Path(__file__).parent / 'audio.pack'
+
+LOOKUP_DB = Path(__file__).parent / 'lookups.sqlite3'
+
+API_URL = 'https://api.dictionaryapi.dev/api/v2/entries/en/'
 
 
 def log_error_return(msg, e):
@@ -40,6 +50,47 @@ def log_error_return(msg, e):
     return None
 
 
+def lookup(word):
+    """Return the dictionary entries of 'word', from the lookup cache when they are fresh.
+    
+    A stale lookup is revalidated with a conditional request, and is still used if the API can't be reached.
+    A 404 from the API is cached too (for a shorter time), so a word it doesn't know isn't asked for again straight away.
+
+    Args:
+        word (str): Word to look up.
+
+    Returns:
+        list | None:
+            - Entries parsed from the JSON returned by the API.
+            - None if the API doesn't know the word.
+
+    Raises:
+        requests.RequestException, ValueError: The API failed and nothing is cached for 'word'.
+    """
+    cached = lookup_cache.get(LOOKUP_DB, word)
+    if cached and cached.fresh():
+        logger.info(f'Dictionary entry for {word} found in the lookup cache')
+        return cached.entries
+    
+    try:
+        response = http_client.get(f'{API_URL}{word}', headers = lookup_cache.validators(cached) if cached else None)
+        if cached and response.status_code == 304:
+            return lookup_cache.renew(LOOKUP_DB, cached).entries
+        if response.status_code == 404:
+            return lookup_cache.store(LOOKUP_DB, word, None).entries
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, list):
+            raise ValueError('Unexpected json format returned')
+    except (requests.RequestException, ValueError) as e:
+        if not cached:
+            raise
+        log_error_return(f'revalidating {word}, using the stale lookup', e)
+        return cached.entries
+    
+    return lookup_cache.store(LOOKUP_DB, word, data, response.headers.get('ETag'), response.headers.get('Last-Modified')).entries
+
+
 def get_uk_audio(data, phoneme):
     """Parse API JSON and return British English audio (.mp3 or .wav) if available. 
 
@@ -80,13 +131,14 @@ def download_audio(audio, phoneme):
     local_audio_file = AUDIO_DIR / f"{phoneme.replace('/', '')}.mp3"
     
     try:
-        get_audio_bytes = requests.get(audio, timeout = 5)
+        get_audio_bytes = http_client.get(audio)
         get_audio_bytes.raise_for_status()
+        AUDIO_DIR.mkdir(exist_ok = True)
         with open(local_audio_file, 'wb') as f:
             f.write(get_audio_bytes.content)
         logger.info(f'Successful download of audio for {phoneme} in {AUDIO_DIR}')
         return str(local_audio_file)
-    except RequestException as e:
+    except requests.RequestException as e:
         return log_error_return(f'Download error for {phoneme}', e)
 
 
@@ -98,7 +150,8 @@ def get_phoneme(phoneme):
     All exceptions related to the 'requests' module are caught as 'RequestException' for simplicity for the user,
     but all technical details are in 'log_file.py'.
     Only a JSON file is expected to be returned, so everything else is handled as an exception.
-    Since the maximum amount of calls to the API per run is only 2, requests.Session() is intentionally omitted as its overhead is not justified.
+    The JSON itself comes through 'lookup()', so only the first lesson of a word calls the API for it.
+    Calls go through 'http_client', whose session keeps the connection to the API open between words.
     if __name__ == '__main__' is intentionally omitted as this module is meant to be imported.
 
     Args:
@@ -113,12 +166,15 @@ def get_phoneme(phoneme):
         logger.info(f'Playing cached audio file for {phoneme}')
         return str(local_audio_file)
     
+    pack = audio_pack.shared(AUDIO_PACK)
+    if pack is not None and local_audio_file.name in pack:
+        logger.info(f'Playing packed audio for {phoneme}')
+        return str(local_audio_file)
+    
     try:
-        sound = requests.get(f'https://api.dictionaryapi.dev/api/v2/entries/en/{phoneme}', timeout=5)
-        sound.raise_for_status()
-        data = sound.json()
-        if not isinstance(data, list):
-            raise ValueError('Unexpected json format returned')
+        data = lookup(phoneme)
+        if data is None:
+            raise ValueError('Word not found in the dictionary')
         
         audio_online = get_uk_audio(data, phoneme)
         if not audio_online:
@@ -126,7 +182,7 @@ def get_phoneme(phoneme):
 
         local_audio_file = download_audio(audio_online, phoneme)    
         return local_audio_file
-    except (RequestException, ValueError) as e:
+    except (requests.RequestException, ValueError) as e:
         return log_error_return(f'for {phoneme}', e)
     except JSONDecodeError as e:
         return log_error_return(f'for {phoneme} -> Wrong file format: NOT JSON', e)
\ No newline at end of file
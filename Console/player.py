@@ -0,0 +1,173 @@
+"""
+Player module
+
+This module provides 'AudioPlayer', which plays the audio of phonemes without blocking the input loop.
+Clips are played one at a time by a worker thread fed through a command queue:
+    - play(path): queue a clip and remember it as the last one.
+    - replay(): queue the last clip again.
+    - stop(): drop every clip still waiting. The clip already playing can't be interrupted by playsound, so it finishes.
+    - warm(path): get a clip ready ahead of its first play.
+
+playsound only accepts a file path and opens it itself, so no clip is kept in memory here: warming reads the file
+through once, leaving it in the page cache of the OS, which is what makes 'listen again' start straight away.
+A clip that isn't on disk is looked for by its file name in the audio pack ('pack', see audio_pack.py);
+it is written once to a temporary directory for playsound (warming does this ahead of time), removed by 'close()'.
+
+Dependencies:
+    playsound
+"""
+
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import audio_pack
+
+
+logger = logging.getLogger(__name__)
+
+PLAY = 'play'
+WARM = 'warm'
+CHUNK_SIZE = 256 * 1024
+
+
+class AudioPlayer:
+    """Background audio player.
+
+    Args:
+        backend (callable, optional): Function playing a file path until it ends. Defaults to 'playsound'.
+        pack (Path, optional): Audio pack holding the clips missing from disk.
+    """
+
+    def __init__(self, backend = None, pack = None):
+        self.backend = backend
+        self.pack = pack
+        self.extracted = {}
+        self.extract_dir = None
+        self.commands = queue.Queue()
+        self.warmed = set()
+        self.last = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='audio-player', daemon=True)
+                self.thread.start()
+
+    def play(self, path):
+        """Queue 'path' for playback and return immediately."""
+        self.last = path
+        self.send(PLAY, path)
+
+    def replay(self):
+        """Queue the last clip played again. Return False if nothing was played yet."""
+        if self.last is None:
+            return False
+        self.send(PLAY, self.last)
+        return True
+
+    def warm(self, path):
+        self.send(WARM, path)
+
+    def stop(self):
+        """Drop every clip waiting to be played."""
+        dropped = 0
+        while True:
+            try:
+                command, path = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            if command == PLAY:
+                dropped += 1
+            self.commands.task_done()
+        if dropped:
+            logger.info(f'{dropped} queued clips dropped')
+
+    def wait(self):
+        """Block until every queued command has been carried out."""
+        if self.thread is not None:
+            self.commands.join()
+
+    def close(self):
+        """Drop the queued clips, let the current one finish and stop the worker."""
+        self.stop()
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.commands.put((None, None))
+            thread.join()
+        if self.extract_dir is not None:
+            shutil.rmtree(self.extract_dir, ignore_errors=True)
+            self.extract_dir = None
+            self.extracted.clear()
+
+    def send(self, command, path):
+        self.start()
+        self.commands.put((command, path))
+
+    def run(self):
+        while True:
+            command, path = self.commands.get()
+            try:
+                if command is None:
+                    return
+                if command == WARM:
+                    self.playable(path)
+                elif command == PLAY:
+                    playable = self.playable(path)
+                    if playable:
+                        self.play_file(playable)
+                        logger.info(f'Played {path}')
+            except Exception:
+                logger.exception(f'Playback of {path} failed')
+            finally:
+                self.commands.task_done()
+
+    def play_file(self, path):
+        if self.backend is None:
+            from playsound import playsound  #imported on the first clip, so offline sessions never load it
+            self.backend = playsound
+        self.backend(path)
+
+    def packed(self, path):
+        """Return the pack holding the clip of 'path' (by file name), or None."""
+        pack = audio_pack.shared(self.pack) if self.pack else None
+        if pack is not None and os.path.basename(path) in pack:
+            return pack
+        return None
+
+    def extract(self, path):
+        """Write the packed clip of 'path' to the temporary directory once and return where it is."""
+        if path not in self.extracted:
+            if self.extract_dir is None:
+                self.extract_dir = tempfile.mkdtemp(prefix='ept-audio-')
+            key = os.path.basename(path)
+            extracted = os.path.join(self.extract_dir, key)
+            with open(extracted, 'wb') as f:
+                f.write(self.packed(path).view(key))
+            self.extracted[path] = extracted
+        return self.extracted[path]
+
+    def playable(self, path):
+        """Return the file to give playsound for the clip of 'path', None if there is none.
+
+        A file on disk is read through the first time, so the OS has it cached; a packed clip is extracted.
+        """
+        if path in self.extracted:
+            return self.extracted[path]
+        try:
+            if path not in self.warmed:
+                with open(path, 'rb') as f:
+                    while f.read(CHUNK_SIZE):
+                        pass
+                self.warmed.add(path)
+            return path
+        except OSError:
+            if self.packed(path) is None:
+                logger.error(f'Audio file {path} unreadable')
+                return None
+            return self.extract(path)
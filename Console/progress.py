@@ -0,0 +1,107 @@
+"""
+Progress module
+
+This module provides 'ProgressSession', which owns the progress of a run.
+Changes are kept in memory and written to progress.json only once, by 'commit()', at the end of the run (or when it is interrupted):
+    - load(): read progress.json and replay the journal left by an interrupted run, if any.
+    - record(): update the progress in memory and append the change to the journal.
+      A journal line is tiny and fsynced, so a Ctrl-C (or a crash) right after it loses nothing.
+    - commit(): write progress.json to a temporary file and rename it over the old one, then delete the journal.
+      The rename is atomic, so progress.json is either the old or the new version, never half written.
+
+The JSON format of progress.json is unchanged: {'Phonemes seen': {phoneme: audio}}.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressSession:
+    """Progress of one run, persisted in batch.
+
+    Args:
+        path (Path): Location of progress.json. The journal sits next to it, with the '.journal' extension.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix('.journal')
+        self.seen = {}
+        self.dirty = False
+
+    def load(self):
+        """Load previously covered phonemes, including changes journaled by an interrupted run.
+
+        Returns:
+            dict: Mapping of previously covered phonemes to their audio. Empty if there is no progress yet.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.seen = json.load(f)['Phonemes seen']
+                logger.info(f'English_Pronunciation_Trainer.json successfully loaded from {self.path}')
+        except FileNotFoundError:
+            logger.info('Empty dictionary created since English_Pronunciation_Trainer.json does not exist')
+            self.seen = {}
+        except (json.JSONDecodeError, KeyError):
+            logger.exception('Progress file unreadable; starting fresh')
+            self.seen = {}
+
+        replayed = self.replay_journal()
+        if replayed:
+            logger.info(f'{replayed} changes recovered from {self.journal_path}')
+            self.dirty = True
+            self.commit()
+        return self.seen
+
+    def replay_journal(self):
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+
+        replayed = 0
+        for line in lines:
+            try:
+                change = json.loads(line)
+            except json.JSONDecodeError:
+                logger.error(f'Skipping truncated journal line in {self.journal_path}')
+                continue
+            self.seen[change['phoneme']] = change['audio']
+            replayed += 1
+        return replayed
+
+    def record(self, phoneme, audio):
+        """Record the audio of a phoneme in memory and in the journal.
+
+        Args:
+            phoneme (str): Phoneme studied or updated.
+            audio (str | None): Path to the audio file, 'offline' or None.
+        """
+        self.seen[phoneme] = audio
+        self.dirty = True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'phoneme': phoneme, 'audio': audio}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def commit(self):
+        """Write every recorded change to progress.json atomically. Do nothing if there is nothing new."""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'Phonemes seen': self.seen}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.journal_path.unlink(missing_ok=True)
+        self.dirty = False
+        logger.info(f'Progress successfully saved to {self.path}')
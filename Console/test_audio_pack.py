@@ -0,0 +1,140 @@
+"""
+Testing module for audio_pack.py
+
+Packs are built from clips written to a temporary directory, then read back.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import tempfile
+import json
+import os
+import time
+import logging
+from audio_pack import AudioPack, PackError, build, shared
+
+logging.getLogger('audio_pack').disabled = True
+
+
+class PackTest(unittest.TestCase):
+    """Base class building a pack of three clips, two of them with the same content"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.dir = Path(self.tempdir.name)
+        self.source = self.dir / 'audio_repr'
+        self.source.mkdir()
+        self.clips = {'or.mp3': b'or audio bytes', 'air.mp3': bytes(range(256)) * 4, 'oar.wav': b'or audio bytes'}
+        for name, content in self.clips.items():
+            (self.source / name).write_bytes(content)
+        (self.source / 'notes.txt').write_text('not a clip')
+        self.path = self.dir / 'audio.pack'
+
+    def open(self):
+        pack = AudioPack(self.path)
+        self.addCleanup(pack.close)
+        return pack
+
+
+
+class TestBuild(PackTest):
+    """Test what 'build()' puts in the pack"""
+
+    def test_clips_packed_and_read_back(self):
+        report = build(self.source, self.path)
+        pack = self.open()
+
+        self.assertEqual(report, {'clips': 3, 'stored': 2, 'bytes': len(self.clips['or.mp3']) + len(self.clips['air.mp3'])})
+        self.assertEqual(set(pack.keys()), set(self.clips))
+        for name, content in self.clips.items():
+            with self.subTest(name = name):
+                self.assertEqual(pack.read(name), content)
+        self.assertEqual(pack.entry('or.mp3').offset, pack.entry('oar.wav').offset)
+        self.assertEqual(pack.verify(), [])
+
+
+    def test_superseded_downloads_left_out(self):
+        (self.source / '.manifest.json').write_text(json.dumps(
+            {'or': {'file': 'or.mp3', 'source_file': 'oar.wav'}, 'air': {'file': 'air.mp3', 'source_file': 'air.mp3'}}))
+
+        build(self.source, self.path)
+
+        self.assertEqual(set(self.open().keys()), {'or.mp3', 'air.mp3'})
+
+
+    def test_stem_resolved_to_manifest_choice_or_newest(self):
+        for name, age in (('ear.0123456789ab.mp3', 60), ('ear.ba9876543210.mp3', 0), ('ear.ffffffffffff.wav', 30)):
+            (self.source / name).write_bytes(name.encode())
+            os.utime(self.source / name, (time.time() - age, time.time() - age))
+        build(self.source, self.path)
+        self.assertEqual(self.open().find('ear'), 'ear.ba9876543210.mp3')
+
+        (self.source / '.manifest.json').write_text(json.dumps({'ear': {'file': 'ear.0123456789ab.mp3', 'source_file': None}}))
+        build(self.source, self.path)
+        self.assertEqual(self.open().find('ear'), 'ear.0123456789ab.mp3')
+
+
+    def test_empty_directory(self):
+        build(self.dir, self.path)
+
+        self.assertEqual(len(self.open()), 0)
+
+
+
+class TestRead(PackTest):
+    """Test reading clips and ranges of them"""
+
+    def setUp(self):
+        super().setUp()
+        build(self.source, self.path)
+
+
+    def test_ranges(self):
+        pack = self.open()
+        content = self.clips['air.mp3']
+
+        for start, end in ((0, None), (10, 20), (1000, None), (1000, 5000)):
+            with self.subTest(start = start, end = end):
+                self.assertEqual(bytes(pack.view('air.mp3', start, end)), content[start:end])
+
+
+    def test_find_by_stem(self):
+        pack = self.open()
+
+        self.assertEqual(pack.find('air'), 'air.mp3')
+        self.assertEqual(pack.find('oar'), 'oar.wav')
+        self.assertIsNone(pack.find('ear'))
+
+
+    def test_damaged_clip_detected(self):
+        data = bytearray(self.path.read_bytes())
+        data[-1] ^= 0xff
+        self.path.write_bytes(data)
+
+        self.assertEqual(self.open().verify(), ['oar.wav', 'or.mp3'])  #one copy of their content is stored
+
+
+    def test_invalid_packs_rejected(self):
+        valid = self.path.read_bytes()
+        for name, data in (('not a pack', b'RIFF' + bytes(40)), ('empty', b''), ('truncated', valid[:30]),
+                           ('clip past the end', valid[:-1])):
+            with self.subTest(name = name):
+                self.path.write_bytes(data)
+                with self.assertRaises(PackError):
+                    AudioPack(self.path)
+
+
+    def test_shared_opened_once(self):
+        with patch('audio_pack._packs', {}):
+            self.assertIs(shared(self.path), shared(self.path))
+            self.addCleanup(shared(self.path).close)
+            self.assertIsNone(shared(self.dir / 'missing.pack'))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
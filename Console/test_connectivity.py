@@ -0,0 +1,104 @@
+"""
+Testing module for connectivity.py
+
+Probes are mocked: the background thread is only started in the test that checks it never blocks the caller.
+
+"""
+
+
+import unittest
+from unittest.mock import patch, Mock
+from connectivity import ConnectivityMonitor, PROBE_URL
+from requests.exceptions import RequestException, ConnectionError
+import logging
+
+logging.getLogger('connectivity').disabled = True
+
+
+class TestProbe(unittest.TestCase):
+    """Test the state set by 'probe()'"""
+
+    @patch('connectivity.requests.head')
+    def test_probe_online(self, mock_head):
+        monitor = ConnectivityMonitor()
+
+        self.assertTrue(monitor.probe())
+        self.assertTrue(monitor.state)
+        mock_head.assert_called_once_with(PROBE_URL, timeout = 3)
+
+
+    def test_probe_offline(self):
+        for exception in (RequestException, ConnectionError):
+            with self.subTest(exception = exception):
+                with patch('connectivity.requests.head', side_effect = exception):
+                    monitor = ConnectivityMonitor()
+
+                    self.assertFalse(monitor.probe())
+                    self.assertFalse(monitor.state)
+
+
+
+class TestListeners(unittest.TestCase):
+    """Test that listeners are only told about real changes of state"""
+
+    def test_listener_called_on_change(self):
+        monitor = ConnectivityMonitor()
+        listener = Mock()
+        monitor.add_listener(listener)
+
+        for state in (True, True, False, False, True):
+            monitor.update(state)
+
+        self.assertEqual([call.args[0] for call in listener.call_args_list], [False, True])
+
+
+    def test_failing_listener_does_not_stop_others(self):
+        monitor = ConnectivityMonitor()
+        broken = Mock(side_effect = RuntimeError)
+        listener = Mock()
+        monitor.add_listener(broken)
+        monitor.add_listener(listener)
+
+        monitor.update(False)
+        monitor.update(True)
+
+        listener.assert_called_once_with(True)
+
+
+
+class TestIsOnline(unittest.TestCase):
+    """Test that 'is_online()' answers from the cached state"""
+
+    @patch('connectivity.requests.head')
+    def test_fresh_state_not_probed(self, mock_head):
+        monitor = ConnectivityMonitor()
+        monitor.update(True)
+
+        self.assertTrue(monitor.is_online())
+        self.assertFalse(monitor.wake.is_set())
+        mock_head.assert_not_called()
+
+
+    @patch('connectivity.requests.head')
+    def test_stale_state_schedules_refresh(self, mock_head):
+        monitor = ConnectivityMonitor(ttl = 0)
+        monitor.update(False)
+
+        self.assertFalse(monitor.is_online())
+        self.assertTrue(monitor.wake.is_set())
+        mock_head.assert_not_called()
+
+
+    @patch('connectivity.requests.head')
+    def test_first_call_starts_monitor(self, mock_head):
+        monitor = ConnectivityMonitor()
+        self.addCleanup(monitor.stop)
+
+        self.assertTrue(monitor.is_online())
+        self.assertIsNotNone(monitor.thread)
+        mock_head.assert_called_once()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
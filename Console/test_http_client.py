@@ -0,0 +1,209 @@
+"""
+Testing module for http_client.py
+
+The session is mocked to test retries, backoff and the per-host limit;
+'TestKeepAlive' makes real requests to a local server to check that the connection is reused.
+
+"""
+
+
+import unittest
+from unittest.mock import patch, Mock
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_client
+from requests.exceptions import ConnectTimeout, ConnectionError
+
+URL = 'https://api.dictionaryapi.dev/api/v2/entries/en/word'
+
+
+def response(status_code, headers = None):
+    return Mock(status_code = status_code, headers = headers or {})
+
+
+class ClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.session = Mock()
+        for target, value in (('http_client.session', Mock(return_value = self.session)),
+                              ('http_client.backoff', Mock(return_value = 0)),
+                              ('http_client.stats', Counter()),
+                              ('http_client._host_slots', {})):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.backoff = http_client.backoff
+
+
+
+class TestRetries(ClientTestCase):
+    """Test which failures 'get()' retries and how often"""
+
+    def test_5xx_retried_until_success(self):
+        self.session.get.side_effect = [response(503), response(502), response(200)]
+
+        result = http_client.get(URL)
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(self.session.get.call_count, 3)
+        self.assertEqual(self.backoff.call_count, 2)
+        self.assertEqual(http_client.stats['retries'], 2)
+        self.session.get.assert_called_with(URL, headers = None,
+                                            timeout = (http_client.CONNECT_TIMEOUT, http_client.READ_TIMEOUT))
+
+
+    def test_last_5xx_returned_after_retries(self):
+        self.session.get.return_value = response(500)
+
+        result = http_client.get(URL)
+
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(self.session.get.call_count, http_client.RETRIES + 1)
+        self.assertEqual(http_client.stats['failures'], 1)
+
+
+    def test_4xx_not_retried(self):
+        for status_code in (304, 404, 429):
+            with self.subTest(status_code = status_code):
+                self.session.get.reset_mock()
+                self.session.get.return_value = response(status_code)
+
+                self.assertEqual(http_client.get(URL).status_code, status_code)
+                self.session.get.assert_called_once()
+
+
+    def test_timeout_retried_then_raised(self):
+        self.session.get.side_effect = ConnectTimeout
+
+        with self.assertRaises(ConnectTimeout):
+            http_client.get(URL)
+        self.assertEqual(self.session.get.call_count, http_client.RETRIES + 1)
+        self.assertEqual(http_client.stats['failures'], 1)
+
+
+    def test_connection_error_recovered(self):
+        self.session.get.side_effect = [ConnectionError, response(200)]
+
+        self.assertEqual(http_client.get(URL).status_code, 200)
+
+
+    def test_observers_told_every_attempt(self):
+        observer = Mock()
+        self.session.get.side_effect = [ConnectTimeout, response(500), response(200)]
+
+        with patch('http_client.observers', [observer]):
+            http_client.get(URL)
+
+        self.assertEqual([call.args[:2] for call in observer.call_args_list],
+                         [('api.dictionaryapi.dev', 'timeout'), ('api.dictionaryapi.dev', '500'),
+                          ('api.dictionaryapi.dev', '200')])
+
+
+
+    def test_slot_not_held_while_waiting(self):
+        events = []
+
+        @contextmanager
+        def slot():
+            events.append('acquire')
+            yield
+            events.append('release')
+
+        self.session.get.side_effect = lambda url, **kwargs: events.append('get') or response(503)
+        self.backoff.side_effect = lambda attempt, response: events.append('wait') or 0
+
+        http_client.get(URL, retries = 1, slot = slot)
+
+        self.assertEqual(events, ['acquire', 'get', 'release', 'wait', 'acquire', 'get', 'release'])
+
+
+
+class TestBackoff(unittest.TestCase):
+    """Test the waits of 'backoff()'"""
+
+    def test_jittered_and_capped(self):
+        for attempt in range(10):
+            with self.subTest(attempt = attempt):
+                limit = min(http_client.MAX_BACKOFF, http_client.BACKOFF * 2 ** attempt)
+                waits = {http_client.backoff(attempt) for _ in range(50)}
+                self.assertTrue(all(0 <= wait <= limit for wait in waits))
+                self.assertGreater(len(waits), 1)
+
+
+    def test_retry_after_honoured(self):
+        self.assertEqual(http_client.backoff(0, response(503, {'Retry-After': '2'})), 2)
+        self.assertEqual(http_client.backoff(0, response(503, {'Retry-After': '3600'})), http_client.MAX_BACKOFF)
+
+
+
+class TestPerHostLimit(ClientTestCase):
+    """Test that no more than PER_HOST calls run at once to the same host"""
+
+    def test_concurrent_calls_capped(self):
+        running = Counter()
+        lock = threading.Lock()
+
+        def slow_get(url, **kwargs):
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.02)
+            with lock:
+                running['now'] -= 1
+            return response(200)
+
+        self.session.get.side_effect = slow_get
+        threads = [threading.Thread(target = http_client.get, args = (URL,)) for _ in range(http_client.PER_HOST * 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(running['max'], http_client.PER_HOST)
+
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+
+class TestKeepAlive(unittest.TestCase):
+    """Test that the pooled session reuses its connection"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target = self.server.serve_forever, daemon = True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/word'
+        http_client.close()
+
+    def tearDown(self):
+        http_client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def test_one_connection_for_many_calls(self):
+        before = http_client.stats['connections']
+
+        for _ in range(5):
+            self.assertEqual(http_client.get(self.url).content, b'ok')
+
+        self.assertEqual(http_client.stats['connections'] - before, 1)
+        self.assertEqual(http_client.stats['tls_handshakes'], 0)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
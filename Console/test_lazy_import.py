@@ -0,0 +1,48 @@
+"""
+Testing module for lazy_import.py
+
+'colorsys' stands in for a heavy dependency: it is small, in the standard library and imported by nothing else here.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+from lazy_import import lazy_import
+import sys
+
+
+class TestLazyImport(unittest.TestCase):
+    """Test that the module is imported on first use only"""
+
+    def setUp(self):
+        sys.modules.pop('colorsys', None)
+
+
+    def test_not_imported_until_used(self):
+        colorsys = lazy_import('colorsys')
+        self.assertNotIn('colorsys', sys.modules)
+
+        self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), (0, 1, 1))
+        self.assertIn('colorsys', sys.modules)
+
+
+    def test_same_objects_as_real_module(self):
+        requests = lazy_import('requests')
+        from requests.exceptions import RequestException
+
+        self.assertIs(requests.RequestException, RequestException)
+
+
+    def test_patch_through_stand_in(self):
+        colorsys = lazy_import('colorsys')
+
+        with patch.object(colorsys, 'rgb_to_hsv', return_value = 'patched'):
+            self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), 'patched')
+
+        self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), (0, 1, 1))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
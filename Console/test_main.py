@@ -8,12 +8,13 @@ but I intentionally omit further testing as it would be trivial and repetitive f
 
 
 import unittest
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 import json
 import main
 from io import StringIO
 from pathlib import Path
-from requests.exceptions import RequestException
+from progress import ProgressSession
+import tempfile
 import logging
 
 logging.getLogger('main').disabled = True
@@ -56,21 +57,34 @@ class BaseTest(unittest.TestCase):
 
 
 class TestJson(unittest.TestCase):
-    """Test creation, saving and loading of a json file for progress"""
+    """Test creation, saving and loading of a json file for progress through 'main.session'"""
+    
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.file = Path(self.tempdir.name) / 'progress.json'
+        
+        
+    def new_session(self):
+        patcher = patch('main.session', ProgressSession(self.file))
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+    
     
     def test_load_progress_with_file(self):
         path = '/path/air.mp3'
-        mock_data = json.dumps({'Phonemes seen' : {'/eə/': path}})
+        self.file.write_text(json.dumps({'Phonemes seen' : {'/eə/': path}}))
+        self.new_session()
         
-        with patch('builtins.open', mock_open(read_data = mock_data)):
-            seen = main.load_progress()
+        seen = main.load_progress()
             
         self.assertEqual(seen, {'/eə/': path})
         
     
     def test_load_progress_no_file(self):
-        with patch('builtins.open', side_effect = FileNotFoundError):
-            seen = main.load_progress()
+        self.new_session()
+        
+        seen = main.load_progress()
             
         self.assertEqual(seen, {})
         
@@ -86,27 +100,31 @@ class TestJson(unittest.TestCase):
         
         for phoneme, initial_seen, final_seen in cases:
             with self.subTest(phoneme = phoneme, initial_seen = initial_seen, final_seen = final_seen):
-                m = mock_open()
-                with patch('builtins.open', m):
-                    main.save_progress(phoneme, initial_seen, path[phoneme])
-                    
-                    written = "".join(call.args[0] for call in m().write.call_args_list)
-                    self.assertEqual(json.loads(written), final_seen)
+                self.file.write_text(json.dumps({'Phonemes seen': initial_seen}))
+                self.new_session()
+                
+                seen = main.load_progress()
+                main.save_progress(phoneme, seen, path[phoneme])
+                self.assertEqual(json.loads(self.file.read_text()), {'Phonemes seen': initial_seen})
+                
+                main.session.commit()
+                self.assertEqual(json.loads(self.file.read_text()), final_seen)
                     
                     
 
 class TestOnline(unittest.TestCase):
-    """Test check for internet connection"""
+    """Test check for internet connection through the cached state of the monitor"""
     
-    @patch('main.requests.head')
-    def test_internet_accessed(self, mock_head):
+    @patch('main.monitor.is_online', return_value = True)
+    def test_internet_accessed(self, mock_is_online):
         result = main.online()
         
         self.assertTrue(result)
+        mock_is_online.assert_called_once()
         
     
-    @patch('main.requests.head', side_effect = RequestException)
-    def test_no_internet(self, mock_head):
+    @patch('main.monitor.is_online', return_value = False)
+    def test_no_internet(self, mock_is_online):
         result = main.online()
         
         self.assertFalse(result)
@@ -116,9 +134,9 @@ class TestOnline(unittest.TestCase):
 class TestLearn(unittest.TestCase):
     """Test behaviour of 'learn()'"""
     @patch('main.online', return_value = True)
-    @patch('main.playsound')
+    @patch('main.player')
     @patch('main.get_phoneme')
-    def test_learn_online(self, mock_get, mock_playsound, mock_online):
+    def test_learn_online(self, mock_get, mock_player, mock_online):
         
         cases = [('/ɔ:/', 'path/or.mp3'), ('/ɜ:/', None)]
         
@@ -130,15 +148,15 @@ class TestLearn(unittest.TestCase):
                     audio = main.learn(phoneme)
                 
                 if audio:
-                    mock_playsound.assert_called_once_with(audio)
+                    mock_player.play.assert_called_once_with(audio)
                 else:
-                    mock_playsound.assert_not_called()
+                    mock_player.play.assert_not_called()
                 
                 self.assertEqual(audio, path)
                 mock_get.assert_called_once_with(main.phonemes[phoneme]['api'])
                     
                 mock_get.reset_mock()
-                mock_playsound.reset_mock()
+                mock_player.reset_mock()
                 
                 
     @patch('main.online', return_value = False)            
@@ -258,10 +276,11 @@ class TestUpdateAudio(unittest.TestCase):
     
     Despite the repetitive boilerplate code, subTest and a helper function are intentionally omitted as they would compromise readability."""
 
+    @patch('main.online', return_value = True)
     @patch('main.save_progress')
-    @patch('main.playsound')
+    @patch('main.player')
     @patch('main.get_phoneme')
-    def test_update_audio_no_audio(self, mock_get_phoneme, mock_playsound, mock_save):
+    def test_update_audio_no_audio(self, mock_get_phoneme, mock_player, mock_save, mock_online):
         phoneme = '/i:/'
         seen = {phoneme: 'offline'}
         
@@ -270,15 +289,16 @@ class TestUpdateAudio(unittest.TestCase):
             main.update_audio(phoneme, seen)
             output = fake.getvalue() 
             
-        mock_playsound.assert_not_called()
+        mock_player.play.assert_not_called()
         self.assertIn('audio unavailable', output)
         mock_save.assert_called_once_with(phoneme, seen, None)
         
     
+    @patch('main.online', return_value = True)
     @patch('main.save_progress')
-    @patch('main.playsound')
+    @patch('main.player')
     @patch('main.get_phoneme')
-    def test_update_audio_with_audio(self, mock_get_phoneme, mock_playsound, mock_save):
+    def test_update_audio_with_audio(self, mock_get_phoneme, mock_player, mock_save, mock_online):
         phoneme = '/i:/'
         seen = {phoneme: 'offline'}
         
@@ -288,9 +308,54 @@ class TestUpdateAudio(unittest.TestCase):
             main.update_audio(phoneme, seen)
             output = fake.getvalue() 
         
-        mock_playsound.assert_called_once_with(audio)
+        mock_player.play.assert_called_once_with(audio)
         self.assertNotIn('audio unavailable', output)
         mock_save.assert_called_once_with(phoneme, seen, audio)
+    
+    
+    @patch('main.online', side_effect = [True, False])
+    @patch('main.save_progress')
+    @patch('main.player')
+    @patch('main.get_phoneme')
+    def test_update_audio_connection_lost(self, mock_get_phoneme, mock_player, mock_save, mock_online):
+        phoneme = '/i:/'
+        seen = {phoneme: 'offline'}
+        
+        mock_get_phoneme.return_value = None
+        with patch('sys.stdout', new_callable=StringIO) as fake:
+            main.update_audio(phoneme, seen)
+            output = fake.getvalue() 
+        
+        self.assertIn('audio unavailable', output)
+        mock_save.assert_not_called()
+        self.assertEqual(seen, {phoneme: 'offline'})
+        
+        
+        
+class TestConnectivityNotice(BaseTest):
+    """Test that connectivity changes are told at the next prompt, not from the monitor thread"""
+    
+    def setUp(self):
+        patcher = patch('main.notice', None)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        
+    
+    def test_notice_printed_at_next_prompt_only(self):
+        with patch('sys.stdout', new_callable=StringIO) as fake:
+            main.connectivity_changed(False)
+            self.assertEqual(fake.getvalue(), '')
+        
+        output = self.help_patch(main.ask, ('1. ',), ['sea'], 'Connection lost')
+        self.assertNotIn('Connection lost', self.help_patch(main.ask, ('2. ',), ['see'], []))
+        self.assertEqual(output.count('Connection lost'), 1)
+    
+    
+    def test_latest_state_told(self):
+        main.connectivity_changed(False)
+        main.connectivity_changed(True)
+        
+        self.help_patch(main.ask, ('1. ',), ['sea'], 'Back online', 'Connection lost')
         
 
 if __name__ == '__main__':
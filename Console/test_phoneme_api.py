@@ -2,19 +2,25 @@
 Testing module for phoneme_api.py
 
 The first Test Class mocks and tests the API in 'get_phoneme()'.
-The second one tests the behaviour of 'log_error_return()'
+'TestLookup' tests the lookup cache behind it: fresh hits, revalidation, 404s and stale fallbacks.
+The last one tests the behaviour of 'log_error_return()'
 
 """
 
 
 import unittest
 from unittest.mock import patch, Mock
-from phoneme_api import get_phoneme, log_error_return, get_uk_audio, download_audio
+from phoneme_api import get_phoneme, log_error_return, get_uk_audio, download_audio, lookup
+import lookup_cache
+import audio_pack
+import phoneme_api
+from audio_pack import build
 import logging
 from json import JSONDecodeError
 from requests.exceptions import HTTPError, ConnectionError, RequestException
 from pathlib import Path
 import tempfile
+from contextlib import closing
 
 logging.getLogger('phoneme_api').disabled = True
 
@@ -23,12 +29,15 @@ class TestGetPhoneme(unittest.TestCase):
     """Test retrieval of the API in 'get_phoneme()' and exception handling"""
 
     def setUp(self):
-        self.mock_response = Mock()
+        self.mock_response = Mock(status_code = 200, headers = {})
         self.mock_response.raise_for_status.return_value = None
         self.tempdir = tempfile.TemporaryDirectory()
         patcher = patch('phoneme_api.AUDIO_DIR', Path(self.tempdir.name))
         self.addCleanup(patcher.stop)
         self.mock_audio_dir = patcher.start()
+        db_patcher = patch('phoneme_api.LOOKUP_DB', Path(self.tempdir.name) / 'lookups.sqlite3')
+        self.addCleanup(db_patcher.stop)
+        db_patcher.start()
         
         
     def tearDown(self):
@@ -36,7 +45,7 @@ class TestGetPhoneme(unittest.TestCase):
         
     
     @patch('phoneme_api.get_uk_audio', return_value = None)
-    @patch('phoneme_api.requests.get')
+    @patch('phoneme_api.http_client.get')
     def test_get_phoneme_successful_no_audio(self, mock_get, mock_uk_audio):           
         self.mock_response.json.return_value = [{'phonetics': [{'text': '/ɔː(ɹ)/', 'audio': ''}]}]
         
@@ -48,9 +57,9 @@ class TestGetPhoneme(unittest.TestCase):
         mock_uk_audio.assert_called_once()
     
               
-    @patch('phoneme_api.requests.get')
+    @patch('phoneme_api.http_client.get')
     def test_get_phoneme_successful_with_audio(self, mock_get):
-        mock_get_phoneme = Mock()   
+        mock_get_phoneme = Mock(status_code = 200, headers = {})   
         mock_get_phoneme.raise_for_status.return_value = None
         mock_get_phoneme.json.return_value = [{'phonetics': [{'text': '/ɔː(ɹ)/', 'audio': 'https://getaudio.url/good_phoneme-uk.mp3'}]}]
         
@@ -66,12 +75,12 @@ class TestGetPhoneme(unittest.TestCase):
         self.assertEqual(result, str(expected_file))
         mock_get_phoneme.raise_for_status.assert_called_once()
         mock_download_audio.raise_for_status.assert_called_once()
-        mock_get.assert_any_call('https://api.dictionaryapi.dev/api/v2/entries/en/good_phoneme', timeout = 5)
-        mock_get.assert_any_call('https://getaudio.url/good_phoneme-uk.mp3', timeout = 5)
+        mock_get.assert_any_call('https://api.dictionaryapi.dev/api/v2/entries/en/good_phoneme', headers = None)
+        mock_get.assert_any_call('https://getaudio.url/good_phoneme-uk.mp3')
         self.assertEqual(mock_get.call_count, 2)
 
 
-    @patch('phoneme_api.requests.get')
+    @patch('phoneme_api.http_client.get')
     def test_api_not_called_audio_already_exists(self, mock_get):
         cached_file = Path(self.tempdir.name) / "phoneme.mp3"
         cached_file.write_bytes(b'test')
@@ -83,40 +92,141 @@ class TestGetPhoneme(unittest.TestCase):
 
 
 
-    @patch('phoneme_api.requests.get', side_effect = JSONDecodeError('Value expected', '', 0))
+    @patch('phoneme_api.http_client.get')
+    def test_api_not_called_audio_packed(self, mock_get):
+        packed = Path(self.tempdir.name) / 'packed'
+        packed.mkdir()
+        (packed / 'phoneme.mp3').write_bytes(b'test')
+        build(packed, Path(self.tempdir.name) / 'audio.pack')
+
+        with patch('phoneme_api.AUDIO_PACK', Path(self.tempdir.name) / 'audio.pack'), patch('audio_pack._packs', {}):
+            result = get_phoneme('phoneme')
+            audio_pack.shared(phoneme_api.AUDIO_PACK).close()
+
+        self.assertEqual(result, str(Path(self.tempdir.name) / 'phoneme.mp3'))
+        mock_get.assert_not_called()
+
+
+    @patch('phoneme_api.http_client.get', side_effect = JSONDecodeError('Value expected', '', 0))
     def test_invalid_json(self, mock_get):
         result = get_phoneme('phoneme')
-        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/phoneme', timeout = 5)
+        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/phoneme', headers = None)
         self.assertIsNone(result)
         
     
-    @patch('phoneme_api.requests.get')
+    @patch('phoneme_api.http_client.get')
     def test_valid_json_invalid_expected_format(self, mock_get):
         self.mock_response.json.return_value = ({'phonetics': [{'text': '/ɔː(ɹ)/', 'audio': 'https://getaudio.url/phoneme.mp3'}]})
         
         mock_get.return_value = self.mock_response
         result = get_phoneme('phoneme')
         
-        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/phoneme', timeout = 5)
+        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/phoneme', headers = None)
         self.assertIsNone(result)
         
     
-    @patch('phoneme_api.requests.get', side_effect = HTTPError)
+    @patch('phoneme_api.http_client.get', side_effect = HTTPError)
     def test_http_error(self, mock_get):   
         result = get_phoneme('non-existent-phoneme')
         
-        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/non-existent-phoneme', timeout = 5)
+        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/non-existent-phoneme', headers = None)
         self.assertIsNone(result)
         
     
-    @patch('phoneme_api.requests.get', side_effect = ConnectionError)
+    @patch('phoneme_api.http_client.get', side_effect = ConnectionError)
     def test_connection_error(self, mock_get):
         result = get_phoneme('phoneme')
-        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/phoneme', timeout = 5)
+        mock_get.assert_called_once_with('https://api.dictionaryapi.dev/api/v2/entries/en/phoneme', headers = None)
         self.assertIsNone(result)
         
         
 
+class TestLookup(unittest.TestCase):
+    """Test the lookup cache used by 'lookup()'"""
+    
+    url = 'https://api.dictionaryapi.dev/api/v2/entries/en/word'
+    entries = [{'word': 'word', 'phonetics': [{'text': '/wɜːd/', 'audio': 'https://audio.url/word-uk.mp3'},
+                                              {'text': '/wɝd/', 'audio': ''}]}]
+    
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db = Path(self.tempdir.name) / 'lookups.sqlite3'
+        patcher = patch('phoneme_api.LOOKUP_DB', self.db)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        
+    def tearDown(self):
+        self.tempdir.cleanup()
+        
+    def response(self, status_code = 200, entries = None, headers = None):
+        response = Mock(status_code = status_code, headers = headers or {})
+        response.json.return_value = entries
+        if status_code >= 400:
+            response.raise_for_status.side_effect = HTTPError
+        return response
+    
+    def expire(self):
+        with patch('lookup_cache.time.time', return_value = lookup_cache.time.time() + lookup_cache.TTL + 1):
+            return lookup('word')
+    
+    
+    @patch('phoneme_api.http_client.get')
+    def test_fresh_lookup_not_fetched_again(self, mock_get):
+        mock_get.return_value = self.response(entries = self.entries)
+        
+        self.assertEqual(lookup('word'), self.entries)
+        self.assertEqual(lookup('word'), self.entries)
+        mock_get.assert_called_once_with(self.url, headers = None)
+        self.assertEqual(lookup_cache.ipa(lookup_cache.get(self.db, 'word').entries), ['/wɜːd/', '/wɝd/'])
+    
+    
+    @patch('phoneme_api.http_client.get')
+    def test_stale_lookup_revalidated(self, mock_get):
+        mock_get.side_effect = [self.response(entries = self.entries, headers = {'ETag': '"v1"'}), self.response(304)]
+        lookup('word')
+        
+        self.assertEqual(self.expire(), self.entries)
+        mock_get.assert_called_with(self.url, headers = {'If-None-Match': '"v1"'})
+        self.assertTrue(lookup_cache.get(self.db, 'word').fresh())
+    
+    
+    @patch('phoneme_api.http_client.get')
+    def test_changed_entries_replace_old_ones(self, mock_get):
+        changed = [{'word': 'word', 'phonetics': [{'text': '/wɜːd/'}]}]
+        mock_get.side_effect = [self.response(entries = self.entries), self.response(entries = changed)]
+        lookup('word')
+        
+        self.assertEqual(self.expire(), changed)
+        with closing(lookup_cache.connect(self.db)) as db:
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM entries').fetchone()[0], 1)
+    
+    
+    @patch('phoneme_api.http_client.get')
+    def test_unknown_word_cached(self, mock_get):
+        mock_get.return_value = self.response(404)
+        
+        self.assertIsNone(lookup('word'))
+        self.assertIsNone(lookup('word'))
+        mock_get.assert_called_once()
+    
+    
+    @patch('phoneme_api.http_client.get')
+    def test_stale_lookup_used_when_offline(self, mock_get):
+        mock_get.side_effect = [self.response(entries = self.entries), ConnectionError]
+        lookup('word')
+        
+        self.assertEqual(self.expire(), self.entries)
+        self.assertEqual(mock_get.call_count, 2)
+    
+    
+    @patch('phoneme_api.http_client.get', side_effect = ConnectionError)
+    def test_error_without_lookup_raised(self, mock_get):
+        with self.assertRaises(ConnectionError):
+            lookup('word')
+        self.assertIsNone(lookup_cache.get(self.db, 'word'))
+        
+        
+
 class TestGetUkAudio(unittest.TestCase):
     """Test return value of 'get_uk_audio()'"""
     
@@ -153,7 +263,7 @@ class TestDownloadAudio(unittest.TestCase):
         self.tempdir.cleanup()
         
               
-    @patch('phoneme_api.requests.get')
+    @patch('phoneme_api.http_client.get')
     def test_success(self, mock_get):
         mock_response = Mock()
         mock_response.raise_for_status.return_value = None
@@ -165,11 +275,11 @@ class TestDownloadAudio(unittest.TestCase):
         
         self.assertEqual(result, expected_result)
         self.assertTrue(Path(expected_result).exists())
-        mock_get.assert_called_once_with(self.audio, timeout = 5)
+        mock_get.assert_called_once_with(self.audio)
         mock_response.raise_for_status.assert_called_once()
         
         
-    @patch('phoneme_api.requests.get', side_effect = RequestException)
+    @patch('phoneme_api.http_client.get', side_effect = RequestException)
     def test_fail(self, mock_get):
         result = download_audio(self.audio, 'phoneme')
         
@@ -0,0 +1,167 @@
+"""
+Testing module for player.py
+
+playsound is replaced by a fake backend, so the worker thread runs for real but no audio is played.
+'TestPack' plays clips that are only in an audio pack.
+
+"""
+
+
+import unittest
+from unittest.mock import Mock
+from player import AudioPlayer
+from audio_pack import build
+import os
+from pathlib import Path
+import tempfile
+import threading
+import logging
+
+logging.getLogger('player').disabled = True
+
+
+class PlayerTest(unittest.TestCase):
+    """Base class creating a player with a fake backend and two clips"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.clips = []
+        for name in ('or.mp3', 'air.mp3'):
+            clip = Path(self.tempdir.name) / name
+            clip.write_bytes(b'audio bytes')
+            self.clips.append(str(clip))
+        self.backend = Mock()
+        self.player = AudioPlayer(backend = self.backend)
+        self.addCleanup(self.player.close)
+
+
+
+class TestPlay(PlayerTest):
+    """Test queued playback"""
+
+    def test_play_in_order(self):
+        for clip in self.clips:
+            self.player.play(clip)
+        self.player.wait()
+
+        self.assertEqual([call.args[0] for call in self.backend.call_args_list], self.clips)
+
+
+    def test_play_returns_before_clip_ends(self):
+        release = threading.Event()
+        self.backend.side_effect = lambda path: release.wait(5)
+
+        self.player.play(self.clips[0])
+
+        self.assertFalse(release.is_set())
+        release.set()
+        self.player.wait()
+        self.backend.assert_called_once_with(self.clips[0])
+
+
+    def test_missing_file_skipped(self):
+        self.player.play('/no/such/file.mp3')
+        self.player.play(self.clips[0])
+        self.player.wait()
+
+        self.backend.assert_called_once_with(self.clips[0])
+
+
+
+class TestReplayStop(PlayerTest):
+    """Test 'replay()', 'stop()' and 'warm()'"""
+
+    def test_replay_last_clip(self):
+        self.assertFalse(self.player.replay())
+
+        self.player.play(self.clips[1])
+        self.assertTrue(self.player.replay())
+        self.player.wait()
+
+        self.assertEqual([call.args[0] for call in self.backend.call_args_list], [self.clips[1]] * 2)
+
+
+    def test_stop_drops_queued_clips(self):
+        playing = threading.Event()
+        release = threading.Event()
+
+        def backend(path):
+            playing.set()
+            release.wait(5)
+
+        self.backend.side_effect = backend
+        self.player.play(self.clips[0])
+        playing.wait(5)
+        self.player.play(self.clips[1])
+        self.player.stop()
+        release.set()
+        self.player.wait()
+
+        self.backend.assert_called_once_with(self.clips[0])
+
+
+    def test_warm(self):
+        self.player.warm(self.clips[0])
+        self.player.wait()
+
+        self.assertIn(self.clips[0], self.player.warmed)
+        self.backend.assert_not_called()
+
+
+
+class TestPack(PlayerTest):
+    """Test clips read from the audio pack"""
+
+    def setUp(self):
+        super().setUp()
+        packed = Path(self.tempdir.name) / 'packed'
+        packed.mkdir()
+        (packed / 'ear.mp3').write_bytes(b'packed audio bytes')
+        build(packed, Path(self.tempdir.name) / 'audio.pack')
+        self.player = AudioPlayer(backend = self.backend, pack = Path(self.tempdir.name) / 'audio.pack')
+        self.addCleanup(self.player.close)
+        self.clip = str(Path(self.tempdir.name) / 'audio_repr' / 'ear.mp3')
+
+
+    def test_packed_clip_played_from_extracted_file(self):
+        self.player.play(self.clip)
+        self.player.replay()
+        self.player.wait()
+
+        played = {call.args[0] for call in self.backend.call_args_list}
+        self.assertEqual(self.backend.call_count, 2)
+        self.assertEqual(len(played), 1)
+        with open(played.pop(), 'rb') as f:
+            self.assertEqual(f.read(), b'packed audio bytes')
+
+
+    def test_packed_clip_extracted_when_warmed(self):
+        self.player.warm(self.clip)
+        self.player.wait()
+
+        with open(self.player.extracted[self.clip], 'rb') as f:
+            self.assertEqual(f.read(), b'packed audio bytes')
+        self.backend.assert_not_called()
+
+
+    def test_extracted_files_removed_on_close(self):
+        self.player.play(self.clip)
+        self.player.wait()
+        extract_dir = self.player.extract_dir
+
+        self.player.close()
+
+        self.assertFalse(os.path.exists(extract_dir))
+
+
+    def test_clip_missing_from_pack_skipped(self):
+        self.player.play(str(Path(self.tempdir.name) / 'audio_repr' / 'oar.mp3'))
+        self.player.wait()
+
+        self.backend.assert_not_called()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
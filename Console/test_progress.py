@@ -0,0 +1,111 @@
+"""
+Testing module for progress.py
+
+Every test works on a real progress.json in a temporary directory, since atomic replacement and journal recovery
+are exactly what mocking 'open' would hide.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+from progress import ProgressSession
+from pathlib import Path
+import tempfile
+import json
+import logging
+
+logging.getLogger('progress').disabled = True
+
+
+class ProgressTest(unittest.TestCase):
+    """Base class with a temporary progress.json"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.file = Path(self.tempdir.name) / 'data' / 'progress.json'
+
+
+    def saved(self):
+        return json.loads(self.file.read_text())['Phonemes seen']
+
+
+
+class TestBatching(ProgressTest):
+    """Test that changes are written once, on commit"""
+
+    def test_no_write_before_commit(self):
+        session = ProgressSession(self.file)
+        session.load()
+        session.record('/ɔ:/', 'path/or.mp3')
+        session.record('/eə/', 'offline')
+
+        self.assertFalse(self.file.exists())
+        session.commit()
+
+        self.assertEqual(self.saved(), {'/ɔ:/': 'path/or.mp3', '/eə/': 'offline'})
+        self.assertFalse(session.journal_path.exists())
+
+
+    def test_commit_without_changes_does_not_write(self):
+        session = ProgressSession(self.file)
+        session.load()
+
+        with patch('progress.os.replace') as mock_replace:
+            session.commit()
+
+        mock_replace.assert_not_called()
+
+
+    def test_failed_write_keeps_old_file(self):
+        session = ProgressSession(self.file)
+        session.load()
+        session.record('/i:/', 'path/e.mp3')
+        session.commit()
+        session.record('/i:/', None)
+
+        with patch('progress.json.dump', side_effect = OSError):
+            with self.assertRaises(OSError):
+                session.commit()
+
+        self.assertEqual(self.saved(), {'/i:/': 'path/e.mp3'})
+
+
+
+class TestJournal(ProgressTest):
+    """Test recovery of an interrupted run"""
+
+    def test_interrupted_run_recovered(self):
+        session = ProgressSession(self.file)
+        session.load()
+        session.record('/ɜ:/', 'offline')
+        session.record('/ɜ:/', 'path/err.mp3')
+
+        recovered = ProgressSession(self.file).load()
+
+        self.assertEqual(recovered, {'/ɜ:/': 'path/err.mp3'})
+        self.assertEqual(self.saved(), {'/ɜ:/': 'path/err.mp3'})
+        self.assertFalse(session.journal_path.exists())
+
+
+    def test_truncated_journal_line_skipped(self):
+        self.file.parent.mkdir(parents=True)
+        self.file.write_text(json.dumps({'Phonemes seen': {'/i:/': None}}))
+        self.file.with_suffix('.journal').write_text('{"phoneme": "/eə/", "audio": "offline"}\n{"phoneme": "/ɔ:/", "au')
+
+        seen = ProgressSession(self.file).load()
+
+        self.assertEqual(seen, {'/i:/': None, '/eə/': 'offline'})
+
+
+    def test_unreadable_file_starts_fresh(self):
+        self.file.parent.mkdir(parents=True)
+        self.file.write_text('{not json')
+
+        self.assertEqual(ProgressSession(self.file).load(), {})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
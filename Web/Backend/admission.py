@@ -0,0 +1,196 @@
+"""
+Admission module
+
+This module protects the endpoints that are expensive or easy to spam, so one misbehaving client can't starve everyone else:
+    - Rate limiting: every client has a token bucket per group ('answer' for /checkspellanswer and /checkhomophanswer,
+      'learn' for /learn). An empty bucket means 429 with a Retry-After header.
+    - Concurrency limit: at most MAX_IN_FLIGHT of those requests run at the same time. Up to MAX_QUEUE more wait
+      for a slot, each for at most QUEUE_TIMEOUT seconds; beyond that the request is shed with a 503.
+    - Degradation: when every slot is taken, /learn is not queued but served straight away in degraded mode
+      ('degraded()' is True), where it only uses cached audio and returns 'audio_status: unavailable' instead of
+      starting a download from the dictionary API.
+Every decision is counted in 'admission_decisions_total' (see 'metrics').
+
+Clients are identified by IP address. Behind proxies, EPT_TRUSTED_PROXIES=<n> (EPT_TRUST_FORWARDED=1 means one) identifies
+them by the n-th address of X-Forwarded-For counted from the right: every proxy appends the address it got the request
+from, while the left of the header is whatever the client sent.
+Buckets and the limiter live in the process, so with several uvicorn workers the limits apply per worker.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from fastapi.responses import JSONResponse
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+ENABLED = True
+TRUSTED_PROXIES = int(os.environ.get('EPT_TRUSTED_PROXIES', '1' if os.environ.get('EPT_TRUST_FORWARDED') == '1' else '0'))
+GROUPS = {
+    '/checkspellanswer': 'answer',
+    '/checkhomophanswer': 'answer',
+    '/learn': 'learn',
+}
+RATES = {  # tokens per second, bucket size
+    'answer': (5.0, 20),
+    'learn': (0.5, 5),
+}
+MAX_CLIENTS = 10_000
+MAX_IN_FLIGHT = 32
+MAX_QUEUE = 64
+QUEUE_TIMEOUT = 2.0
+DEGRADABLE = {'learn'}
+
+_degraded = ContextVar('degraded', default=False)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token. Return 0 if there was one, otherwise the seconds until there will be."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per (client, group), the least recently used client forgotten beyond MAX_CLIENTS."""
+
+    def __init__(self, rates = RATES, max_clients = MAX_CLIENTS):
+        self.rates = rates
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, client, group):
+        with self.lock:
+            bucket = self.buckets.get((client, group))
+            if bucket is None:
+                bucket = self.buckets[(client, group)] = TokenBucket(*self.rates[group])
+                if len(self.buckets) > self.max_clients:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end((client, group))
+            return bucket.take()
+
+
+class Shed(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """Slots for MAX_IN_FLIGHT requests with a bounded, time-limited wait queue. Used from the event loop only."""
+
+    def __init__(self, limit = MAX_IN_FLIGHT, queue_size = MAX_QUEUE, timeout = QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.semaphore = None
+        self.loop = None
+
+    def saturated(self):
+        return self.in_flight >= self.limit
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:  # a new event loop (tests, reloads) needs its own semaphore
+            self.loop, self.semaphore = loop, asyncio.Semaphore(self.limit)
+            self.in_flight = self.waiting = 0
+        if self.semaphore.locked() and self.waiting >= self.queue_size:
+            raise Shed('queue_full')
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+        except TimeoutError:
+            raise Shed('deadline') from None
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        metrics.observe('admission_wait_seconds', time.perf_counter() - start)
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+
+rate_limiter = RateLimiter()
+limiter = ConcurrencyLimiter()
+
+
+@metrics.add_collector
+def collect():
+    return [('admission_in_flight', {}, limiter.in_flight),
+            ('admission_queue_depth', {}, limiter.waiting)]
+
+
+def degraded():
+    """True while serving a request admitted in degraded mode: don't wait on the dictionary API."""
+    return _degraded.get()
+
+
+def client_id(request):
+    if TRUSTED_PROXIES and 'x-forwarded-for' in request.headers:
+        hops = [hop.strip() for hop in request.headers['x-forwarded-for'].split(',') if hop.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXIES, len(hops))]
+    return request.client.host if request.client else 'unknown'
+
+
+def refuse(status, group, decision, retry_after, detail):
+    metrics.inc('admission_decisions_total', group=group, decision=decision)
+    return JSONResponse(status_code=status, content={'detail': detail},
+                        headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+
+async def middleware(request, call_next):
+    group = GROUPS.get(request.url.path)
+    if not ENABLED or group is None:
+        return await call_next(request)
+
+    client = client_id(request)
+    retry_after = rate_limiter.take(client, group)
+    if retry_after:
+        logger.warning(f'Rate limit reached by {client} on {request.url.path}')
+        return refuse(429, group, 'rate_limited', retry_after, 'Too many requests')
+
+    if group in DEGRADABLE and limiter.saturated():
+        metrics.inc('admission_decisions_total', group=group, decision='degraded')
+        token = _degraded.set(True)
+        try:
+            return await call_next(request)
+        finally:
+            _degraded.reset(token)
+
+    try:
+        await limiter.acquire()
+    except Shed as e:
+        logger.warning(f'Request to {request.url.path} shed ({e.reason})')
+        return refuse(503, group, f'shed_{e.reason}', limiter.timeout, 'Server busy, try again shortly')
+
+    metrics.inc('admission_decisions_total', group=group, decision='admitted')
+    try:
+        return await call_next(request)
+    finally:
+        limiter.release()
@@ -0,0 +1,237 @@
+"""
+Audio serving
+
+This module provides 'AudioFiles', the ASGI app mounted on '/audio' in place of StaticFiles.
+The phoneme clips are few, small and played over and over, so the bytes of the hot ones are kept in memory:
+    - A clip is admitted into a size-bounded LRU on its ADMIT_AFTER-th request (one-off clips never evict hot ones).
+      Cached clips are served straight from memory, without stat() or open().
+      Their names carry a hash of their content (see 'phoneme_api.hashed_audio_name()'), so a cached entry never goes stale.
+    - Cold clips are streamed from disk in CHUNK_SIZE blocks.
+    - Single byte ranges ('Range: bytes=...') are supported so the browser can seek; multiple ranges get the whole file.
+    - ETag/Last-Modified and If-None-Match/If-Modified-Since/If-Range work as they did with StaticFiles.
+    - Clips found in the audio pack ('audio_pack.AudioPack', if there is one) are read straight from its memory mapping,
+      whole or by range, with the hash of their content as ETag; the pack is looked at before the directory.
+"""
+
+import logging
+import mimetypes
+import os
+import threading
+from collections import Counter, OrderedDict
+from email.utils import formatdate, parsedate
+import anyio
+from http_cache import IMMUTABLE
+
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHE_BYTES = 16 * 1024 * 1024
+MAX_ITEM_BYTES = 1024 * 1024
+ADMIT_AFTER = 2
+CHUNK_SIZE = 64 * 1024
+
+
+class CachedClip:
+    __slots__ = ('content', 'headers')
+
+    def __init__(self, content, headers):
+        self.content = content
+        self.headers = headers
+
+
+def clip_headers(name, stat_result, cache_control):
+    media_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return {
+        'content-type': media_type,
+        'accept-ranges': 'bytes',
+        'etag': f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"',
+        'last-modified': formatdate(stat_result.st_mtime, usegmt=True),
+        'cache-control': cache_control,
+    }
+
+
+def parse_range(header, size):
+    """Parse a single 'bytes=' range.
+
+    Returns:
+        tuple | None | bool:
+            - (start, end) inclusive if the range is satisfiable.
+            - None if there is no usable range (absent, malformed or multiple ranges): serve the whole file.
+            - False if the range can't be satisfied (416).
+    """
+    unit, _, ranges = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+    start, _, end = ranges.strip().partition('-')
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def not_modified(request_headers, headers):
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match:
+        return if_none_match.strip() == '*' or headers['etag'] in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    if_modified_since = parsedate(request_headers.get('if-modified-since', ''))
+    return bool(if_modified_since) and if_modified_since >= parsedate(headers['last-modified'])
+
+
+def packed_headers(name, entry, mtime, cache_control):
+    media_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return {
+        'content-type': media_type,
+        'accept-ranges': 'bytes',
+        'etag': entry.etag,
+        'last-modified': formatdate(mtime, usegmt=True),
+        'cache-control': cache_control,
+    }
+
+
+class AudioFiles:
+    """ASGI app serving the files of 'directory' (and the clips of 'pack') from an in-memory LRU, the pack or disk."""
+
+    def __init__(self, directory, max_bytes = MAX_CACHE_BYTES, max_item = MAX_ITEM_BYTES, cache_control = IMMUTABLE,
+                 pack = None):
+        self.directory = os.fspath(directory)
+        self.pack = pack
+        self.max_bytes = max_bytes
+        self.max_item = max_item
+        self.cache_control = cache_control
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        if scope['method'] not in ('GET', 'HEAD'):
+            await self.send_empty(send, 405, {'allow': 'GET, HEAD'})
+            return
+
+        name = scope['path'].removeprefix(scope.get('root_path', '')).lstrip('/')
+        if not name or '/' in name or '\\' in name or name.startswith('.'):
+            await self.send_empty(send, 404)
+            return
+
+        request_headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+        clip = self.lookup(name)
+        packed = self.pack.entry(name) if clip is None and self.pack is not None else None
+        path = os.path.join(self.directory, name)
+        if clip is not None:
+            headers = clip.headers
+            size = len(clip.content)
+        elif packed is not None:
+            headers = packed_headers(name, packed, self.pack.mtime, self.cache_control)
+            size = packed.length
+        else:
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, path)
+            except (FileNotFoundError, NotADirectoryError):
+                await self.send_empty(send, 404)
+                return
+            headers = clip_headers(name, stat_result, self.cache_control)
+            size = stat_result.st_size
+
+        if not_modified(request_headers, headers):
+            self.stats['not_modified'] += 1
+            await self.send_empty(send, 304, {key: headers[key] for key in ('etag', 'cache-control')})
+            return
+
+        status, start, end = 200, 0, size - 1
+        if 'range' in request_headers and request_headers.get('if-range', headers['etag']) in (headers['etag'], headers['last-modified']):
+            byte_range = parse_range(request_headers['range'], size)
+            if byte_range is False:
+                await self.send_empty(send, 416, {'content-range': f'bytes */{size}'})
+                return
+            if byte_range:
+                status, (start, end) = 206, byte_range
+                headers = {**headers, 'content-range': f'bytes {start}-{end}/{size}'}
+        headers = {**headers, 'content-length': str(end - start + 1)}
+
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(key.encode('latin-1'), value.encode('latin-1')) for key, value in headers.items()]})
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if clip is not None:
+            self.stats['memory'] += 1
+            body = clip.content if status == 200 else bytes(memoryview(clip.content)[start:end + 1])
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        if packed is not None:
+            self.stats['pack'] += 1
+            await self.send_packed(send, name, start, end + 1)
+            return
+
+        await self.send_file(send, path, start, end - start + 1)
+        if self.should_admit(name, size):
+            await anyio.to_thread.run_sync(self.admit, name, path, headers)
+
+    def lookup(self, name):
+        with self.lock:
+            clip = self.cache.get(name)
+            if clip is not None:
+                self.cache.move_to_end(name)
+            return clip
+
+    def should_admit(self, name, size):
+        if size > self.max_item or size > self.max_bytes:
+            return False
+        with self.lock:
+            self.requests[name] += 1
+            return self.requests[name] >= ADMIT_AFTER and name not in self.cache
+
+    def admit(self, name, path, headers):
+        with open(path, 'rb') as f:
+            content = f.read()
+        headers = {key: value for key, value in headers.items() if key not in ('content-length', 'content-range')}
+        with self.lock:
+            if name in self.cache:
+                return
+            self.cache[name] = CachedClip(content, headers)
+            self.cached_bytes += len(content)
+            self.requests.pop(name, None)
+            while self.cached_bytes > self.max_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= len(evicted.content)
+                self.stats['evicted'] += 1
+        logger.info(f'Audio clip {name} cached in memory ({len(content)} bytes)')
+
+    async def send_file(self, send, path, offset, count):
+        self.stats['disk'] += 1
+        async with await anyio.open_file(path, 'rb') as f:
+            await f.seek(offset)
+            more_body = True
+            while more_body:
+                chunk = await f.read(min(CHUNK_SIZE, count)) if count > 0 else b''
+                count -= len(chunk)
+                more_body = bool(chunk) and count > 0
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+
+    async def send_packed(self, send, name, start, stop):
+        while True:
+            chunk = bytes(self.pack.view(name, start, min(start + CHUNK_SIZE, stop)))
+            start += len(chunk)
+            more_body = bool(chunk) and start < stop
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+            if not more_body:
+                return
+
+    async def send_empty(self, send, status, headers = None):
+        headers = [(key.encode('latin-1'), value.encode('latin-1')) for key, value in (headers or {}).items()]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
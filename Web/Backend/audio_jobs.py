@@ -0,0 +1,114 @@
+"""
+Audio jobs module
+
+This module lets '/learn' answer before the audio of the phoneme is on disk.
+On a cache miss 'get_phoneme()' may take several seconds (dictionary lookup, then download), so instead:
+    - 'start()' returns the job fetching the audio of a phoneme, starting it in the 'audio' bulkhead if needed.
+      One job runs per phoneme however many lessons ask for it. 'JOBS' only holds running jobs: once a job is done
+      the next lesson looks the audio up again with 'cached_audio()', so it gets the processed clip the audio
+      pipeline recorded in the manifest (the raw download is deleted after a while), and a job that found no audio
+      is retried. If the audio is already cached the job is created finished.
+    - 'events()' is the server-sent event stream of '/audioevents/{phoneme}': comments as heartbeats while the job runs,
+      then one 'audio_ready' event with the '/audio/...' URL (and duration, size), or 'audio_unavailable'.
+Jobs started and their outcome are counted in 'audio_jobs_total' (see 'metrics').
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from starlette.concurrency import run_in_threadpool
+import audio_pipeline
+import bulkheads
+import metrics
+from phoneme_api import get_phoneme, cached_audio
+
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = 15.0
+STREAM_TIMEOUT = 60.0
+
+JOBS = {}
+_lock = threading.Lock()
+
+
+def describe(audio_file):
+    audio_url = f'/audio/{Path(audio_file).name}' if audio_file else None
+    return {'audio_url': audio_url, **audio_pipeline.describe(audio_file)}
+
+
+def resolve(phoneme, word):
+    start = time.perf_counter()
+    result = describe(get_phoneme(word))
+    metrics.inc('audio_jobs_total', outcome='ready' if result['audio_url'] else 'unavailable')
+    logger.info(f'Audio of {phoneme} resolved in {time.perf_counter() - start:.2f} s: {result["audio_url"]}')
+    return result
+
+
+def finished(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def start(phoneme, word):
+    """Return the future of the audio of 'phoneme', resolving to describe(audio file)."""
+    with _lock:
+        job = JOBS.get(phoneme)
+        if job is not None:
+            return job
+    audio_file = cached_audio(word)
+    if audio_file:
+        return finished(describe(audio_file))
+    with _lock:
+        job = JOBS.get(phoneme)
+        if job is not None:
+            return job
+        metrics.inc('audio_jobs_total', outcome='started')
+        job = JOBS[phoneme] = bulkheads.BULKHEADS['audio'].submit(resolve, phoneme, word)
+    job.add_done_callback(lambda done: forget(phoneme, done))  #outside the lock: runs at once if already done
+    return job
+
+
+def forget(phoneme, job):
+    with _lock:
+        if JOBS.get(phoneme) is job:
+            del JOBS[phoneme]
+
+
+def status(job):
+    if not job.done():
+        return 'pending'
+    return 'ready' if not job.exception() and job.result()['audio_url'] else 'unavailable'
+
+
+def audio(job):
+    """URL, duration and size of the audio of a job, all None while pending or if it found nothing."""
+    return job.result() if status(job) == 'ready' else describe(None)
+
+
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def events(phoneme, word):
+    job = await run_in_threadpool(start, phoneme, word)  #'cached_audio()' reads the disk
+    waiting = asyncio.wrap_future(job)
+    deadline = time.monotonic() + STREAM_TIMEOUT
+    while not waiting.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(waiting), min(HEARTBEAT, max(0, deadline - time.monotonic())))
+        except TimeoutError:
+            if time.monotonic() >= deadline:
+                yield sse('audio_unavailable', {'phoneme': phoneme, **describe(None), 'reason': 'timeout'})
+                return
+            yield ': waiting\n\n'
+        except Exception:
+            break
+
+    event = 'audio_ready' if status(job) == 'ready' else 'audio_unavailable'
+    yield sse(event, {'phoneme': phoneme, **audio(job)})
@@ -0,0 +1,313 @@
+"""
+Audio pipeline
+
+The Free Dictionary API serves .mp3 or .wav clips of very different size and loudness.
+Every clip 'phoneme_api.download_audio()' saves is handed to 'submit()', which processes it in a process pool
+so that request handling never waits for it:
+    1. The container format is checked from the first bytes of the file, not from its URL.
+    2. If ffmpeg is on PATH, the clip is converted to mono MP3 at TARGET_BITRATE, leading/trailing silence is trimmed
+       and loudness is normalised to TARGET_LOUDNESS. Without ffmpeg the clip is kept as it is.
+    3. The result is saved under a content-hashed name and its format, duration and size are recorded in the manifest
+       ('.manifest.json' in the audio directory), which '/learn' and '/phonemescovered' read.
+
+The original download stays on disk for GRACE_SECONDS after it is superseded, so a URL already handed out keeps working.
+
+The manifest is shared by every worker process of the app (serve.py, uvicorn --workers): 'record()' holds a lock file
+(MANIFEST_LOCK, with fcntl where there is one) while it re-reads the manifest, adds its entry and swaps in the new file,
+and each process reloads its copy whenever the file changes (new inode, size or mtime).
+
+Dependencies:
+    ffmpeg (optional, external binary)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_LOCK = '.manifest.lock'
+PIPELINE_WORKERS = 2
+TARGET_BITRATE = '64k'
+TARGET_SAMPLE_RATE = 22050
+TARGET_LOUDNESS = -16
+SILENCE_THRESHOLD = '-50dB'
+GRACE_SECONDS = 3600
+FFMPEG_TIMEOUT = 30
+
+MP3_BITRATES = {
+    'v1': (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    'v2': (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+_executor = None
+_manifests = {}  # audio dir: (signature of the manifest read, manifest)
+_lock = threading.Lock()
+
+
+def sniff_format(head):
+    """Recognise the container of an audio file from its first 12 bytes.
+
+    Returns:
+        str | None: 'mp3', 'wav', 'ogg' or None if unknown.
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    return None
+
+
+def mp3_duration(content):
+    """Duration in seconds of an MPEG Layer III stream, summed frame by frame (works for VBR too)."""
+    position = 0
+    if content[:3] == b'ID3' and len(content) >= 10:
+        position = 10 + ((content[6] & 0x7f) << 21 | (content[7] & 0x7f) << 14 | (content[8] & 0x7f) << 7 | content[9] & 0x7f)
+
+    duration = 0.0
+    while position + 4 <= len(content):
+        if content[position] != 0xFF or content[position + 1] & 0xE0 != 0xE0:
+            position += 1
+            continue
+        version = content[position + 1] >> 3 & 3
+        layer = content[position + 1] >> 1 & 3
+        bitrate_index = content[position + 2] >> 4
+        sample_rate_index = content[position + 2] >> 2 & 3
+        padding = content[position + 2] >> 1 & 1
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            position += 1
+            continue
+
+        bitrate = MP3_BITRATES['v1' if version == 3 else 'v2'][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+        samples = 1152 if version == 3 else 576
+        duration += samples / sample_rate
+        position += samples // 8 * bitrate // sample_rate + padding
+    return duration
+
+
+def audio_duration(path, audio_format):
+    if audio_format == 'wav':
+        with wave.open(str(path)) as clip:
+            return clip.getnframes() / clip.getframerate()
+    if audio_format == 'mp3':
+        return mp3_duration(Path(path).read_bytes())
+    return None
+
+
+def transcode(source, target):
+    """Convert 'source' to a trimmed, loudness-normalised mono MP3 with ffmpeg. Return False if ffmpeg is missing or fails."""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return False
+    trim = f'silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD}'
+    command = [ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', str(source),
+               '-af', f'{trim},areverse,{trim},areverse,loudnorm=I={TARGET_LOUDNESS}:TP=-1.5:LRA=11',
+               '-ac', '1', '-ar', str(TARGET_SAMPLE_RATE), '-codec:a', 'libmp3lame', '-b:a', TARGET_BITRATE,
+               '-f', 'mp3', str(target)]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=FFMPEG_TIMEOUT)
+        return True
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.error(f'{e.__class__.__name__} transcoding {source} -> {e}')
+        return False
+
+
+def process(path, stem):
+    """Verify, convert and describe one downloaded clip. Runs in a worker process.
+
+    Args:
+        path (str): Downloaded audio file.
+        stem (str): Name of the phoneme's audio without hash and extension.
+
+    Returns:
+        dict: Manifest entry of the processed clip.
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        source_format = sniff_format(f.read(12))
+    if source_format is None:
+        raise ValueError(f'{path.name} is not a recognised audio file')
+
+    audio_format = source_format
+    with tempfile.TemporaryDirectory(dir=path.parent) as tmp:
+        converted = Path(tmp) / 'converted.mp3'
+        if transcode(path, converted):
+            audio_format = 'mp3'
+            content = converted.read_bytes()
+        else:
+            content = path.read_bytes()
+
+        final = path.parent / f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}.{audio_format}'
+        if final != path:
+            staged = Path(tmp) / final.name
+            staged.write_bytes(content)
+            staged.replace(final)
+
+    duration = audio_duration(final, audio_format)
+    return {
+        'file': final.name,
+        'format': audio_format,
+        'source_format': source_format,
+        'source_file': path.name,
+        'duration': round(duration, 3) if duration else None,
+        'size': final.stat().st_size,
+        'processed_at': time.time(),
+    }
+
+
+def manifest_path(audio_dir):
+    return Path(audio_dir) / MANIFEST_NAME
+
+
+def signature(path):
+    """What tells a manifest replaced by 'record()' from the one read before; None if there is none."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns  #mtime alone can miss two writes within one clock tick
+
+
+def read_manifest(audio_dir):
+    """Return (signature, manifest) as on disk now; (None, {}) if there is no manifest yet."""
+    path = manifest_path(audio_dir)
+    try:
+        with open(path, encoding='utf-8') as file:
+            return signature(file.fileno()), json.load(file)
+    except FileNotFoundError:
+        return None, {}
+    except (OSError, json.JSONDecodeError):
+        logger.exception('Audio manifest unreadable; starting a new one')
+        return None, {}
+
+
+def load_manifest(audio_dir):
+    """The manifest of 'audio_dir', read again only if another process (or 'record()') replaced it."""
+    audio_dir = Path(audio_dir)
+    current = signature(manifest_path(audio_dir))
+    with _lock:
+        cached = _manifests.get(audio_dir)
+        if cached is None or cached[0] != current:
+            cached = _manifests[audio_dir] = read_manifest(audio_dir)
+        return cached[1]
+
+
+@contextmanager
+def manifest_lock(audio_dir):
+    """Hold the manifest of 'audio_dir' against every other thread ('_lock') and process (flock on MANIFEST_LOCK)."""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(Path(audio_dir) / MANIFEST_LOCK, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  #released when the file is closed
+            yield
+
+
+def record(audio_dir, stem, entry):
+    audio_dir = Path(audio_dir)
+    with manifest_lock(audio_dir):
+        _, manifest = read_manifest(audio_dir)
+        manifest[stem] = entry
+        tmp = audio_dir / f'{MANIFEST_NAME}.{os.getpid()}.tmp'
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp, manifest_path(audio_dir))
+        _manifests[audio_dir] = (signature(manifest_path(audio_dir)), manifest)
+    logger.info(f"Audio for {stem} processed: {entry['source_format']} -> {entry['file']} "
+                f"({entry['size']} bytes, {entry['duration']} s)")
+
+
+def manifest_entry(audio_dir, stem):
+    """Manifest entry of the processed audio of 'stem' if its file is still on disk, else None."""
+    entry = load_manifest(audio_dir).get(stem)
+    if entry and (Path(audio_dir) / entry['file']).exists():
+        return entry
+    return None
+
+
+def describe(audio_file):
+    """Duration and size of a cached audio file for the API responses.
+
+    Returns:
+        dict: 'audio_duration' (None until the clip has been processed) and 'audio_size'.
+    """
+    if not audio_file:
+        return {'audio_duration': None, 'audio_size': None}
+    audio_file = Path(audio_file)
+    for entry in load_manifest(audio_file.parent).values():
+        if entry['file'] == audio_file.name:
+            return {'audio_duration': entry['duration'], 'audio_size': entry['size']}
+    try:
+        return {'audio_duration': None, 'audio_size': audio_file.stat().st_size}
+    except OSError:
+        return {'audio_duration': None, 'audio_size': None}
+
+
+def cleanup(audio_dir):
+    """Delete superseded downloads older than GRACE_SECONDS."""
+    manifest = load_manifest(audio_dir)
+    now = time.time()
+    for entry in list(manifest.values()):
+        source = Path(audio_dir) / entry.get('source_file', entry['file'])
+        if source.name != entry['file'] and now - entry['processed_at'] > GRACE_SECONDS:
+            source.unlink(missing_ok=True)
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ProcessPoolExecutor  #imported on first download, not at startup
+        from multiprocessing import get_context
+        _executor = ProcessPoolExecutor(max_workers=PIPELINE_WORKERS, mp_context=get_context('spawn'))
+    return _executor
+
+
+def submit(path, stem):
+    """Queue a downloaded clip for processing and return immediately.
+
+    Args:
+        path (str): Downloaded audio file.
+        stem (str): Name of the phoneme's audio without hash and extension.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the manifest entry.
+    """
+    audio_dir = Path(path).parent
+    cleanup(audio_dir)
+    future = executor().submit(process, str(path), stem)
+
+    def done(future):
+        try:
+            record(audio_dir, stem, future.result())
+        except Exception as e:
+            logger.error(f'{e.__class__.__name__} processing audio for {stem} -> {e}')
+
+    future.add_done_callback(done)
+    return future
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,110 @@
+"""
+Audio pack benchmark
+
+Compares N clips kept as one file each in an audio directory (what AUDIO_DIR holds) with the same clips in one
+audio pack (audio_pack.py), for growing N:
+    - find: locating the clip of a stem, by globbing '<stem>.*.*' as 'phoneme_api.cached_audio()' does,
+      or with 'AudioPack.find()'.
+    - read: getting the bytes of a clip, open() + read() or a view of the pack's memory mapping.
+    - open: listing the directory, or opening the pack and reading its index.
+    - disk: space taken on disk (allocated blocks), and the files it takes.
+Clips are random bytes with content-hashed names, sized like the Free Dictionary ones. Reads are warm (page cache).
+
+Run from Web/Backend:
+    python -m benchmarks.audio_pack --clips 100 1000 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from audio_pack import AudioPack, build
+from phoneme_api import hashed_audio_name
+
+CLIP_SIZE = 12 * 1024
+LOOKUPS = 2000
+
+
+def make_clips(directory, count):
+    stems = []
+    for i in range(count):
+        stem = f'word{i}'
+        content = os.urandom(random.randint(CLIP_SIZE // 2, CLIP_SIZE * 2))
+        (directory / hashed_audio_name(stem, content)).write_bytes(content)
+        stems.append(stem)
+    return stems
+
+
+def per_call(function, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1e6
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def measure(count):
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / 'audio_repr'
+        directory.mkdir()
+        stems = make_clips(directory, count)
+        pack_path = Path(tmp) / 'audio.pack'
+
+        start = time.perf_counter()
+        build(directory, pack_path)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pack = AudioPack(pack_path)
+        pack_open_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        names = [entry.name for entry in os.scandir(directory)]
+        scan_ms = (time.perf_counter() - start) * 1000
+
+        sample = random.choices(stems, k=LOOKUPS)
+        keys = [pack.find(stem) for stem in sample]
+        paths = [directory / key for key in keys]
+        result = {
+            'clips': count,
+            'build_s': build_s,
+            'find_us': {'directory': per_call(lambda stem: next(directory.glob(f'{stem}.*.*')), sample),
+                        'pack': per_call(pack.find, sample)},
+            'read_us': {'directory': per_call(read_file, paths),
+                        'pack': per_call(lambda key: bytes(pack.view(key)), keys)},
+            'open_ms': {'directory': scan_ms, 'pack': pack_open_ms},
+            'disk_bytes': {'directory': sum(os.stat(directory / name).st_blocks * 512 for name in names),
+                           'pack': os.stat(pack_path).st_blocks * 512},
+            'files': {'directory': len(names), 'pack': 1},
+        }
+        pack.close()
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = [measure(count) for count in args.clips]
+    print(f"{'clips':>7}{'store':>11}{'find us':>10}{'read us':>10}{'open ms':>10}{'disk MiB':>10}{'files':>8}")
+    for r in results:
+        for store in ('directory', 'pack'):
+            print(f"{r['clips']:>7}{store:>11}{r['find_us'][store]:>10.1f}{r['read_us'][store]:>10.1f}"
+                  f"{r['open_ms'][store]:>10.2f}{r['disk_bytes'][store] / 2**20:>10.1f}{r['files'][store]:>8}")
+        print(f"{'':>7}{'build s':>11}{r['build_s']:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
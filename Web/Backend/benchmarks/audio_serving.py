@@ -0,0 +1,87 @@
+"""
+Audio serving benchmark
+
+Serves the same set of clips through StaticFiles (the previous '/audio' mount) and through 'audio_cache.AudioFiles'
+and reports throughput and p50/p99 latency for full and ranged GETs under concurrent load.
+Clips are random bytes written to a temporary directory, sized like the Free Dictionary ones.
+
+Run from Web/Backend:
+    python -m benchmarks.audio_serving --clips 40 --requests 5000 --concurrency 50
+
+Dependencies:
+    httpx
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+from audio_cache import AudioFiles
+from benchmarks.pool_latency import percentile
+
+
+def make_clips(directory, count, size):
+    names = []
+    for i in range(count):
+        name = f'clip{i}.{os.urandom(6).hex()}.mp3'
+        (Path(directory) / name).write_bytes(os.urandom(size))
+        names.append(name)
+    return names
+
+
+async def hammer(app, names, total, concurrency, ranged):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    picks = random.Random(0)
+    headers = {'Range': 'bytes=1024-4095'} if ranged else {}
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def one():
+            name = names[min(int(picks.expovariate(0.2)), len(names) - 1)]
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f'/audio/{name}', headers=headers)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code in (200, 206), response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', type=int, default=40)
+    parser.add_argument('--size', type=int, default=16 * 1024)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        names = make_clips(directory, args.clips, args.size)
+        servers = {
+            'StaticFiles': lambda: StaticFiles(directory=directory),
+            'AudioFiles': lambda: AudioFiles(directory),
+        }
+        print(f'{"server":<13}{"request":<8}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}')
+        for label, factory in servers.items():
+            for ranged in (False, True):
+                app = Starlette(routes=[Mount('/audio', app=factory())])
+                latencies, elapsed = asyncio.run(hammer(app, names, args.requests, args.concurrency, ranged))
+                print(f'{label:<13}{"range" if ranged else "full":<8}'
+                      f'{len(latencies) / elapsed:>10.0f}'
+                      f'{percentile(latencies, 50) * 1000:>10.2f}'
+                      f'{percentile(latencies, 99) * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Dictionary API stand-in
+
+A local HTTP server answering like the Free Dictionary API, so load tests and bulk jobs never hit the real one:
+    - GET /api/v2/entries/en/<word> returns a JSON entry with '-uk' and '-us' audio URLs and the IPA text.
+    - GET /media/pronunciations/en/<word>-uk.mp3 returns a small but valid MP3 (silent frames).
+Words listed in 'missing' get a 404, like words the API doesn't know.
+'latency' (seconds) and 'error_rate' (fraction of 500 responses) simulate a slow or flaky upstream.
+
+Run on its own from Web/Backend:
+    python -m benchmarks.dictionary_stub --port 8765
+then start the app with DICTIONARY_API_URL=http://127.0.0.1:8765/api/v2/entries/en/
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+ENTRIES_PATH = '/api/v2/entries/en/'
+MEDIA_PATH = '/media/pronunciations/en/'
+MP3_FRAME = b'\xff\xfb\x90\x00' + bytes(413)
+
+
+class DictionaryStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host = '127.0.0.1', port = 0, latency = 0.0, error_rate = 0.0, missing = (), frames = 20):
+        super().__init__((host, port), StubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.missing = set(missing)
+        self.audio = MP3_FRAME * frames
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def api_url(self):
+        return f'{self.base_url}{ENTRIES_PATH}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='dictionary-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.reply(200, b'', 'text/plain')
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if random.random() < server.error_rate:
+            self.reply(500, b'{"title": "Stub error"}', 'application/json')
+            return
+
+        path = unquote(self.path.split('?')[0])
+        if path.startswith(ENTRIES_PATH):
+            word = path[len(ENTRIES_PATH):]
+            if word in server.missing:
+                self.reply(404, json.dumps({'title': 'No Definitions Found'}).encode(), 'application/json')
+                return
+            entry = [{'word': word, 'phonetics': [
+                {'text': f'/{word}/', 'audio': f'{server.base_url}{MEDIA_PATH}{word}-us.mp3'},
+                {'text': f'/{word}/', 'audio': f'{server.base_url}{MEDIA_PATH}{word}-uk.mp3'},
+            ]}]
+            self.reply(200, json.dumps(entry).encode(), 'application/json')
+        elif path.startswith(MEDIA_PATH):
+            self.reply(200, server.audio, 'audio/mpeg')
+        else:
+            self.reply(404, b'', 'text/plain')
+
+    def reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = DictionaryStub(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f'Dictionary stub on {stub.api_url}')
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        stub.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Homophone test memory benchmark
+
+Measures the memory held by N live homophone tests (what 'ONGOING_TESTS' keeps between /homophones and the answers),
+comparing the current record ('logic.HomophoneTest': a spelling bitmask and attempts, sharing one 'HomophoneGroup'
+per homophone) with the previous layout (a dict of six fields with its own copy of the solution set).
+Also reports the time to build the tests and to check one answer per test with each layout.
+Memory is the size of the records only, measured with tracemalloc: test ids and the 'ONGOING_TESTS' dict cost the same for both.
+
+Run from Web/Backend:
+    python -m benchmarks.homophone_memory
+    python -m benchmarks.homophone_memory --tests 100000 --json results.json
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from copy import deepcopy
+import logic
+from phonemes_dict import phonemes
+
+
+def groups():
+    return [(phoneme, homoph) for phoneme in phonemes for homoph in phonemes[phoneme]['homophones']]
+
+
+def legacy_test(phoneme, homoph):
+    """A test as create_homophones_test stored it before 'HomophoneTest'."""
+    all_spellings = phonemes[phoneme]['homophones'][homoph]
+    return {'homoph': homoph,
+            'solution': all_spellings,
+            'solutions_left': deepcopy(all_spellings),
+            'amount': len(all_spellings),
+            'to_guess': len(all_spellings),
+            'attempts_left': 5}
+
+
+def legacy_check(test, answer):
+    if answer in test['solutions_left']:
+        test['to_guess'] -= 1
+        test['solutions_left'].discard(answer)
+        return test['to_guess'] == 0
+    test['attempts_left'] -= 1
+    return False
+
+
+def current_test(phoneme, homoph):
+    return logic.HomophoneTest(logic.homophone_group(phoneme, homoph))
+
+
+def current_check(test, answer):
+    bit = test.group.bits.get(answer, 0)
+    if test.left & bit:
+        test.left &= ~bit
+        return not test.left
+    test.attempts_left -= 1
+    return False
+
+
+LAYOUTS = {
+    'dict': (legacy_test, legacy_check),
+    'slotted bitmask': (current_test, current_check),
+}
+
+
+def measure(build, check, pairs, size):
+    for phoneme, homoph in pairs:  # shared, long-lived state (the homophone index) is not counted
+        build(phoneme, homoph)
+    gc.collect()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tests = [build(*pairs[i % len(pairs)]) for i in range(size)]
+    build_time = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    held = current - size * 8  # minus the list of references
+
+    answers = [sorted(phonemes[phoneme]['homophones'][homoph])[0] for phoneme, homoph in pairs]
+    start = time.perf_counter()
+    for i, test in enumerate(tests):
+        check(test, answers[i % len(pairs)])
+    check_time = time.perf_counter() - start
+    del tests
+    gc.collect()
+    return {'bytes': held, 'bytes_per_test': held / size, 'peak_bytes': peak,
+            'build_s': build_time, 'check_us': check_time / size * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tests', type=int, default=1_000_000, help='live tests to hold')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    pairs = groups()
+    results = {name: measure(build, check, pairs, args.tests) for name, (build, check) in LAYOUTS.items()}
+
+    print(f'{args.tests} live homophone tests over {len(pairs)} homophones\n')
+    print(f"{'layout':<18}{'MiB':>10}{'B/test':>10}{'build s':>10}{'check us':>10}")
+    for name, result in results.items():
+        print(f"{name:<18}{result['bytes'] / 2**20:>10.1f}{result['bytes_per_test']:>10.0f}"
+              f"{result['build_s']:>10.2f}{result['check_us']:>10.3f}")
+    saved = 1 - results['slotted bitmask']['bytes'] / results['dict']['bytes']
+    print(f'\nslotted bitmask holds {saved:.0%} less memory')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'tests': args.tests, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+HTTP load test
+
+Drives concurrent virtual learners through the same journey as the frontend and reports, per endpoint,
+throughput, latency percentiles and error rates:
+    1. GET /reviewstatus, then, if there is progress, GET /phonemescovered, /reviewspell and /reviewhomoph
+       and answer every review test.
+    2. Unless everything has been learnt: GET /learn, /spell/{phoneme} and /homophones/{phoneme}, answer every test
+       and, with probability --save-rate, POST /saveprogress. When /learn says the audio is pending,
+       the stream of /audioevents/{phoneme} is read meanwhile, its latency being the time until the audio is ready.
+Answers go through /checkspellanswer and /checkhomophanswer with an Idempotency-Key; a fraction (--retry-rate)
+is sent twice with the same key, like a client retrying after a timeout.
+Learners know the right answer with probability --accuracy and think for --think seconds before each answer
+(with 0 they answer faster than the rate limit of admission control allows, and get 429s).
+
+Targets:
+    - in-process (default): the app is imported and called through ASGI, no sockets.
+    - --uvicorn N: a local 'uvicorn fast_api:app --workers N' is started for the run.
+      Ongoing tests live in the memory of one worker, so with N > 1 answers reaching another worker get a 404.
+    - --url URL: an already running server (nothing is stubbed, so it may call the real dictionary API).
+For the first two, progress and audio go to a temporary directory and the dictionary API is replaced by
+'benchmarks.dictionary_stub', so a run never touches real data or the real API.
+Every learner sends its own X-Forwarded-For address, trusted by the app in those two modes,
+so admission control rate-limits each learner separately, as it would real clients.
+
+Run from Web/Backend:
+    python -m benchmarks.load_test --concurrency 50 --duration 30
+    python -m benchmarks.load_test --uvicorn 4 --concurrency 200 --duration 60 --json results.json
+
+Dependencies:
+    httpx
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+import httpx
+from benchmarks.dictionary_stub import DictionaryStub
+from phonemes_dict import phonemes
+
+
+SPELLING = {word: spellings[0] for entry in phonemes.values() for word, spellings in entry['spelling'].items()}
+HOMOPHONES = {homoph: spellings for entry in phonemes.values() for homoph, spellings in entry['homophones'].items()}
+WRONG_ANSWERS = ('aaa', 'zzz', 'qwerty')
+MAX_ANSWERS = 12
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, endpoint, elapsed, status):
+        self.latencies[endpoint].append(elapsed)
+        self.statuses[endpoint][status] += 1
+
+    def report(self, elapsed):
+        rows = []
+        for endpoint in sorted(self.latencies):
+            latencies = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if status == 'exception' or status >= 400)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(latencies),
+                'rps': len(latencies) / elapsed,
+                'error_rate': errors / len(latencies),
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p90_ms': percentile(latencies, 90) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'max_ms': max(latencies) * 1000,
+                'statuses': {str(status): count for status, count in statuses.items()},
+            })
+        return rows
+
+
+class Learner:
+    def __init__(self, client, stats, rng, args, address = '127.0.0.1'):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.args = args
+        self.headers = {'X-Forwarded-For': address}
+
+    async def call(self, method, url, endpoint, **kwargs):
+        start = time.perf_counter()
+        try:
+            headers = {**self.headers, **kwargs.pop('headers', {})}
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(endpoint, time.perf_counter() - start, 'exception')
+            return None
+        self.stats.record(endpoint, time.perf_counter() - start, response.status_code)
+        return response if response.status_code < 400 else None
+
+    async def answer(self, endpoint, test_id, answer):
+        if self.args.think:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.args.think)
+        body = {'test_id': test_id, 'answer': answer}
+        headers = {'Idempotency-Key': uuid.uuid4().hex}
+        response = await self.call('POST', endpoint, endpoint, json=body, headers=headers)
+        if response is not None and self.rng.random() < self.args.retry_rate:
+            await self.call('POST', endpoint, endpoint, json=body, headers=headers)
+        return response.json() if response is not None else None
+
+    async def spell_tests(self, tests):
+        for test in tests or []:
+            for _ in range(MAX_ANSWERS):
+                knows = self.rng.random() < self.args.accuracy
+                answer = SPELLING.get(test['word']) if knows else self.rng.choice(test['options'])
+                verdict = await self.answer('/checkspellanswer', test['test_id'], answer or test['options'][0])
+                if verdict is None or verdict['answered'] in ('correct', 'failed_all'):
+                    break
+
+    async def homophone_tests(self, tests):
+        for test in tests or []:
+            left = list(HOMOPHONES.get(test['homoph'], ()))
+            for _ in range(MAX_ANSWERS):
+                if left and self.rng.random() < self.args.accuracy:
+                    answer = left.pop()
+                else:
+                    answer = self.rng.choice(WRONG_ANSWERS)
+                verdict = await self.answer('/checkhomophanswer', test['test_id'], answer)
+                if verdict is None or verdict['answered'] in ('done', 'failed', 'failed_all'):
+                    break
+
+    async def get_json(self, url, endpoint):
+        response = await self.call('GET', url, endpoint)
+        return response.json() if response is not None else None
+
+    async def wait_for_audio(self, phoneme):
+        response = await self.call('GET', f'/audioevents/{phoneme}', '/audioevents/{phoneme}')
+        if response is None:
+            return None
+        data = [line[len('data: '):] for line in response.text.splitlines() if line.startswith('data: ')]
+        return json.loads(data[-1])['audio_url'] if data else None
+
+    async def session(self):
+        status = await self.get_json('/reviewstatus', '/reviewstatus')
+        if status is None:
+            return
+        if status['status'] != 'no_progress':
+            await self.get_json('/phonemescovered', '/phonemescovered')
+            await self.spell_tests(await self.get_json('/reviewspell', '/reviewspell'))
+            await self.homophone_tests(await self.get_json('/reviewhomoph', '/reviewhomoph'))
+        if status['status'] == 'review_only':
+            return
+
+        lesson = await self.get_json('/learn', '/learn')
+        if lesson is None:
+            return
+        phoneme = lesson['phoneme']
+        audio = None
+        if lesson.get('audio_status') == 'pending':
+            audio = asyncio.create_task(self.wait_for_audio(phoneme))
+        await self.spell_tests(await self.get_json(f'/spell/{phoneme}', '/spell/{phoneme}'))
+        await self.homophone_tests(await self.get_json(f'/homophones/{phoneme}', '/homophones/{phoneme}'))
+        audio_url = await audio if audio is not None else lesson['audio_url']
+        if self.rng.random() < self.args.save_rate:
+            await self.call('POST', '/saveprogress', '/saveprogress',
+                            json={'new_phoneme': phoneme, 'audio_path': audio_url})
+
+
+async def drive(transport, base_url, args):
+    stats = Stats()
+    deadline = time.perf_counter() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        async def virtual_user(index):
+            learner = Learner(client, stats, random.Random(args.seed + index), args, f'10.{index // 65536}.{index // 256 % 256}.{index % 256}')
+            while time.perf_counter() < deadline:
+                await learner.session()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    return stats.report(elapsed), elapsed
+
+
+async def run_in_process(args):
+    import fast_api  #imported here, once the environment points it at the temporary directory and the stub
+    async with fast_api.lifespan(fast_api.app):
+        return await drive(httpx.ASGITransport(app=fast_api.app, raise_app_exceptions=False), 'http://loadtest', args)
+
+
+def wait_until_up(url, timeout = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'{url}/reviewstatus', timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not start within {timeout} s')
+
+
+def run(args):
+    if args.url:
+        return asyncio.run(drive(None, args.url, args))
+
+    stub = DictionaryStub(latency=args.api_latency).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            'EPT_DATA_DIR': str(Path(tmp) / 'data'),
+            'EPT_AUDIO_DIR': str(Path(tmp) / 'audio'),
+            'EPT_LOOKUP_DB': str(Path(tmp) / 'lookups.sqlite3'),
+            'DICTIONARY_API_URL': stub.api_url,
+            'EPT_TRUST_FORWARDED': '1',
+        })
+        (Path(tmp) / 'audio').mkdir()
+        try:
+            if not args.uvicorn:
+                return asyncio.run(run_in_process(args))
+
+            port = args.port
+            server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'fast_api:app', '--port', str(port),
+                                       '--workers', str(args.uvicorn), '--log-level', 'warning'])
+            try:
+                wait_until_up(f'http://127.0.0.1:{port}')
+                return asyncio.run(drive(None, f'http://127.0.0.1:{port}', args))
+            finally:
+                server.terminate()
+                server.wait(10)
+        finally:
+            stub.stop()
+
+
+def print_report(rows, elapsed):
+    total = sum(row['requests'] for row in rows)
+    print(f'{total} requests in {elapsed:.1f} s ({total / elapsed:.0f} req/s)\n')
+    print(f'{"endpoint":<22}{"requests":>9}{"req/s":>9}{"errors":>8}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"max ms":>9}')
+    for row in rows:
+        print(f'{row["endpoint"]:<22}{row["requests"]:>9}{row["rps"]:>9.1f}{row["error_rate"]:>8.1%}'
+              f'{row["p50_ms"]:>9.1f}{row["p90_ms"]:>9.1f}{row["p99_ms"]:>9.1f}{row["max_ms"]:>9.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=20, help='virtual learners running at the same time')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load')
+    parser.add_argument('--url', help='target an already running server instead of starting one')
+    parser.add_argument('--uvicorn', type=int, metavar='WORKERS', help='start a local uvicorn with this many workers')
+    parser.add_argument('--port', type=int, default=8321)
+    parser.add_argument('--accuracy', type=float, default=0.6)
+    parser.add_argument('--think', type=float, default=0.3, help='average seconds before each answer')
+    parser.add_argument('--retry-rate', type=float, default=0.05)
+    parser.add_argument('--save-rate', type=float, default=0.1)
+    parser.add_argument('--api-latency', type=float, default=0.05, help='seconds added by the dictionary stub')
+    parser.add_argument('--timeout', type=float, default=15)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, help='also write the results to this file')
+    args = parser.parse_args()
+
+    rows, elapsed = run(args)
+    print_report(rows, elapsed)
+    if args.json:
+        args.json.write_text(json.dumps({'elapsed': elapsed, 'args': {k: str(v) for k, v in vars(args).items()},
+                                         'endpoints': rows}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
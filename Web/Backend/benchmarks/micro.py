@@ -0,0 +1,271 @@
+"""
+Microbenchmarks
+
+Times the hot paths of logic.py, phoneme_api.py and fast_api.py in isolation, at growing input sizes:
+    - create_spell_tests / create_homophones_test: one batch of N pairs.
+    - check_spell_answer / check_homophone_answer: one answer with N tests ongoing.
+    - review_spell: one review with N phonemes seen (synthetic phonemes are added beyond the real ones).
+    - load_progress / save_progress: a progress.json with N phonemes seen.
+    - get_uk_audio: an API payload with N entries, the British audio in the last one.
+    - check_idempotency: one answer with N keys already stored.
+Each case runs 'number' calls, 'repeat' times; the per-call time reported is the median of the repeats (and the best one).
+Logging is disabled while timing, so the results measure the code and not log_file.log.
+
+Results are saved as JSON baselines and compared with a threshold on the median:
+    python -m benchmarks.micro run --save benchmarks/baselines/micro.json
+    (change something)
+    python -m benchmarks.micro compare benchmarks/baselines/micro.json --threshold 0.2
+'compare' runs the suite again (or reads a second results file) and exits with status 1 if any case is slower
+than the baseline by more than the threshold. Baselines depend on the machine, so compare on the one they were saved on.
+
+Run from Web/Backend.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import fast_api
+import logic
+import schemas as s
+import phoneme_api
+from phonemes_dict import phonemes
+
+
+NUMBER = 200
+REPEAT = 5
+SIZES = {
+    'create_spell_tests': (5, 50, 500),
+    'create_homophones_test': (5, 50, 500),
+    'check_spell_answer': (100, 10_000, 100_000),
+    'check_homophone_answer': (100, 10_000, 100_000),
+    'review_spell': (4, 100, 1000),
+    'load_progress': (4, 1000, 50_000),
+    'save_progress': (4, 1000, 50_000),
+    'get_uk_audio': (10, 1000, 10_000),
+    'check_idempotency': (0, 1000, 50_000),
+}
+CASES = {}
+
+
+def case(function):
+    CASES[function.__name__] = function
+    return function
+
+
+def measure(call, setup = None, number = NUMBER, repeat = REPEAT):
+    """Time 'call(state, i)' for i in range(number), 'repeat' times, with a fresh 'setup()' state each time.
+
+    Returns:
+        dict: Median and best time per call, in microseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        for i in range(number):
+            call(state, i)
+        timings.append((time.perf_counter() - start) / number * 1e6)
+    return {'median_us': statistics.median(timings), 'best_us': min(timings)}
+
+
+@contextmanager
+def synthetic_phonemes(total):
+    """Make the phonemes dictionary hold at least 'total' phonemes by cloning the real ones under new names."""
+    real = list(phonemes)
+    added = [f'{real[i % len(real)]}#{i}' for i in range(max(0, total - len(real)))]
+    for i, name in enumerate(added):
+        phonemes[name] = phonemes[real[i % len(real)]]
+    try:
+        yield list(phonemes)[:total]
+    finally:
+        for name in added:
+            del phonemes[name]
+
+
+@contextmanager
+def progress_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        original, logic.file_path = logic.file_path, Path(tmp) / 'progress.json'
+        try:
+            yield logic.file_path
+        finally:
+            logic.file_path = original
+
+
+def fill_ongoing_tests(size):
+    logic.ONGOING_TESTS.clear()
+    pairs = logic.spell_pairs(next(iter(phonemes)))
+    while len(logic.ONGOING_TESTS) < size:
+        logic.create_spell_tests(pairs)
+
+
+def batch_pairs(pair_function, size):
+    pairs = []
+    while len(pairs) < size:
+        for phoneme in phonemes:
+            pairs.extend(pair_function(phoneme))
+    return pairs[:size]
+
+
+@case
+def create_spell_tests(size):
+    pairs = batch_pairs(logic.spell_pairs, size)
+    return measure(lambda state, i: logic.create_spell_tests(pairs), setup=logic.ONGOING_TESTS.clear)
+
+
+@case
+def create_homophones_test(size):
+    pairs = batch_pairs(logic.homophones_pairs, size)
+    return measure(lambda state, i: logic.create_homophones_test(pairs), setup=logic.ONGOING_TESTS.clear)
+
+
+@case
+def check_spell_answer(size):
+    def setup():
+        fill_ongoing_tests(size)
+        tests, payload = logic.build_spell_tests(batch_pairs(logic.spell_pairs, NUMBER))
+        logic.ONGOING_TESTS.update(tests)
+        return [{'test_id': test_id, 'answer': test['solution']} for test_id, test in tests.items()]
+
+    return measure(lambda answers, i: logic.check_spell_answer(answers[i]), setup)
+
+
+@case
+def check_homophone_answer(size):
+    def setup():
+        fill_ongoing_tests(size)
+        tests, payload = logic.build_homophones_test(batch_pairs(logic.homophones_pairs, NUMBER))
+        logic.ONGOING_TESTS.update(tests)
+        return [{'test_id': test_id, 'answer': test.group.spellings[0]} for test_id, test in tests.items()]
+
+    return measure(lambda answers, i: logic.check_homophone_answer(answers[i]), setup)
+
+
+@case
+def review_spell(size):
+    with synthetic_phonemes(size) as seen:
+        seen = dict.fromkeys(seen)
+        return measure(lambda state, i: logic.review_spell(seen), setup=logic.ONGOING_TESTS.clear, number=20)
+
+
+@case
+def load_progress(size):
+    with synthetic_phonemes(size) as seen, progress_file() as path:
+        path.write_text(json.dumps({'Phonemes seen': {phoneme: f'{i}.mp3' for i, phoneme in enumerate(seen)}}))
+        return measure(lambda state, i: logic.load_progress(), number=20)
+
+
+@case
+def save_progress(size):
+    with synthetic_phonemes(size) as seen, progress_file():
+        seen = {phoneme: f'{i}.mp3' for i, phoneme in enumerate(seen)}
+        progress = {'new_phoneme': next(iter(phonemes)), 'audio_path': 'audio_repr/new.mp3'}
+        return measure(lambda state, i: logic.save_progress(progress, seen), number=20)
+
+
+@case
+def get_uk_audio(size):
+    block = {'text': '/wɜ:d/', 'audio': 'https://api.dictionaryapi.dev/media/pronunciations/en/word-us.mp3'}
+    data = [{'word': 'word', 'phonetics': [block, {'text': '/wɜ:d/'}]} for _ in range(size - 1)]
+    data.append({'word': 'word', 'phonetics': [{'audio': block['audio'].replace('-us', '-uk')}]})
+    return measure(lambda state, i: phoneme_api.get_uk_audio(data, '/wɜ:d/'), number=50)
+
+
+@case
+def check_idempotency(size):
+    def answer(user_input):
+        return {'answered': 'incorrect', 'attempts_left': 2}
+
+    user_input = s.Answer(test_id='spell_test_0', answer='ward')
+
+    def setup():
+        now = time.time()
+        fast_api.IDEMPOTENCY_STORE.clear()
+        fast_api.IDEMPOTENCY_STORE.update({f'answer:stored-{i}': {'time': now, 'status': 200, 'body': {}} for i in range(size)})
+
+    return measure(lambda state, i: fast_api.check_idempotency(f'key-{i}', user_input, answer), setup)
+
+
+def run(selected = None):
+    results = {}
+    logging.disable(logging.CRITICAL)
+    try:
+        for name, function in CASES.items():
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            for size in SIZES[name]:
+                key = f'{name}[{size}]'
+                results[key] = function(size)
+                print(f'{key:<36}{results[key]["median_us"]:>12.2f} us', flush=True)
+    finally:
+        logic.ONGOING_TESTS.clear()
+        fast_api.IDEMPOTENCY_STORE.clear()
+        logging.disable(logging.NOTSET)
+    return {
+        'python': platform.python_version(),
+        'machine': f'{platform.node()} {platform.machine()}',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'number': NUMBER,
+        'repeat': REPEAT,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Print the change of every case present in both results. Return the names of the ones that regressed."""
+    regressions = []
+    print(f'\n{"case":<36}{"baseline us":>14}{"current us":>14}{"change":>10}')
+    for name, before in baseline['results'].items():
+        after = current['results'].get(name)
+        if after is None:
+            continue
+        change = after['median_us'] / before['median_us'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:<36}{before["median_us"]:>14.2f}{after["median_us"]:>14.2f}{change:>+10.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite')
+    run_parser.add_argument('--save', type=Path, help='write the results to this JSON file')
+    run_parser.add_argument('-k', dest='selected', action='append', help='only run cases whose name contains this')
+
+    compare_parser = commands.add_parser('compare', help='compare with a baseline')
+    compare_parser.add_argument('baseline', type=Path)
+    compare_parser.add_argument('current', type=Path, nargs='?', help='results file; the suite is run if omitted')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    compare_parser.add_argument('-k', dest='selected', action='append')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run(args.selected)
+        if args.save:
+            args.save.parent.mkdir(parents=True, exist_ok=True)
+            args.save.write_text(json.dumps(results, indent=2))
+            print(f'\nBaseline saved to {args.save}')
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text()) if args.current else run(args.selected)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} cases slower than the baseline by more than {args.threshold:.0%}')
+        sys.exit(1)
+    print('\nNo regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Exercise pool latency benchmark
+
+Fires concurrent GET requests at '/spell/{phoneme}' and '/homophones/{phoneme}' against the app in-process
+and reports p50/p99 latency with the exercise pool disabled and enabled.
+
+Run from Web/Backend:
+    python -m benchmarks.pool_latency --requests 2000 --concurrency 50
+
+Dependencies:
+    httpx
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+import exercise_pool
+import fast_api
+from phonemes_dict import phonemes
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+async def hammer(path_kind, total, concurrency):
+    transport = httpx.ASGITransport(app=fast_api.app)
+    latencies = []
+    paths = [f'/{path_kind}/{phoneme}' for phoneme in phonemes]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+def run(total, concurrency):
+    results = {}
+    for enabled in (False, True):
+        exercise_pool.ENABLED = enabled
+        exercise_pool.start()
+        if enabled:
+            time.sleep(0.5)  # let the first refill finish
+        for path_kind in ('spell', 'homophones'):
+            latencies = asyncio.run(hammer(path_kind, total, concurrency))
+            results[(path_kind, enabled)] = latencies
+        exercise_pool.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency)
+    print(f'{"endpoint":<12}{"pool":<6}{"p50 ms":>10}{"p99 ms":>10}{"mean ms":>10}')
+    for (path_kind, enabled), latencies in results.items():
+        print(f'{path_kind:<12}{"on" if enabled else "off":<6}'
+              f'{percentile(latencies, 50) * 1000:>10.2f}'
+              f'{percentile(latencies, 99) * 1000:>10.2f}'
+              f'{statistics.mean(latencies) * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Prefork benchmark
+
+Compares 'uvicorn fast_api:app --workers N' with 'python serve.py --workers N' (pre-forked workers sharing
+the state built by the parent, see serve.py) for growing N, and reports for each:
+    - startup: seconds from launch until every worker has logged 'Application startup complete.'.
+    - memory per worker, from /proc/<pid>/smaps_rollup once they are all up:
+      USS (private pages, what a worker really adds) and PSS (shared pages divided among their users).
+    - total PSS of the launcher and its workers: the memory the whole server costs.
+Linux only (smaps_rollup). Progress, audio and logs go to a temporary directory; no request is made.
+
+Run from Web/Backend:
+    python -m benchmarks.prefork --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+READY_LINE = 'Application startup complete.'
+SETTLE = 1.0
+TIMEOUT = 120
+
+
+def launchers(workers, port):
+    return {
+        'uvicorn': [sys.executable, '-m', 'uvicorn', 'fast_api:app', '--app-dir', str(BACKEND_DIR),
+                    '--port', str(port), '--workers', str(workers)],
+        'serve.py': [sys.executable, str(BACKEND_DIR / 'serve.py'), '--port', str(port), '--workers', str(workers)],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    found = []
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+            cmdline = (entry / 'cmdline').read_bytes()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(')', 1)[1].split()[1])
+        if ppid == pid and b'resource_tracker' not in cmdline:
+            found.append(int(entry.name))
+    return found
+
+
+def memory(pid):
+    """USS and PSS of a process in bytes."""
+    fields = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines()[1:]:
+        name, value = line.split(':', 1)
+        fields[name] = int(value.split()[0]) * 1024
+    return {'uss': fields['Private_Clean'] + fields['Private_Dirty'], 'pss': fields['Pss']}
+
+
+def measure(name, command, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, 'EPT_DATA_DIR': tmp, 'EPT_AUDIO_DIR': tmp, 'EPT_PROFILE_DIR': tmp}
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=tmp, env=env, text=True,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        ready = threading.Event()
+        ready_times = []
+
+        def read():
+            for line in process.stdout:
+                if READY_LINE in line:
+                    ready_times.append(time.perf_counter() - start)
+                    if len(ready_times) == workers:
+                        ready.set()
+
+        threading.Thread(target=read, daemon=True).start()
+        try:
+            if not ready.wait(TIMEOUT):
+                raise RuntimeError(f'{name} did not start {workers} workers in {TIMEOUT} s')
+            time.sleep(SETTLE)
+            pids = children(process.pid) or [process.pid]  # 'uvicorn --workers 1' serves in the launcher
+            worker_memory = [memory(pid) for pid in pids]
+            launcher_memory = memory(process.pid) if process.pid not in pids else {'pss': 0}
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        'launcher': name,
+        'workers': workers,
+        'startup_s': max(ready_times),
+        'first_worker_s': min(ready_times),
+        'uss_per_worker': statistics.mean(m['uss'] for m in worker_memory),
+        'pss_per_worker': statistics.mean(m['pss'] for m in worker_memory),
+        'total_pss': launcher_memory['pss'] + sum(m['pss'] for m in worker_memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    if not Path('/proc/self/smaps_rollup').exists():
+        sys.exit('This benchmark reads /proc/<pid>/smaps_rollup (Linux only)')
+
+    results = []
+    for workers in args.workers:
+        for name, command in launchers(workers, free_port()).items():
+            results.append(measure(name, command, workers))
+
+    mib = 2 ** 20
+    print(f"{'launcher':<10}{'workers':>8}{'startup s':>11}{'first s':>9}"
+          f"{'USS/worker MiB':>16}{'PSS/worker MiB':>16}{'total PSS MiB':>15}")
+    for r in results:
+        print(f"{r['launcher']:<10}{r['workers']:>8}{r['startup_s']:>11.2f}{r['first_worker_s']:>9.2f}"
+              f"{r['uss_per_worker'] / mib:>16.1f}{r['pss_per_worker'] / mib:>16.1f}{r['total_pss'] / mib:>15.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Startup benchmark
+
+Measures how long the two entry points take to import, in fresh interpreters:
+    - web: 'import fast_api' from Web/Backend (what 'uvicorn fast_api:app' does before serving).
+    - console: 'import main' from Console (everything the console app does before asking the first question).
+Each run uses 'python -X importtime', so besides the wall time the report lists the slowest modules
+(cumulative import time) and flags heavy dependencies that were imported at startup although they are only
+needed later (requests, playsound, multiprocessing).
+
+Run from Web/Backend:
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CONSOLE_DIR = BACKEND_DIR.parent.parent / 'Console'
+ENTRY_POINTS = {
+    'web': (BACKEND_DIR, 'import fast_api'),
+    'console': (CONSOLE_DIR, 'import main'),
+}
+DEFERRED = ('requests', 'playsound', 'multiprocessing', 'concurrent.futures')
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} from the output of '-X importtime'."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+
+def import_once(directory, statement):
+    with tempfile.TemporaryDirectory() as home:
+        env = {**os.environ, 'HOME': home, 'EPT_DATA_DIR': home, 'EPT_AUDIO_DIR': home}
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                                cwd=directory, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f'{statement!r} failed in {directory}:\n{result.stderr[-2000:]}')
+    return elapsed, parse_importtime(result.stderr)
+
+
+def measure(name, runs):
+    directory, statement = ENTRY_POINTS[name]
+    import_once(directory, statement)  # warm the .pyc files and the OS cache
+    walls = []
+    cumulative = defaultdict(list)
+    for _ in range(runs):
+        elapsed, modules = import_once(directory, statement)
+        walls.append(elapsed)
+        for module, us in modules.items():
+            cumulative[module].append(us)
+    return walls, {module: statistics.median(values) for module, values in cumulative.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='slowest modules listed per entry point')
+    parser.add_argument('entry_points', nargs='*', help='web and/or console (default: both)')
+    args = parser.parse_args()
+    unknown = set(args.entry_points) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f'unknown entry points: {", ".join(sorted(unknown))}')
+
+    for name in args.entry_points or ENTRY_POINTS:
+        walls, modules = measure(name, args.runs)
+        print(f'\n{name}: median {statistics.median(walls) * 1000:.1f} ms, '
+              f'best {min(walls) * 1000:.1f} ms (interpreter start included)')
+        print(f'  {"module":<40}{"cumulative ms":>14}')
+        for module, us in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f'  {module:<40}{us / 1000:>14.1f}')
+        deferred = [module for module in DEFERRED if module in modules]
+        print(f'  imported at startup: {", ".join(deferred) if deferred else "none of " + ", ".join(DEFERRED)}')
+
+
+if __name__ == '__main__':
+    main()
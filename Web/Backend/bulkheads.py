@@ -0,0 +1,157 @@
+"""
+Bulkheads module
+
+This module keeps slow, network-bound endpoints from starving the cheap ones.
+By default every synchronous endpoint runs in Starlette's single threadpool, so a burst of /learn or /phonemescovered
+requests waiting on the dictionary API could take every thread and stall /checkspellanswer, which only touches memory.
+    - 'Bulkhead': a sized thread pool of its own. 'audio' runs the endpoints that may call the dictionary API
+      and the background audio fetches of /learn (see 'audio_jobs'), 'admin' the writes of bulk progress imports
+      (see 'learner_store'), 'exercise' runs everything else. A full 'audio' or 'admin' pool only makes its own requests wait.
+    - 'BulkheadRoute': the route class of the app. It sends each synchronous endpoint to its bulkhead (see ROUTES),
+      copying the context variables of the request (profiling, admission) into the worker thread.
+    - 'outbound': a global limit on simultaneous calls to the dictionary API, shared by every thread.
+      A call waiting longer than OUTBOUND_TIMEOUT gives up with 'OutboundBusy', handled like a network error.
+      'phoneme_api' hands 'outbound.slot' to 'http_client.get()', which holds it per attempt, never across a retry wait.
+Queue depth, active threads and outbound slots of each are exported through 'metrics'.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+import metrics
+from profiling import ProfiledRoute
+
+
+logger = logging.getLogger(__name__)
+
+AUDIO_WORKERS = 16
+EXERCISE_WORKERS = 4
+ADMIN_WORKERS = 1
+MAX_OUTBOUND = 8
+OUTBOUND_TIMEOUT = 5.0
+ROUTES = {
+    '/phonemescovered': 'audio',
+}
+DEFAULT_BULKHEAD = 'exercise'
+
+
+class Bulkhead:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.queued = 0
+        self.active = 0
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def submit(self, function, *args, **kwargs):
+        context = contextvars.copy_context()
+
+        def call():
+            with self.lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return context.run(function, *args, **kwargs)
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+        def done(future):
+            if future.cancelled():  # dropped before it started, 'call' never ran
+                with self.lock:
+                    self.queued -= 1
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'bulkhead-{self.name}')
+            self.queued += 1
+        future = self.executor.submit(call)
+        future.add_done_callback(done)
+        return future
+
+    async def run(self, function, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(function, *args, **kwargs))
+
+    def offload(self, function):
+        """Turn a synchronous endpoint into one awaiting it in this bulkhead."""
+        @wraps(function)
+        async def endpoint(*args, **kwargs):
+            return await self.run(function, *args, **kwargs)
+        return endpoint
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class OutboundBusy(Exception):
+    pass
+
+
+class OutboundLimit:
+    def __init__(self, limit = MAX_OUTBOUND, timeout = OUTBOUND_TIMEOUT):
+        self.limit = limit
+        self.timeout = timeout
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self.lock:
+            self.waiting += 1
+        acquired = self.semaphore.acquire(timeout=self.timeout)
+        with self.lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_use += 1
+        if not acquired:
+            metrics.inc('outbound_rejected_total')
+            raise OutboundBusy(f'No outbound slot free within {self.timeout} s')
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.semaphore.release()
+
+
+BULKHEADS = {
+    'audio': Bulkhead('audio', AUDIO_WORKERS),
+    'exercise': Bulkhead('exercise', EXERCISE_WORKERS),
+    'admin': Bulkhead('admin', ADMIN_WORKERS),
+}
+outbound = OutboundLimit()
+
+
+@metrics.add_collector
+def collect():
+    samples = [('outbound_in_use', {}, outbound.in_use), ('outbound_waiting', {}, outbound.waiting)]
+    for name, bulkhead in BULKHEADS.items():
+        samples += [('bulkhead_queue_depth', {'pool': name}, bulkhead.queued),
+                    ('bulkhead_active', {'pool': name}, bulkhead.active),
+                    ('bulkhead_workers', {'pool': name}, bulkhead.workers)]
+    return samples
+
+
+class BulkheadRoute(ProfiledRoute):
+    """Route running its synchronous endpoint in the bulkhead given by ROUTES (DEFAULT_BULKHEAD otherwise)."""
+
+    def wrap(self, path, endpoint):
+        endpoint = super().wrap(path, endpoint)
+        if asyncio.iscoroutinefunction(endpoint):
+            return endpoint
+        return BULKHEADS[ROUTES.get(path, DEFAULT_BULKHEAD)].offload(endpoint)
+
+
+def shutdown():
+    for bulkhead in BULKHEADS.values():
+        bulkhead.shutdown()
@@ -0,0 +1,173 @@
+"""
+Catalogue module
+
+This module holds the content the app serves (patterns, spelling exercises, homophones, audio words) behind a single
+reference, so new content can be put in place while the app runs, without a restart and without losing 'ONGOING_TESTS':
+    - 'current()' returns the Catalogue in use. Code reads it once per request and passes that object along,
+      so a request never mixes two versions; replacing the content is one assignment ('swap()').
+    - 'load()' builds a Catalogue from a compiled catalogue (the output of content_build.py), including the index
+      of its homophones, so nothing is left to build on the request path.
+    - 'watch()' starts a thread checking the version in the manifest of CATALOGUE_DIR every WATCH_INTERVAL seconds.
+      When it changes the new catalogue is loaded in that thread, swapped in, and the 'on_swap()' listeners are called
+      (the exercise pools drop their batches). A catalogue that fails to load is logged and the current one kept.
+Tests handed out before a swap are pinned to the content they were built from: a spelling test stores its solution
+and a homophone test its 'HomophoneGroup', both with the version they came from, so they are answered as they were asked.
+Until a compiled catalogue exists, the content is phonemes_dict.py under the version BUILTIN.
+Version, reloads and reload durations are exported through 'metrics'.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+import metrics
+from content_build import MANIFEST_NAME, from_json
+from phonemes_dict import phonemes as builtin_phonemes
+
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_DIR = Path(os.environ.get('EPT_CATALOGUE_DIR', Path(__file__).resolve().parent / 'catalogue'))
+WATCH_INTERVAL = 5.0
+BUILTIN = 'builtin'
+
+
+class HomophoneGroup:
+    """The spellings of one homophone, each with its bit: a set of spellings is an int mask."""
+    __slots__ = ('homoph', 'spellings', 'bits', 'full', 'version')
+
+    def __init__(self, homoph, spellings, version = BUILTIN):
+        self.homoph = homoph
+        self.spellings = tuple(sorted(spellings))
+        self.bits = {spelling: 1 << i for i, spelling in enumerate(self.spellings)}
+        self.full = (1 << len(self.spellings)) - 1
+        self.version = version
+
+    def spelled(self, mask):
+        return [spelling for i, spelling in enumerate(self.spellings) if mask >> i & 1]
+
+
+class Catalogue:
+    def __init__(self, version, phonemes):
+        self.version = version
+        self.phonemes = phonemes
+        self.groups = {}
+        self.loaded_at = time.time()
+
+    def homophone_group(self, phoneme, homoph):
+        group = self.groups.get((phoneme, homoph))
+        if group is None:
+            group = HomophoneGroup(homoph, self.phonemes[phoneme]['homophones'][homoph], self.version)
+            self.groups[(phoneme, homoph)] = group
+        return group
+
+    def index(self):
+        for phoneme, entry in self.phonemes.items():
+            for homoph in entry['homophones']:
+                self.homophone_group(phoneme, homoph)
+        return self
+
+
+_current = Catalogue(BUILTIN, builtin_phonemes)
+_listeners = []
+_lock = threading.Lock()
+_failed_version = None
+_watcher = None
+_stop = threading.Event()
+
+
+def current():
+    return _current
+
+
+def on_swap(listener):
+    """Register 'listener(old, new)', called after every swap."""
+    _listeners.append(listener)
+    return listener
+
+
+def swap(new):
+    global _current
+    old, _current = _current, new
+    for listener in _listeners:
+        try:
+            listener(old, new)
+        except Exception:
+            logger.exception(f'Catalogue listener {listener.__name__} failed')
+    return old
+
+
+def manifest_version(directory = None):
+    try:
+        return json.loads((Path(directory or CATALOGUE_DIR) / MANIFEST_NAME).read_text(encoding='utf-8'))['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load(directory = None):
+    directory = Path(directory or CATALOGUE_DIR)
+    manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding='utf-8'))
+    content = {}
+    for phoneme, entry in manifest['phonemes'].items():
+        compiled = json.loads((directory / entry['file']).read_text(encoding='utf-8'))
+        compiled.pop('phoneme', None)
+        content[phoneme] = from_json(compiled)
+    return Catalogue(manifest['version'], content).index()
+
+
+def reload(directory = None):
+    """Load and swap in the compiled catalogue of 'directory' if its version is new. Return True if swapped."""
+    global _failed_version
+    with _lock:
+        version = manifest_version(directory)
+        if version is None or version in (_current.version, _failed_version):
+            return False
+        start = time.perf_counter()
+        try:
+            new = load(directory)
+        except Exception:
+            _failed_version = version
+            metrics.inc('catalogue_reloads_total', outcome='failed')
+            logger.exception(f'Catalogue {version} could not be loaded; keeping {_current.version}')
+            return False
+        old = swap(new)
+        elapsed = time.perf_counter() - start
+    metrics.inc('catalogue_reloads_total', outcome='swapped')
+    metrics.observe('catalogue_reload_seconds', elapsed)
+    logger.info(f'Catalogue {old.version} replaced by {new.version} ({len(new.phonemes)} phonemes) in {elapsed:.3f} s')
+    return True
+
+
+@metrics.add_collector
+def collect():
+    return [('catalogue_info', {'version': _current.version}, 1),
+            ('catalogue_loaded_timestamp_seconds', {}, _current.loaded_at),
+            ('catalogue_phonemes', {}, len(_current.phonemes))]
+
+
+def watch_loop(directory, interval):
+    while not _stop.wait(interval):
+        try:
+            reload(directory)
+        except Exception:
+            logger.exception('Catalogue watch failed')
+
+
+def watch(directory = None, interval = WATCH_INTERVAL):
+    global _watcher
+    if _watcher is not None:
+        return
+    _stop.clear()
+    _watcher = threading.Thread(target=watch_loop, args=(directory, interval), name='catalogue-watch', daemon=True)
+    _watcher.start()
+
+
+def stop():
+    global _watcher
+    if _watcher is None:
+        return
+    _stop.set()
+    _watcher.join()
+    _watcher = None
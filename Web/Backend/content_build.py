@@ -0,0 +1,279 @@
+"""
+Content build tool
+
+Validates the content of the app (the 'phonemes' dictionary of phonemes_dict.py) and compiles it into a catalogue,
+so a malformed entry is caught here instead of crashing a request (e.g. a spelling exercise without exactly three options
+fails 'schemas.SpellResponse', a phoneme with a single homophone makes 'review_homophones_pairs' raise).
+
+Checks, per phoneme (run in a process pool, see POOL_THRESHOLD):
+    - the phoneme and every transcription are well-formed IPA between slashes ('IPA_SYMBOLS', stress marks, length marks),
+    - 'patterns': examples per pattern (at least MIN_PATTERN_EXAMPLES, '/learn' shows two), no duplicates,
+    - 'spelling': at least SPELL_BATCH words ('/spell' asks five), each with exactly SPELL_OPTIONS distinct options,
+      the first being the solution,
+    - 'homophones': at least MIN_HOMOPHONES groups ('/reviewhomoph' takes two), each of at least two distinct spellings,
+    - 'api': the word the audio is fetched with.
+Across phonemes: the same transcription, solution word, homophone or audio word used by two phonemes.
+
+The catalogue is a directory: one JSON file per phoneme, named after the hash of its content, and 'catalogue.json'
+listing them with the version of the whole catalogue. Builds are incremental: a phoneme whose content (and the rules,
+RULES_VERSION) did not change since the last build is neither validated nor written again.
+Any error leaves the catalogue as it was (the app keeps serving the last good one, see 'catalogue.watch()')
+and makes the tool exit with status 1.
+
+Run from Web/Backend:
+    python content_build.py
+    python content_build.py --source phonemes_dict.py --out catalogue --workers 4
+    python content_build.py --check   (validate only, write nothing)
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION = 2
+BACKEND_DIR = Path(__file__).resolve().parent
+DEFAULT_SOURCE = BACKEND_DIR / 'phonemes_dict.py'
+DEFAULT_OUT = BACKEND_DIR / 'catalogue'
+MANIFEST_NAME = 'catalogue.json'
+POOL_THRESHOLD = 16
+
+SECTIONS = ('patterns', 'spelling', 'homophones', 'api')
+SPELL_OPTIONS = 3
+SPELL_BATCH = 5
+MIN_PATTERN_EXAMPLES = 2
+MIN_HOMOPHONES = 2
+MIN_HOMOPHONE_SPELLINGS = 2
+
+IPA_SYMBOLS = set('abdefghijklmnprstuvwzæðŋɑɒɔəɛɜɪʃʊʌʒθ') | {'ʤ', 'ʧ', 'ɡ'}
+STRESS_MARKS = set("'ˈˌ")
+LENGTH_MARKS = set(':ː')
+IPA_ALLOWED = IPA_SYMBOLS | STRESS_MARKS | LENGTH_MARKS
+NOT_AFTER_STRESS = STRESS_MARKS | LENGTH_MARKS
+WORD = re.compile(r"^[a-z][a-z' -]*$")
+
+
+def ipa_problems(text, where, slashes = True):
+    """Problems of a transcription like "/dɪ'vɔ:s/" (a phoneme key, 'slashes' False, may go without them)."""
+    between = len(text) > 1 and text.startswith('/') and text.endswith('/')
+    body = text[1:-1] if between else text
+    if not body or '/' in body or (slashes and not between):
+        return [f'{where}: {text!r} is not a transcription between slashes']
+    problems = []
+    unknown = sorted(set(body) - IPA_ALLOWED)
+    if unknown:
+        problems.append(f"{where}: {text!r} has symbols outside IPA_SYMBOLS: {' '.join(unknown)}")
+    for previous, char in zip(' ' + body, body):
+        if char in LENGTH_MARKS and previous not in IPA_SYMBOLS:
+            problems.append(f'{where}: {text!r} has a length mark not following a sound')
+        if previous in STRESS_MARKS and char in NOT_AFTER_STRESS:
+            problems.append(f'{where}: {text!r} has a stress mark not followed by a sound')
+    if body[-1] in STRESS_MARKS:
+        problems.append(f'{where}: {text!r} ends with a stress mark')
+    return problems
+
+
+def words_problems(words, where, kind, exact = None, minimum = None):
+    if not isinstance(words, kind):
+        return [f'{where}: expected a {kind.__name__}, got {type(words).__name__}']
+    problems = [f'{where}: {word!r} is not a lowercase word' for word in words
+                if not isinstance(word, str) or not WORD.match(word)]
+    if kind is tuple and len(set(words)) != len(words):
+        problems.append(f'{where}: duplicate words')
+    if exact is not None and len(words) != exact:
+        problems.append(f'{where}: {len(words)} words, expected exactly {exact}')
+    if minimum is not None and len(words) < minimum:
+        problems.append(f'{where}: {len(words)} words, expected at least {minimum}')
+    return problems
+
+
+def section_problems(entry, name, minimum, where):
+    section = entry.get(name)
+    if not isinstance(section, dict) or len(section) < minimum:
+        found = f'has {len(section)} entries' if isinstance(section, dict) else f'is a {type(section).__name__}'
+        return [f'{where}: {name} {found}, expected a dict of at least {minimum} entries'], {}
+    return [], section
+
+
+def validate_entry(item):
+    """Validate one (phoneme, entry) and return (phoneme, problems). Runs in the worker processes."""
+    phoneme, entry = item
+    label = f'[{phoneme}]'
+    if not isinstance(entry, dict):
+        return phoneme, [f'{label}: entry is a {type(entry).__name__}, expected a dict']
+    problems = ipa_problems(phoneme, label, slashes=False)
+    problems += [f'{label}: missing {name!r}' for name in SECTIONS if name not in entry]
+    problems += [f'{label}: unknown section {name!r}' for name in entry if name not in SECTIONS]
+
+    found, patterns = section_problems(entry, 'patterns', 1, label)
+    problems += found
+    for pattern, examples in patterns.items():
+        problems += words_problems(examples, f'{label} pattern {pattern!r}', tuple, minimum=MIN_PATTERN_EXAMPLES)
+
+    found, spelling = section_problems(entry, 'spelling', SPELL_BATCH, label)
+    problems += found
+    for transcription, options in spelling.items():
+        where = f'{label} spelling {transcription}'
+        problems += ipa_problems(transcription, where)
+        problems += words_problems(options, where, tuple, exact=SPELL_OPTIONS)
+
+    found, homophones = section_problems(entry, 'homophones', MIN_HOMOPHONES, label)
+    problems += found
+    for transcription, spellings in homophones.items():
+        where = f'{label} homophone {transcription}'
+        problems += ipa_problems(transcription, where)
+        problems += words_problems(spellings, where, set, minimum=MIN_HOMOPHONE_SPELLINGS)
+
+    if 'api' in entry and (not isinstance(entry['api'], str) or not WORD.match(entry['api'])):
+        problems.append(f"{label}: api {entry['api']!r} is not a word")
+    return phoneme, problems
+
+
+def cross_problems(content):
+    """Content used by two phonemes: the exercises and the audio cache are keyed by it."""
+    owners = {}
+    problems = []
+    for phoneme, entry in content.items():
+        if not isinstance(entry, dict):
+            continue
+        spelling = entry['spelling'] if isinstance(entry.get('spelling'), dict) else {}
+        homophones = entry['homophones'] if isinstance(entry.get('homophones'), dict) else {}
+        keys = [('transcription', key) for key in spelling]
+        keys += [('solution', options[0]) for options in spelling.values() if isinstance(options, tuple) and options]
+        keys += [('homophone', key) for key in homophones]
+        keys += [('api word', entry['api'])] if isinstance(entry.get('api'), str) else []
+        for key in keys:
+            other = owners.setdefault(key, phoneme)
+            if other != phoneme:
+                problems.append(f'{key[0]} {key[1]!r} is used by both [{other}] and [{phoneme}]')
+    return problems
+
+
+def from_json(entry):
+    """Entry of a JSON source (a compiled catalogue, an export...) with the tuples and sets of phonemes_dict.py."""
+    if not isinstance(entry, dict):
+        return entry
+    entry = dict(entry)
+    for name, kind in (('patterns', tuple), ('spelling', tuple), ('homophones', set)):
+        if isinstance(entry.get(name), dict):
+            entry[name] = {key: kind(value) if isinstance(value, list) else value for key, value in entry[name].items()}
+    return entry
+
+
+def load_source(path):
+    """Read the 'phonemes' dictionary of a Python module (without running it) or of a JSON file."""
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix == '.json':
+        return {phoneme: from_json(entry) for phoneme, entry in json.loads(text).items()}
+    for node in ast.parse(text, filename=str(path)).body:
+        if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == 'phonemes'
+                                                for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"{path} doesn't assign a 'phonemes' dictionary")
+
+
+def compile_value(value):
+    """JSON form of the content: tuples become lists, sets sorted lists."""
+    if isinstance(value, dict):
+        return {key: compile_value(item) for key, item in value.items()}
+    if isinstance(value, set):
+        return sorted(value)
+    if isinstance(value, (tuple, list)):
+        return [compile_value(item) for item in value]
+    return value
+
+
+def entry_hash(phoneme, compiled):
+    canonical = json.dumps([RULES_VERSION, phoneme, compiled], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def load_manifest(out):
+    try:
+        return json.loads((Path(out) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'phonemes': {}}
+
+
+def validate(items, workers):
+    if workers <= 1 or len(items) < POOL_THRESHOLD:
+        return dict(map(validate_entry, items))
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        return dict(pool.map(validate_entry, items, chunksize=max(1, len(items) // (workers * 4))))
+
+
+def write_atomic(path, text):
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    tmp.replace(path)
+
+
+def build(source = DEFAULT_SOURCE, out = DEFAULT_OUT, workers = os.cpu_count() or 1, check = False):
+    """Validate 'source' and, unless 'check' or an error is found, update the catalogue in 'out'. Return the report of the build."""
+    start = time.perf_counter()
+    content = load_source(source)
+    out = Path(out)
+    previous = {} if check else load_manifest(out)['phonemes']
+
+    compiled = {phoneme: compile_value(entry) for phoneme, entry in content.items()}
+    hashes = {phoneme: entry_hash(phoneme, entry) for phoneme, entry in compiled.items()}
+    unchanged = {phoneme for phoneme, digest in hashes.items()
+                 if previous.get(phoneme, {}).get('hash') == digest and (out / previous[phoneme]['file']).exists()}
+    changed = [(phoneme, content[phoneme]) for phoneme in content if phoneme not in unchanged]
+
+    problems = validate(changed, workers)
+    errors = [problem for found in problems.values() for problem in found] + cross_problems(content)
+
+    published = not check and not errors
+    if published:
+        out.mkdir(parents=True, exist_ok=True)
+        for phoneme in content:
+            if phoneme not in unchanged:
+                write_atomic(out / f'{hashes[phoneme]}.json',
+                             json.dumps({'phoneme': phoneme, **compiled[phoneme]}, ensure_ascii=False, indent=1))
+        phonemes = {phoneme: {'hash': hashes[phoneme], 'file': f'{hashes[phoneme]}.json'} for phoneme in content}
+        version = hashlib.sha256(''.join(hashes[phoneme] for phoneme in content).encode()).hexdigest()[:16]
+        write_atomic(out / MANIFEST_NAME, json.dumps({'version': version, 'source': Path(source).name,
+                                                      'built_at': time.time(), 'phonemes': phonemes},
+                                                     ensure_ascii=False, indent=1))
+        referenced = {entry['file'] for entry in phonemes.values()}
+        for stale in out.glob('*.json'):
+            if stale.name != MANIFEST_NAME and stale.name not in referenced:
+                stale.unlink()
+
+    return {'phonemes': len(content), 'validated': len(changed), 'unchanged': len(unchanged),
+            'errors': errors, 'published': published, 'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help='phonemes_dict.py, or a JSON file of the same dictionary')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='catalogue directory')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='validation processes')
+    parser.add_argument('--check', action='store_true', help='validate everything, write nothing')
+    args = parser.parse_args()
+
+    report = build(args.source, args.out, args.workers, args.check)
+    for error in report['errors']:
+        print(f'error: {error}')
+    print(f"{report['phonemes']} phonemes: {report['validated']} validated, {report['unchanged']} unchanged, "
+          f"{len(report['errors'])} errors in {report['seconds']:.2f} s")
+    if report['errors'] and not args.check:
+        print(f'catalogue in {args.out} left unchanged')
+    sys.exit(1 if report['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
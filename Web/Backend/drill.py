@@ -0,0 +1,140 @@
+"""
+Drill module
+
+This module serves the '/drill' WebSocket: a spelling or homophone drill streams its answers over one connection
+instead of one POST (headers, Idempotency-Key, JSON parsing...) per attempt.
+
+Protocol (JSON text frames):
+    - On connection the server sends {'type': 'ready', 'session': id, 'last_seq': n}.
+      Reconnecting with '/drill?session=<id>' resumes the session, so the client knows which answers were processed.
+    - The client sends {'seq': n, 'kind': 'spell' | 'homophones', 'test_id': ..., 'answer': ...}.
+    - The server replies {'seq': n, 'verdict': {...}} with exactly what /checkspellanswer or /checkhomophanswer
+      would return, or {'seq': n, 'error': {'status': code, 'detail': ...}}.
+Sequence numbers replace Idempotency-Key: every answer gets a number larger than the previous one,
+and an answer sent again with a number already processed (a resend after a dropped connection) gets the reply
+it got the first time, without being checked twice. Only the last MAX_REPLIES replies of a session are kept.
+
+Answers go through the same 'logic' state machines as the HTTP endpoints, in the 'exercise' bulkhead,
+and the same per-client rate limit as the 'answer' group of 'admission' (the client as 'admission.client_id()' sees it,
+behind a proxy too).
+"""
+
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from fastapi import HTTPException, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+import admission
+import bulkheads
+import logic
+import metrics
+import schemas as s
+
+
+logger = logging.getLogger(__name__)
+
+CHECKS = {
+    'spell': logic.check_spell_answer,
+    'homophones': logic.check_homophone_answer,
+}
+SESSION_DURATION = 6000
+MAX_REPLIES = 64
+RETRYABLE = {429, 503}
+
+SESSIONS = {}
+
+
+class DrillSession:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.last_seq = 0
+        self.replies = OrderedDict()
+        self.time = time.time()
+
+    def remember(self, seq, reply):
+        self.last_seq = max(self.last_seq, seq)
+        self.replies[seq] = reply
+        while len(self.replies) > MAX_REPLIES:
+            self.replies.popitem(last=False)
+
+    async def answer(self, message, client):
+        self.time = time.time()
+        seq = message.get('seq') if isinstance(message, dict) else None
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+            return error(None, 400, 'seq must be a positive integer')
+        if seq in self.replies:
+            metrics.inc('drill_messages_total', outcome='duplicate')
+            return self.replies[seq]
+        if seq <= self.last_seq:
+            return error(seq, 409, 'Sequence number already used')
+
+        check = CHECKS.get(message.get('kind'))
+        if check is None:
+            reply = error(seq, 400, f"kind must be one of {', '.join(CHECKS)}")
+        elif retry_after := admission.rate_limiter.take(client, 'answer'):
+            metrics.inc('admission_decisions_total', group='answer', decision='rate_limited')
+            return error(seq, 429, 'Too many requests', retry_after=round(retry_after, 3))
+        else:
+            reply = await checked(seq, check, message)
+
+        self.remember(seq, reply)
+        return reply
+
+
+async def checked(seq, check, message):
+    try:
+        user_input = s.Answer(test_id=message.get('test_id'), answer=message.get('answer')).model_dump()
+    except ValidationError as e:
+        return error(seq, 422, e.errors(include_url=False, include_context=False, include_input=False))
+    try:
+        verdict = await bulkheads.BULKHEADS['exercise'].run(check, user_input)
+    except HTTPException as e:
+        return error(seq, e.status_code, e.detail)
+    metrics.inc('drill_messages_total', outcome='answered')
+    return {'seq': seq, 'verdict': jsonable_encoder(verdict)}
+
+
+def error(seq, status, detail, **extra):
+    if status not in RETRYABLE:
+        metrics.inc('drill_messages_total', outcome=f'error_{status}')
+    return {'seq': seq, 'error': {'status': status, 'detail': detail, **extra}}
+
+
+def clean_sessions():
+    now = time.time()
+    expired = [session_id for session_id, session in SESSIONS.items() if now - session.time > SESSION_DURATION]
+    for session_id in expired:
+        SESSIONS.pop(session_id, None)
+
+
+def open_session(session_id):
+    clean_sessions()
+    session = SESSIONS.get(session_id) if session_id else None
+    if session is None:
+        session = DrillSession(uuid.uuid4().hex)
+        SESSIONS[session.id] = session
+    return session
+
+
+async def serve(websocket, session_id = None):
+    await websocket.accept()
+    session = open_session(session_id)
+    client = admission.client_id(websocket)
+    metrics.inc('drill_connections_total')
+    logger.info(f'Drill session {session.id} connected from {client} (last seq {session.last_seq})')
+    await websocket.send_json({'type': 'ready', 'session': session.id, 'last_seq': session.last_seq})
+
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except json.JSONDecodeError:
+                await websocket.send_json(error(None, 400, 'Message is not JSON'))
+                continue
+            await websocket.send_json(await session.answer(message, client))
+    except WebSocketDisconnect:
+        logger.info(f'Drill session {session.id} disconnected')
@@ -0,0 +1,254 @@
+"""
+Enrichment crawler
+
+Looks up every word of the content in the dictionary API, not just the 'api' word of each phoneme, and records in a
+local index what it found for each: the URL of its British audio clip, its IPA text and a status
+('ok', 'no_uk_audio', 'not_found' or 'error').
+Words are the solutions of the 'spelling' exercises and every spelling of the 'homophones', taken from the current
+catalogue (the compiled one if there is one, see catalogue.py).
+
+    - Lookups go through 'phoneme_api.lookup()', so they are cached in 'lookup_cache' and count against the outbound limit
+      of 'bulkheads'. Up to CONCURRENCY words are looked up at once, but calls to the API are spaced by 'RateLimiter'
+      (RATE per second); a 429 or 503 holds every call back for its whole Retry-After (or BACKOFF seconds).
+      'http_client' doesn't retry crawler calls: 'fetch()' does, up to ATTEMPTS times, each attempt waiting its turn.
+    - The index is a SQLite database (INDEX_DB), written every CHECKPOINT_EVERY words and when the crawl is interrupted
+      (Ctrl+C, SIGTERM). A new run skips the words already indexed and retries those that ended in 'error',
+      so an interrupted crawl resumes where it stopped; '--refresh' looks everything up again.
+
+Run from Web/Backend:
+    python enrich.py
+    python enrich.py --concurrency 8 --rate 5 --index enrichment.sqlite3
+Against the local stand-in of the API (benchmarks/dictionary_stub.py):
+    python -m benchmarks.dictionary_stub --port 8765
+    python enrich.py --api-url http://127.0.0.1:8765/api/v2/entries/en/ --index /tmp/enrichment.sqlite3
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from pathlib import Path
+import catalogue
+import http_client
+import lookup_cache
+import phoneme_api
+from lazy_import import lazy_import
+
+requests = lazy_import('requests')
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_DB = Path(os.environ.get('EPT_ENRICH_DB', Path(__file__).resolve().parent / 'enrichment.sqlite3'))
+CONCURRENCY = 4
+RATE = 2.0
+BACKOFF = 30.0
+ATTEMPTS = http_client.RETRIES + 1
+RETRY_STATUSES = http_client.RETRY_STATUSES | {429}
+CHECKPOINT_EVERY = 50
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS words (
+    word TEXT PRIMARY KEY,
+    phonemes TEXT NOT NULL,
+    status TEXT NOT NULL,
+    ipa TEXT,
+    audio_url TEXT,
+    error TEXT,
+    checked_at REAL NOT NULL
+) WITHOUT ROWID'''
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self, stop):
+        """Wait for the turn of the caller; return False if 'stop' was set meanwhile."""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_call)
+            self.next_call = start + self.interval
+        return not stop.wait(start - now)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.next_call = max(self.next_call, time.monotonic() + seconds)
+
+
+def content_words(content):
+    """Map every word of the 'spelling' solutions and 'homophones' of 'content' to the phonemes it belongs to."""
+    words = {}
+    for phoneme, entry in content.items():
+        for options in entry['spelling'].values():
+            words.setdefault(options[0], set()).add(phoneme)
+        for spellings in entry['homophones'].values():
+            for spelling in spellings:
+                words.setdefault(spelling, set()).add(phoneme)
+    return {word: sorted(phonemes) for word, phonemes in sorted(words.items())}
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute(SCHEMA)
+    return db
+
+
+def indexed(path):
+    """Words of the index that don't need looking up again (anything but 'error')."""
+    with closing(connect(path)) as db:
+        return {word for word, in db.execute("SELECT word FROM words WHERE status != 'error'")}
+
+
+def load_index(path = INDEX_DB):
+    """Return the index as {word: {'phonemes', 'status', 'ipa', 'audio_url', 'error', 'checked_at'}}."""
+    with closing(connect(path)) as db:
+        rows = db.execute('SELECT word, phonemes, status, ipa, audio_url, error, checked_at FROM words')
+        return {word: {'phonemes': json.loads(phonemes), 'status': status, 'ipa': ipa, 'audio_url': audio_url,
+                       'error': error, 'checked_at': checked_at}
+                for word, phonemes, status, ipa, audio_url, error, checked_at in rows}
+
+
+def checkpoint(path, results):
+    if not results:
+        return
+    with closing(connect(path)) as db, db:
+        db.executemany('INSERT OR REPLACE INTO words (word, phonemes, status, ipa, audio_url, error, checked_at) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       [(r['word'], json.dumps(r['phonemes'], ensure_ascii=False), r['status'], r['ipa'],
+                         r['audio_url'], r['error'], r['checked_at']) for r in results])
+    logger.info(f'Checkpoint: {len(results)} words written to {path}')
+
+
+def uk_ipa(entries, audio_url):
+    """The IPA text given with the British clip, else the first one of the entries."""
+    for entry in entries:
+        for phonetics_block in entry.get('phonetics', []):
+            if audio_url and phonetics_block.get('audio') == audio_url and phonetics_block.get('text'):
+                return phonetics_block['text']
+    texts = lookup_cache.ipa(entries)
+    return texts[0] if texts else None
+
+
+def retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After', BACKOFF))
+    except (TypeError, ValueError):
+        return BACKOFF
+
+
+def fetch(word, limiter, stop):
+    """'phoneme_api.lookup()' of 'word', with every attempt through 'limiter' (the retries of 'http_client' would skip it)."""
+    cached = lookup_cache.get(phoneme_api.LOOKUP_DB, word)
+    if cached and cached.fresh():
+        return phoneme_api.lookup(word)
+    for attempt in range(ATTEMPTS):
+        if not limiter.wait(stop):
+            raise InterruptedError('Crawl interrupted')
+        try:
+            return phoneme_api.lookup(word, retries = 0)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status in (429, 503):
+                limiter.pause(retry_after(e.response))
+            if status not in RETRY_STATUSES or attempt == ATTEMPTS - 1:
+                raise
+        except (requests.Timeout, requests.ConnectionError):
+            if attempt == ATTEMPTS - 1:
+                raise
+
+
+def enrich_word(word, phonemes, limiter, stop):
+    result = {'word': word, 'phonemes': phonemes, 'status': 'error', 'ipa': None, 'audio_url': None, 'error': None}
+    try:
+        if stop.is_set():
+            raise InterruptedError('Crawl interrupted')
+        entries = fetch(word, limiter, stop)
+        if entries is None:
+            result['status'] = 'not_found'
+        else:
+            result['audio_url'] = phoneme_api.get_uk_audio(entries, word)
+            result['ipa'] = uk_ipa(entries, result['audio_url'])
+            result['status'] = 'ok' if result['audio_url'] else 'no_uk_audio'
+    except Exception as e:
+        result['error'] = f'{e.__class__.__name__}: {e}'[:200]
+    result['checked_at'] = time.time()
+    return result
+
+
+def crawl(index = INDEX_DB, concurrency = CONCURRENCY, rate = RATE, refresh = False):
+    """Look up the content words not indexed yet and write what was found to 'index'. Return the report of the crawl."""
+    start = time.perf_counter()
+    catalogue.reload()
+    words = content_words(catalogue.current().phonemes)
+    done = set() if refresh else indexed(index)
+    todo = [word for word in words if word not in done]
+    logger.info(f'{len(words)} content words, {len(todo)} to look up')
+
+    limiter = RateLimiter(rate)
+    stop = threading.Event()
+    statuses = Counter()
+    pending = []
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='enrich')
+    try:
+        futures = [executor.submit(enrich_word, word, words[word], limiter, stop) for word in todo]
+        for future in as_completed(futures):
+            result = future.result()
+            statuses[result['status']] += 1
+            pending.append(result)
+            if len(pending) >= CHECKPOINT_EVERY:
+                checkpoint(index, pending)
+                pending = []
+    except KeyboardInterrupt:
+        stop.set()
+        logger.warning('Crawl interrupted; saving the words looked up so far')
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        checkpoint(index, [result for result in pending if not (stop.is_set() and result['status'] == 'error')])
+
+    return {'words': len(words), 'skipped': len(words) - len(todo), 'statuses': dict(statuses),
+            'seconds': time.perf_counter() - start}
+
+
+def terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', default=INDEX_DB, help='SQLite index to write (and resume from)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='words looked up at once')
+    parser.add_argument('--rate', type=float, default=RATE, help='calls to the API per second')
+    parser.add_argument('--refresh', action='store_true', help='look up every word again')
+    parser.add_argument('--api-url', help='dictionary API to use instead of DICTIONARY_API_URL')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    logging.getLogger('phoneme_api').setLevel(logging.WARNING)
+    if args.api_url:
+        phoneme_api.API_URL = args.api_url
+    signal.signal(signal.SIGTERM, terminate)
+
+    try:
+        report = crawl(args.index, args.concurrency, args.rate, args.refresh)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    statuses = ', '.join(f'{count} {status}' for status, count in sorted(report['statuses'].items())) or 'nothing new'
+    print(f"{report['words']} words, {report['skipped']} already indexed: {statuses} in {report['seconds']:.2f} s")
+    sys.exit(1 if report['statuses'].get('error') else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Exercise pool
+
+This module keeps ready-to-serve exercise batches for '/spell', '/homophones', '/reviewspell' and '/reviewhomoph'.
+A batch is everything a request used to build on the spot: the sampled words, the shuffled options,
+the test ids and the test records for 'ONGOING_TESTS'.
+
+Batches are built ahead of time by a background thread, so 'take()' only pops one from a deque and registers its tests.
+Whenever a pool drops below LOW_WATER it is queued for a refill up to POOL_SIZE.
+If a pool is empty (cold start or a burst bigger than the pool), the batch is built synchronously exactly as before,
+so the pool only ever changes latency, never the content of a response.
+Seeded requests (see 'logic.session_rng()') never touch the pools: their batch must come from their own RNG.
+
+Tests sitting in a pool are not in 'ONGOING_TESTS' until they are handed out, so unserved batches can't be answered.
+Batches carry the version of the catalogue they were built from: when the content is replaced ('catalogue.swap()')
+the pools are emptied, and a batch of the old version still in flight is never handed out.
+"""
+
+import logging
+import queue
+import random
+import threading
+from collections import deque
+import catalogue
+import logic
+
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 8
+LOW_WATER = 3
+MAX_POOLS = 256
+ENABLED = True
+
+BUILDERS = {
+    'spell': lambda phoneme, rng, content:
+        logic.build_spell_tests(logic.spell_pairs(phoneme, rng, content), rng, content),
+    'homophones': lambda phoneme, rng, content:
+        logic.build_homophones_test(logic.homophones_pairs(phoneme, rng, content), rng, content),
+    'reviewspell': lambda seen, rng, content:
+        logic.build_spell_tests(logic.review_spell_pairs(seen, rng, content), rng, content),
+    'reviewhomoph': lambda seen, rng, content:
+        logic.build_homophones_test(logic.review_homophones_pairs(seen, rng, content), rng, content),
+}
+
+POOLS = {}
+
+_refill_queue = queue.Queue()
+_pending = set()
+_lock = threading.Lock()
+_worker = None
+
+
+def pool_key(kind, key):
+    """Normalise the key of a pool: review pools are keyed by the set of phonemes seen, whatever their order."""
+    if kind.startswith('review'):
+        return kind, tuple(sorted(key))
+    return kind, key
+
+
+def take(kind, key, rng = random):
+    """Hand out one batch of exercises and register its tests.
+
+    Args:
+        kind (str): One of the keys of BUILDERS.
+        key (str | Iterable[str]): Phoneme for 'spell'/'homophones', phonemes seen for the review kinds.
+        rng (random.Random, optional): Seeded generator of the session. Defaults to the global 'random', which uses the pools.
+
+    Returns:
+        list: Payload of the batch, the same a direct call to 'logic' would return.
+    """
+    name = pool_key(kind, key)
+    content = catalogue.current()
+    if rng is not random:
+        tests, payload = BUILDERS[kind](name[1], rng, content)
+        logic.ONGOING_TESTS.update(tests)
+        return payload
+
+    pool = POOLS.get(name)
+
+    try:
+        version, tests, payload = pool.popleft()
+    except (AttributeError, IndexError):
+        version = None
+    if version != content.version:  #empty pool, or a batch built from content replaced since
+        tests, payload = BUILDERS[kind](name[1], random, content)
+
+    logic.ONGOING_TESTS.update(tests)
+
+    if ENABLED and (pool is None or len(pool) < LOW_WATER):
+        schedule(name)
+    return payload
+
+
+def schedule(name):
+    with _lock:
+        if name in _pending:
+            return
+        if name not in POOLS:
+            if len(POOLS) >= MAX_POOLS:
+                return
+            POOLS[name] = deque()
+        _pending.add(name)
+    _refill_queue.put(name)
+
+
+def refill(name):
+    kind, key = name
+    content = catalogue.current()
+    pool = POOLS.get(name)
+    try:
+        while pool is not None and len(pool) < POOL_SIZE:
+            pool.append((content.version, *BUILDERS[kind](key, random, content)))
+    except Exception:
+        logger.exception(f'Refill of the {kind} pool for {key} failed')
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def refill_loop():
+    while True:
+        name = _refill_queue.get()
+        if name is None:
+            return
+        refill(name)
+
+
+def start():
+    """Start the refill thread and warm a pool for every phoneme."""
+    global _worker
+    if not ENABLED or _worker is not None:
+        return
+    _worker = threading.Thread(target=refill_loop, name='exercise-pool', daemon=True)
+    _worker.start()
+    warm(catalogue.current())
+
+
+def warm(content):
+    for phoneme in content.phonemes:
+        schedule(('spell', phoneme))
+        schedule(('homophones', phoneme))
+    logger.info(f'Exercise pools warming for {len(content.phonemes)} phonemes (catalogue {content.version})')
+
+
+@catalogue.on_swap
+def flush(old, new):
+    """Drop the batches built from the replaced content and warm the pools of the new one."""
+    with _lock:
+        POOLS.clear()
+    if _worker is not None:
+        warm(new)
+
+
+def stop():
+    global _worker
+    if _worker is None:
+        return
+    _refill_queue.put(None)
+    _worker.join()
+    _worker = None
+    while not _refill_queue.empty():
+        _refill_queue.get_nowait()
+    with _lock:
+        POOLS.clear()
+        _pending.clear()
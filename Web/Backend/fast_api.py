@@ -1,22 +1,57 @@
-from fastapi import FastAPI, Request, HTTPException, Header
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from phoneme_api import get_phoneme, AUDIO_DIR
+from fastapi import FastAPI, Request, HTTPException, Header, Depends, WebSocket
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from phoneme_api import cached_audio, AUDIO_DIR, AUDIO_PACK
 import logic
-from phonemes_dict import phonemes
+import exercise_pool
+import http_cache
+from audio_cache import AudioFiles
+import audio_pack
+import audio_pipeline
+import audio_jobs
+import profiling
+import admission
+import bulkheads
+import drill
+import learner_store
+import metrics
+import catalogue
 import logging
 import log_file
 from pathlib import Path
 import schemas as s
 import time
+from contextlib import asynccontextmanager
+from typing import Optional, Literal
 
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    log_file.activate_handler()
+    catalogue.reload()  #a compiled catalogue newer than phonemes_dict.py, if any
+    catalogue.watch()
+    if not frontend.variants:  #already warm when preloaded by serve.py
+        frontend.warm()
+    exercise_pool.start()
+    yield
+    exercise_pool.stop()
+    catalogue.stop()
+    audio_pipeline.shutdown()
+    bulkheads.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.router.route_class = bulkheads.BulkheadRoute
     
+app.middleware('http')(http_cache.conditional_json)
+app.middleware('http')(profiling.middleware)
+app.middleware('http')(admission.middleware)  #added last, so it runs first and sheds before any other work
 
-app.mount('/audio', StaticFiles(directory=AUDIO_DIR), name='audio')
+app.mount('/audio', AudioFiles(AUDIO_DIR, pack=audio_pack.shared(AUDIO_PACK)), name='audio')
 
 
 IDEMPOTENCY_STORE = {}
@@ -45,18 +80,24 @@ def check_idempotency(idempotency_key, user_input, function):
     IDEMPOTENCY_STORE[store_idem_key] = {
         'time': time.time(),
         'status': 200,
-        'body': result
+        'body': jsonable_encoder(result)  #answers may hold sets, which a replayed JSONResponse can't render
     }
     
     return result
 
 
+def exercise_rng(seed: Optional[int] = None, user: str = '', session: str = ''):
+    """Seeded RNG of the session when '?seed=' is given, so the same (user, session, seed) always gets the same exercises."""
+    return logic.session_rng(seed, user, session)
+
+
 @app.get('/reviewstatus', response_model=s.ReviewResponse)
 def start():
-    phonemes_pool = logic.get_phonemes_pool()
+    content = catalogue.current()
+    phonemes_pool = logic.get_phonemes_pool(content)
     if not phonemes_pool:
         return {'status': s.ReviewStatus.REVIEW_ONLY} 
-    if len(phonemes_pool) == len(phonemes):
+    if len(phonemes_pool) == len(content.phonemes):
         return {'status': s.ReviewStatus.NO_PROGRESS} 
     else:
         return {'status': s.ReviewStatus.REVIEW_LEARN} 
@@ -69,34 +110,49 @@ def phonemes_covered():
 
     
 @app.get('/reviewspell', response_model=list[s.SpellResponse])
-def review_spelling():
+def review_spelling(rng = Depends(exercise_rng)):
     seen = logic.load_progress()
-    return logic.review_spell(seen)
+    return exercise_pool.take('reviewspell', seen, rng)
 
     
 @app.get('/reviewhomoph', response_model=list[s.HomophResponse])
-def review_homoph():
+def review_homoph(rng = Depends(exercise_rng)):
     seen = logic.load_progress()
-    return logic.review_homophones(seen)
+    return exercise_pool.take('reviewhomoph', seen, rng)
     
         
 @app.get('/learn', response_model=s.LearnResponse)
-def learn():
-    phoneme, patterns = logic.patterns()
+def learn(rng = Depends(exercise_rng)):
+    content = catalogue.current()
+    phoneme, patterns = logic.patterns(rng, content)
     logger.info(f'Starting learning process for phoneme {phoneme}')
-    audio_file = get_phoneme(phonemes[phoneme]['api'])
-    audio_url = f'/audio/{Path(audio_file).name}' if audio_file else None
-    return {'phoneme': phoneme, 'ipa': f'/{phoneme}/', 'audio_url': audio_url, 'patterns': patterns}
+    word = content.phonemes[phoneme]['api']
+    if admission.degraded():
+        audio = audio_jobs.describe(cached_audio(word))  #saturated: don't start a download either
+        audio_status = 'ready' if audio['audio_url'] else 'unavailable'
+    else:
+        job = audio_jobs.start(phoneme, word)  #a cache miss is fetched in the background, see /audioevents
+        audio_status, audio = audio_jobs.status(job), audio_jobs.audio(job)
+    return {'phoneme': phoneme, 'ipa': f'/{phoneme}/', 'audio_status': audio_status, 'patterns': patterns, **audio}
+
+
+@app.get('/audioevents/{phoneme}')
+async def audio_events(phoneme: str):
+    phonemes = catalogue.current().phonemes
+    if phoneme not in phonemes:
+        raise HTTPException(status_code=404, detail='Phoneme not found')
+    return StreamingResponse(audio_jobs.events(phoneme, phonemes[phoneme]['api']), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.get('/spell/{phoneme}', response_model=list[s.SpellResponse])
-def spell(phoneme: str):
-    return logic.spell_learn(phoneme)
+def spell(phoneme: str, rng = Depends(exercise_rng)):
+    return exercise_pool.take('spell', phoneme, rng)
 
 
 @app.get('/homophones/{phoneme}', response_model=list[s.HomophResponse])
-def find_homophones(phoneme: str):
-    return logic.homophones_learn(phoneme)
+def find_homophones(phoneme: str, rng = Depends(exercise_rng)):
+    return exercise_pool.take('homophones', phoneme, rng)
 
 
 @app.post('/checkspellanswer', response_model=s.SpellAnswerResponse)
@@ -111,11 +167,53 @@ def check_homoph_answer(user_input: s.Answer,
     return check_idempotency(idempotency_key, user_input, logic.check_homophone_answer)
 
 
+@app.websocket('/drill')
+async def drill_socket(websocket: WebSocket, session: Optional[str] = None):
+    await drill.serve(websocket, session)
+
+
 @app.post('/saveprogress', response_model = s.SaveProgressResponse)
 def save(progress: s.SaveProgress):
     seen = logic.load_progress()
     return logic.save_progress(progress.model_dump(), seen)
 
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def get_metrics():
+    return metrics.render()
+
+
+def require_admin(admin_token: str = Header(None, alias='X-Admin-Token')):
+    if not profiling.is_admin(admin_token):
+        raise HTTPException(status_code=404, detail='Not Found')  #admin endpoints don't reveal they exist
+
+
+@app.get('/admin/progress/export', dependencies=[Depends(require_admin)])
+def export_progress():
+    return StreamingResponse(learner_store.export_ndjson(), media_type='application/x-ndjson',
+                             headers={'Content-Disposition': 'attachment; filename="progress.ndjson"'})
+
+
+@app.post('/admin/progress/import', response_model=s.ProgressImportResponse, dependencies=[Depends(require_admin)])
+async def import_progress(request: Request, mode: Literal['merge', 'replace'] = 'merge'):
+    return await learner_store.import_ndjson(request.stream(), mode)
+
+
+@app.get('/admin/profiles', dependencies=[Depends(require_admin)])
+def list_profiles():
+    return profiling.list_profiles()
+
+
+@app.get('/admin/profiles/{profile_id}', dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: str = 'pstats'):
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    if format == 'text':
+        return PlainTextResponse(profiling.summary(path))
+    return FileResponse(path, media_type='application/octet-stream', filename=path.name)
+
 FRONTEND_DIR = Path(__file__).resolve().parents[1] / "Frontend"
 
-app.mount("/", StaticFiles(directory=str(FRONTEND_DIR), html=True), name="frontend")
\ No newline at end of file
+frontend = http_cache.PrecompressedStaticFiles(directory=str(FRONTEND_DIR), html=True)
+app.mount("/", frontend, name="frontend")
\ No newline at end of file
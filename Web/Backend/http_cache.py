@@ -0,0 +1,149 @@
+"""
+HTTP caching
+
+This module gives the static content of the app an explicit cache policy:
+    - 'CachedStaticFiles' adds a Cache-Control header to every file (and 304) it serves.
+      Audio file names carry a hash of their content (see 'phoneme_api.hashed_audio_name()'),
+      so '/audio' is served as immutable for a year.
+    - 'PrecompressedStaticFiles' also serves gzip/brotli variants of the text assets of the frontend.
+      Variants are compressed once by 'warm()' into STATIC_CACHE_DIR, named after the hash of the source,
+      so an edited 'main.js' never gets an old variant.
+    - 'conditional_json()' adds an ETag to seeded JSON responses (see 'logic.session_rng()') and answers 304 when it matches.
+      Only the exercises of a phoneme ('/spell', '/homophones', SEEDED_CACHEABLE) may be reused by the browser for a day;
+      the other routes also depend on the progress and audio of the server, so they are revalidated every time.
+
+Conditional GET on files (ETag / If-None-Match, Last-Modified / If-Modified-Since) is already handled by StaticFiles.
+brotli is optional: without it only gzip variants are built.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from pathlib import Path
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.staticfiles import NotModifiedResponse
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+SEEDED_JSON = 'private, max-age=86400'
+SEEDED_CACHEABLE = ('/spell/', '/homophones/')
+
+STATIC_CACHE_DIR = Path(__file__).parent / 'static_cache'
+COMPRESSIBLE = ('.html', '.js', '.css')
+MIN_COMPRESS_SIZE = 512
+
+ENCODERS = {'gzip': ('gz', lambda content: gzip.compress(content, compresslevel=9, mtime=0))}
+if brotli:
+    ENCODERS = {'br': ('br', lambda content: brotli.compress(content, quality=11)), **ENCODERS}
+
+
+def accepted_encodings(headers):
+    accepted = set()
+    for token in headers.get('accept-encoding', '').split(','):
+        name, _, params = token.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with a fixed Cache-Control header."""
+
+    def __init__(self, *args, cache_control = REVALIDATE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, full_path, stat_result, scope, status_code = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers['Cache-Control'] = self.cache_control
+        return response
+
+
+class PrecompressedStaticFiles(CachedStaticFiles):
+    """CachedStaticFiles serving precompressed variants of COMPRESSIBLE files when the client accepts them."""
+
+    def __init__(self, *args, store = STATIC_CACHE_DIR, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = Path(store)
+        self.variants = {}
+
+    def warm(self):
+        """Compress every COMPRESSIBLE file of the directory into the variant store."""
+        self.store.mkdir(parents=True, exist_ok=True)
+        for source in Path(self.directory).rglob('*'):
+            if source.suffix not in COMPRESSIBLE or not source.is_file():
+                continue
+            content = source.read_bytes()
+            if len(content) < MIN_COMPRESS_SIZE:
+                continue
+            digest = hashlib.sha256(content).hexdigest()[:16]
+            stat_result = source.stat()
+            encoded = {}
+            for encoding, (extension, encode) in ENCODERS.items():
+                variant = self.store / f'{digest}.{extension}'
+                if not variant.exists():
+                    tmp = variant.with_suffix('.tmp')
+                    tmp.write_bytes(encode(content))
+                    tmp.replace(variant)
+                encoded[encoding] = variant
+            self.variants[os.path.realpath(source)] = (stat_result.st_mtime, stat_result.st_size, encoded)
+        logger.info(f'{len(self.variants)} precompressed static files ready in {self.store}')
+
+    def file_response(self, full_path, stat_result, scope, status_code = 200):
+        entry = self.variants.get(os.path.realpath(full_path))
+        if status_code != 200 or entry is None:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        mtime, size, encoded = entry
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers)
+        encoding = next((name for name in encoded if name in accepted), None)
+
+        if encoding is None or (stat_result.st_mtime, stat_result.st_size) != (mtime, size):
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+
+        variant = encoded[encoding]
+        media_type = mimetypes.guess_type(str(full_path))[0] or 'text/plain'
+        response = FileResponse(variant, media_type=media_type, stat_result=variant.stat(), headers={
+            'Content-Encoding': encoding,
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': self.cache_control})
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+async def conditional_json(request, call_next):
+    """Middleware: ETag and conditional GET for seeded JSON responses."""
+    response = await call_next(request)
+    if (request.method != 'GET' or 'seed' not in request.query_params or response.status_code != 200
+            or not response.headers.get('content-type', '').startswith('application/json')):
+        return response
+
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    cache_control = SEEDED_JSON if request.url.path.startswith(SEEDED_CACHEABLE) else REVALIDATE
+    headers = {'etag': etag, 'cache-control': cache_control}
+
+    if_none_match = request.headers.get('if-none-match', '')
+    if etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+
+    response_headers = {key: value for key, value in response.headers.items() if key != 'content-length'}
+    return Response(content=body, status_code=200, headers={**response_headers, **headers})
@@ -0,0 +1,165 @@
+"""
+HTTP client
+
+This module is the way out to the network of 'phoneme_api': one 'requests.Session' keeping connections alive,
+so repeated calls to the dictionary API and its audio host skip the TCP and TLS handshakes.
+    - 'get()' uses separate connect and read timeouts (CONNECT_TIMEOUT, READ_TIMEOUT).
+    - Timeouts, connection errors and 5xx responses are retried up to RETRIES times, after a random wait of up to
+      BACKOFF * 2^attempt seconds (at most MAX_BACKOFF, or the Retry-After of a 503), so clients failing together
+      don't all retry together. Only GET is offered, so retrying is always safe.
+    - At most PER_HOST calls run at once to the same host, and the pool keeps that many connections per host.
+      A caller can pass a 'slot' of its own (the Web app passes 'bulkheads.outbound.slot'), held like the host slot
+      for each attempt only: nobody holds a slot while waiting to retry.
+    - 'stats' counts requests, retries, failures, new connections and TLS handshakes, and every 'observers' function
+      is called with (host, outcome, seconds) after each request (the Web app feeds them to 'metrics').
+The same file is used by the Console and the Web app. 'requests' is only imported with the first call.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+from lazy_import import lazy_import
+
+requests = lazy_import('requests')
+
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+RETRIES = 2
+BACKOFF = 0.25
+MAX_BACKOFF = 4.0
+PER_HOST = 4
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+stats = Counter()
+observers = []
+_lock = threading.Lock()
+_session = None
+_host_slots = {}
+
+
+def count(name, amount = 1):
+    with _lock:
+        stats[name] += amount
+
+
+def build_session():
+    """A Session whose pools count the connections they open, and the TLS handshakes among them."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class CountedHTTPConnection(HTTPConnection):
+        def connect(self):
+            super().connect()
+            count('connections')
+
+    class CountedHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            super().connect()
+            count('connections')
+            count('tls_handshakes')
+
+    class CountedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountedHTTPConnection
+
+    class CountedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountedHTTPSConnection
+
+    class CountingAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {'http': CountedHTTPConnectionPool,
+                                                       'https': CountedHTTPSConnectionPool}
+
+    session = requests.Session()
+    adapter = CountingAdapter(pool_maxsize=PER_HOST, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+
+def close():
+    """Close the pooled connections; the next call opens new ones."""
+    global _session
+    with _lock:
+        old, _session = _session, None
+    if old is not None:
+        old.close()
+
+
+def host_slot(host):
+    with _lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(PER_HOST)
+        return slot
+
+
+def backoff(attempt, response = None):
+    """Seconds to wait before retry number 'attempt' + 1."""
+    if response is not None and response.status_code == 503:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+    return random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))
+
+
+def observe(host, outcome, start):
+    seconds = time.perf_counter() - start
+    count('requests')
+    for observer in observers:
+        observer(host, outcome, seconds)
+
+
+def get(url, headers = None, retries = RETRIES, slot = nullcontext):
+    """GET 'url' through the pooled session, retrying timeouts, connection errors and 5xx responses.
+
+    Args:
+        url (str): URL to get.
+        headers (dict | None): Extra request headers.
+        retries (int): Retries after the first attempt.
+        slot (callable): Returns the context manager held around each attempt (not around the waits between them).
+
+    Returns:
+        requests.Response: The response, possibly the last 5xx one once the retries are used up.
+
+    Raises:
+        requests.RequestException: The last timeout or connection error, once the retries are used up.
+    """
+    host = urlsplit(url).netloc
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        response = None
+        try:
+            # The host slot is taken first: with PER_HOST (4) below the caller's limit (the Web app's MAX_OUTBOUND, 8),
+            # one host never holds more than half the outbound slots, and its queued calls wait here for the host,
+            # holding nothing the calls to the other host (the audio files) need.
+            with host_slot(host), slot():
+                response = session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        except (requests.Timeout, requests.ConnectionError) as e:
+            observe(host, 'timeout' if isinstance(e, requests.Timeout) else 'connection_error', start)
+            if attempt == retries:
+                count('failures')
+                raise
+        else:
+            observe(host, str(response.status_code), start)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt == retries:
+                count('failures')
+                return response
+            response.close()
+        count('retries')
+        time.sleep(backoff(attempt, response))
@@ -0,0 +1,212 @@
+"""
+Learner store
+
+This module moves learner progress in and out of the app in bulk, as NDJSON: one learner per line,
+    {"learner": "<id>", "phonemes_seen": {"<phoneme>": "<audio file name>" | null, ...}}
+the same mapping progress.json keeps under 'Phonemes seen'.
+    - The learner 'local' is the one the app itself serves: its progress is progress.json ('logic.load_progress').
+    - Every other learner is kept in a SQLite database next to it (learners.sqlite3), one row per phoneme seen.
+    - 'export_ndjson()' streams every learner, reading the database with a cursor and sending EXPORT_CHUNK_BYTES at a time.
+    - 'import_ndjson()' reads the request body as it arrives, validates each line on its own ('schemas.ProgressRecord',
+      phonemes checked against the current 'catalogue') and writes the valid ones in transactions of BATCH_SIZE learners,
+      in the 'admin' bulkhead, so an import never takes the threads answer checks run on. A bad line rejects that learner
+      only; the first MAX_REPORTED_ERRORS errors are reported with their line numbers. 'merge' adds to the progress a
+      learner already has, 'replace' overwrites it with what the import holds for them
+      (lines of the same learner are merged together either way, even in different batches: the learners already
+      replaced are kept in a TEMP table of the import's connection, not in memory).
+Memory stays bounded by BATCH_SIZE and MAX_LINE_BYTES however many learners a file holds.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from itertools import groupby
+from operator import itemgetter
+from pydantic import ValidationError
+import bulkheads
+import catalogue
+import logic
+import metrics
+import schemas as s
+
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = 'learners.sqlite3'
+LOCAL = 'local'
+BATCH_SIZE = 1000
+MAX_LINE_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS progress (
+    learner TEXT NOT NULL,
+    phoneme TEXT NOT NULL,
+    audio TEXT,
+    PRIMARY KEY (learner, phoneme)
+) WITHOUT ROWID'''
+# Learners an import already replaced; TEMP: private to the connection of that import, gone when it closes
+REPLACED_SCHEMA = 'CREATE TEMP TABLE IF NOT EXISTS replaced (learner TEXT PRIMARY KEY) WITHOUT ROWID'
+
+
+def db_path():
+    return logic.DATA_DIR / DB_NAME
+
+
+def connect():
+    logic.DATA_DIR.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path(), check_same_thread=False)  # used by one thread at a time, not always the same one
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute(SCHEMA)
+    return db
+
+
+def ndjson_line(learner, seen):
+    return json.dumps({'learner': learner, 'phonemes_seen': seen}, ensure_ascii=False) + '\n'
+
+
+def export_lines():
+    local = logic.load_progress()
+    if local:
+        yield ndjson_line(LOCAL, local)
+    if not db_path().exists():
+        return
+    with closing(connect()) as db:
+        rows = db.execute('SELECT learner, phoneme, audio FROM progress ORDER BY learner')
+        for learner, learner_rows in groupby(rows, key=itemgetter(0)):
+            yield ndjson_line(learner, {phoneme: audio for _, phoneme, audio in learner_rows})
+
+
+def export_ndjson():
+    chunk, size, learners = [], 0, 0
+    for line in export_lines():
+        chunk.append(line)
+        size += len(line)
+        learners += 1
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+    metrics.inc('progress_export_learners_total', learners)
+    logger.info(f'{learners} learners exported')
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, error, learner = None):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'learner': learner, 'error': error})
+
+    def summary(self):
+        return {'imported': self.imported, 'rejected': self.rejected,
+                'errors': self.errors, 'errors_truncated': self.rejected > len(self.errors)}
+
+
+async def ndjson_lines(chunks, report):
+    """Yield (line number, bytes) for every non-empty line of a body arriving in chunks."""
+    buffer = bytearray()
+    number = 0
+    skipping = False  # inside a line longer than MAX_LINE_BYTES
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            end = buffer.find(b'\n')
+            if end < 0:
+                if len(buffer) > MAX_LINE_BYTES:
+                    if not skipping:
+                        report.reject(number + 1, f'Line longer than {MAX_LINE_BYTES} bytes')
+                        skipping = True
+                    buffer.clear()
+                break
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            number += 1
+            if skipping:
+                skipping = False
+            elif len(line) > MAX_LINE_BYTES:
+                report.reject(number, f'Line longer than {MAX_LINE_BYTES} bytes')
+            elif line.strip():
+                yield number, line
+    if buffer.strip() and not skipping:
+        yield number + 1, bytes(buffer)
+
+
+def parse(number, line, report):
+    try:
+        record = s.ProgressRecord.model_validate_json(line)
+    except ValidationError as e:
+        report.reject(number, e.errors(include_url=False, include_context=False, include_input=False))
+        return None
+    phonemes = catalogue.current().phonemes
+    unknown = [phoneme for phoneme in record.phonemes_seen if phoneme not in phonemes]
+    if unknown:
+        report.reject(number, f"Unknown phonemes: {', '.join(unknown)}", record.learner)
+        return None
+    seen = {phoneme: os.path.basename(audio) if audio else None for phoneme, audio in record.phonemes_seen.items()}
+    return record.learner, seen
+
+
+def write_batch(db, batch, mode):
+    """Write one batch in one transaction of 'db', the connection of the import.
+
+    In 'replace' mode the learners this import already replaced are rows of its TEMP table 'replaced':
+    their lines of earlier batches must stay.
+    """
+    with db:
+        fresh = set()
+        if mode == 'replace':
+            fresh = {learner for learner, _ in batch
+                     if db.execute('INSERT OR IGNORE INTO replaced (learner) VALUES (?)', (learner,)).rowcount}
+
+        local = [seen for learner, seen in batch if learner == LOCAL]
+        if local:
+            progress = {} if LOCAL in fresh else logic.load_progress()
+            for seen in local:
+                progress.update(seen)
+            logic.write_progress(progress)
+
+        if fresh - {LOCAL}:
+            db.executemany('DELETE FROM progress WHERE learner = ?', [(learner,) for learner in fresh - {LOCAL}])
+        db.executemany('INSERT INTO progress (learner, phoneme, audio) VALUES (?, ?, ?) '
+                       'ON CONFLICT (learner, phoneme) DO UPDATE SET audio = excluded.audio',
+                       [(learner, phoneme, audio) for learner, seen in batch if learner != LOCAL
+                        for phoneme, audio in seen.items()])
+
+
+def open_import():
+    db = connect()
+    db.execute(REPLACED_SCHEMA)
+    return db
+
+
+async def import_ndjson(chunks, mode = 'merge'):
+    """Import the NDJSON body 'chunks' (an async iterable of bytes) and return the report of 'ImportReport.summary()'."""
+    report = ImportReport()
+    batch = []
+    admin = bulkheads.BULKHEADS['admin']
+    with closing(await admin.run(open_import)) as db:
+        async for number, line in ndjson_lines(chunks, report):
+            record = parse(number, line, report)
+            if record is None:
+                continue
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                await admin.run(write_batch, db, batch, mode)
+                report.imported += len(batch)
+                batch = []
+        if batch:
+            await admin.run(write_batch, db, batch, mode)
+            report.imported += len(batch)
+
+    metrics.inc('progress_import_learners_total', report.imported, outcome='imported')
+    metrics.inc('progress_import_learners_total', report.rejected, outcome='rejected')
+    logger.info(f'Progress import ({mode}): {report.imported} learners imported, {report.rejected} rejected')
+    return report.summary()
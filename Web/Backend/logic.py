@@ -1,24 +1,26 @@
 import random
 from phoneme_api import get_phoneme
+import audio_pipeline
 import json
+import os
 from pathlib import Path
-import log_file
 import logging
-from phonemes_dict import phonemes
+import catalogue
+from catalogue import HomophoneGroup
 from fastapi import HTTPException
-from copy import deepcopy
 from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 
-DATA_DIR = Path.home() / ".english_pronunciation_trainer"
+DATA_DIR = Path(os.environ.get('EPT_DATA_DIR', Path.home() / ".english_pronunciation_trainer"))
 
 file_path = DATA_DIR / "progress.json"
 
 
 ONGOING_TESTS = {}
 
-def get_phonemes_pool():
+def get_phonemes_pool(content = None):
+    phonemes = (content or catalogue.current()).phonemes
     logger.info('App successfully started')
     seen = load_progress()
     if not seen:
@@ -30,49 +32,72 @@ def get_phonemes_pool():
     return phonemes_pool
     
         
-def patterns():
-    phoneme = random.choice(list(get_phonemes_pool()))
-    patterns = {pattern: random.sample(example, k = 2) for pattern, example in phonemes[phoneme]['patterns'].items()}
+def session_rng(seed, user = '', session = ''):
+    if seed is None:
+        return random
+    return random.Random(f'{user}:{session}:{seed}')
+
+
+def new_test_id(kind):  #never from a seeded RNG: ids must not repeat across requests, nor be guessable
+    return f'{kind}_test_{uuid4().hex}'
+
+
+def patterns(rng = random, content = None):
+    content = content or catalogue.current()
+    phoneme = rng.choice(list(get_phonemes_pool(content)))
+    patterns = {pattern: rng.sample(example, k = 2) for pattern, example in content.phonemes[phoneme]['patterns'].items()}
     return phoneme, patterns
 
 
 def phonemes_covered():
+    phonemes = catalogue.current().phonemes
     seen = load_progress()
     seen_list = []
     
     for phoneme in seen:
+        if phoneme not in phonemes:  #dropped from the content since it was learnt
+            continue
         audio_file = get_phoneme(phonemes[phoneme]['api'])
         audio_url = f'/audio/{Path(audio_file).name}' if audio_file else None
-        phon = {'phoneme': phoneme, 'audio_url': audio_url}
+        phon = {'phoneme': phoneme, 'audio_url': audio_url, **audio_pipeline.describe(audio_file)}
         seen_list.append(phon)
     return seen_list
     
 
-def create_spell_tests(pairs):
+def build_spell_tests(pairs, rng = random, content = None):
+    content = content or catalogue.current()
+    tests = {}
     test_words = []
 
     for word, phoneme in pairs:
-        solution = phonemes[phoneme]['spelling'][word][0]
-        options = list(phonemes[phoneme]['spelling'][word])
-        random.shuffle(options)
-        test_id = f'spell_test_{uuid4().hex}'
-        ONGOING_TESTS[test_id] = {'word': word, 
-                                  'phoneme': phoneme, 
-                                  'solution': solution, 
-                                  'attempts_left': 5,
-                                  'with_help': False}
+        solution = content.phonemes[phoneme]['spelling'][word][0]
+        options = list(content.phonemes[phoneme]['spelling'][word])
+        rng.shuffle(options)
+        test_id = new_test_id('spell')
+        tests[test_id] = {'word': word, 
+                          'phoneme': phoneme, 
+                          'solution': solution, 
+                          'attempts_left': 5,
+                          'with_help': False,
+                          'version': content.version}
         test_words.append({'word': word, 
                            'test_id': test_id, 
                            'options': options
                            })
     
+    return tests, test_words
+
+
+def create_spell_tests(pairs, rng = random, content = None):
+    tests, test_words = build_spell_tests(pairs, rng, content)
+    ONGOING_TESTS.update(tests)
     return test_words
 
 
 def check_spell_answer(user_input):
-    if user_input['test_id'] not in ONGOING_TESTS:
+    test = ONGOING_TESTS.get(user_input['test_id'])
+    if not isinstance(test, dict):
         raise HTTPException(status_code=404, detail='Word not found')
-    test = ONGOING_TESTS[user_input['test_id']]  
     
     if user_input['answer'] == test['solution']:
         ONGOING_TESTS.pop(user_input['test_id'])
@@ -94,83 +119,105 @@ def check_spell_answer(user_input):
     return {'answered': 'incorrect', 'attempts_left': test['attempts_left']}
     
       
-def spell_learn(phoneme):
-    words_list = random.sample(list(phonemes[phoneme]['spelling']), k = 5)
-    pairs =  [(word, phoneme) for word in words_list]
-    return create_spell_tests(pairs)
+def spell_pairs(phoneme, rng = random, content = None):
+    words_list = rng.sample(list((content or catalogue.current()).phonemes[phoneme]['spelling']), k = 5)
+    return [(word, phoneme) for word in words_list]
+
 
+def spell_learn(phoneme, rng = random):
+    content = catalogue.current()
+    return create_spell_tests(spell_pairs(phoneme, rng, content), rng, content)
 
-def create_homophones_test(pairs): 
+
+class HomophoneTest:
+    __slots__ = ('group', 'left', 'attempts_left')
+
+    def __init__(self, group):
+        self.group = group
+        self.left = group.full
+        self.attempts_left = 5
+
+
+def homophone_group(phoneme, homoph, content = None):
+    return (content or catalogue.current()).homophone_group(phoneme, homoph)
+
+
+def build_homophones_test(pairs, rng = random, content = None): 
+    content = content or catalogue.current()
+    tests = {}
     test_homophones = []
     
     for homoph, phoneme in pairs:
-        all_spellings = phonemes[phoneme]['homophones'][homoph]
-        length_solution = len(all_spellings)
-        solutions_left = deepcopy(all_spellings)
-        test_id = f'homoph_test_{uuid4().hex}'
-        ONGOING_TESTS[test_id] = {'homoph': homoph, 
-                                  'solution': all_spellings, 
-                                  'solutions_left': solutions_left,
-                                  'amount': length_solution,
-                                  'to_guess': length_solution,
-                                  'attempts_left': 5}
+        group = content.homophone_group(phoneme, homoph)
+        test_id = new_test_id('homoph')
+        tests[test_id] = HomophoneTest(group)
         test_homophones.append({'homoph': homoph, 
                                 'test_id': test_id, 
-                                'amount': length_solution})
+                                'amount': len(group.spellings)})
+    return tests, test_homophones
+
+
+def create_homophones_test(pairs, rng = random, content = None):
+    tests, test_homophones = build_homophones_test(pairs, rng, content)
+    ONGOING_TESTS.update(tests)
     return test_homophones
 
 
 def check_homophone_answer(user_input):    
-    if user_input['test_id'] not in ONGOING_TESTS:
+    test = ONGOING_TESTS.get(user_input['test_id'])
+    if not isinstance(test, HomophoneTest):
         raise HTTPException(status_code=404, detail= 'Homophone not found')
     
-    test = ONGOING_TESTS[user_input['test_id']]
-    answer = user_input['answer']
+    bit = test.group.bits.get(user_input['answer'], 0)
     
-    if answer in test['solutions_left']:
-        test['to_guess'] -= 1
-        test['solutions_left'].discard(answer)
+    if test.left & bit:
+        test.left &= ~bit
         
-        if test['to_guess'] == 0:
+        if not test.left:
             return {'answered': 'done'}
         
-        return {'answered': 'correct', 'attempts_left': test['attempts_left']}
+        return {'answered': 'correct', 'attempts_left': test.attempts_left}
 
-    if test['attempts_left'] > 1:
-        test['attempts_left'] -= 1
-        return {'answered': 'incorrect', 'attempts_left': test['attempts_left']}
+    if test.attempts_left > 1:
+        test.attempts_left -= 1
+        return {'answered': 'incorrect', 'attempts_left': test.attempts_left}
     
 
-    if test['to_guess'] == test['amount']:
-        return {'answered': 'failed_all', 'solution': test['solution']}
-    return {'answered': 'failed', 'solution': test['solutions_left']}
+    if test.left == test.group.full:
+        return {'answered': 'failed_all', 'solution': list(test.group.spellings)}
+    return {'answered': 'failed', 'solution': test.group.spelled(test.left)}
     
     
         
-def homophones_learn(phoneme):
-    homoph_list = list(phonemes[phoneme]['homophones'])
+def homophones_pairs(phoneme, rng = random, content = None):
+    homoph_list = list((content or catalogue.current()).phonemes[phoneme]['homophones'])
     if len(homoph_list) > 5:
-        homoph_list = random.sample(homoph_list, k = 5)
+        homoph_list = rng.sample(homoph_list, k = 5)
     else:
-        random.shuffle(homoph_list)
-    
-    pairs = [(homoph, phoneme) for homoph in homoph_list]
+        rng.shuffle(homoph_list)
     
-    return create_homophones_test(pairs)
+    return [(homoph, phoneme) for homoph in homoph_list]
+
+
+def homophones_learn(phoneme, rng = random):
+    content = catalogue.current()
+    return create_homophones_test(homophones_pairs(phoneme, rng, content), rng, content)
 
     
-def save_progress(progress, seen):
+def write_progress(seen):
     file_path.parent.mkdir(parents=True, exist_ok=True)
-    
+    with open(file_path, 'w') as f:
+        json.dump({'Phonemes seen' : seen}, f)
+
+
+def save_progress(progress, seen):
     audio_filename = Path(progress['audio_path']).name if progress['audio_path'] else None
 
     seen[progress['new_phoneme']] = audio_filename
-    data = {'Phonemes seen' : seen}
     
     try:
-        with open(file_path, 'w') as f:
-            json.dump(data, f)
-            logger.info(f"{progress['new_phoneme']} successfully saved/updated to {file_path}")
+        write_progress(seen)
+        logger.info(f"{progress['new_phoneme']} successfully saved/updated to {file_path}")
             
         return {'status': 'ok'}
     except OSError:
@@ -194,23 +241,39 @@ def load_progress():
         return {}
 
 
-def review_spell(seen):
+def review_spell_pairs(seen, rng = random, content = None):
+    phonemes = (content or catalogue.current()).phonemes
     pairs = []
     for phoneme in seen:
+        if phoneme not in phonemes:
+            continue
         word_options = list(phonemes[phoneme]['spelling'])
-        two_word_options = random.sample(word_options, k = 2)
+        two_word_options = rng.sample(word_options, k = 2)
         pairs.extend((word, phoneme) for word in two_word_options)
-    random.shuffle(pairs)
-    return create_spell_tests(pairs)
+    rng.shuffle(pairs)
+    return pairs
+
+
+def review_spell(seen, rng = random):
+    content = catalogue.current()
+    return create_spell_tests(review_spell_pairs(seen, rng, content), rng, content)
             
 
-def review_homophones(seen):
+def review_homophones_pairs(seen, rng = random, content = None):
+    phonemes = (content or catalogue.current()).phonemes
     pairs = []
     for phoneme in seen:
+        if phoneme not in phonemes:
+            continue
         homoph_options = list(phonemes[phoneme]['homophones'])
-        two_homoph_options = random.sample(homoph_options, k = 2)
+        two_homoph_options = rng.sample(homoph_options, k = 2)
         pairs.extend((homoph, phoneme) for homoph in two_homoph_options)
-    random.shuffle(pairs) 
-    return create_homophones_test(pairs)
+    rng.shuffle(pairs) 
+    return pairs
+
+
+def review_homophones(seen, rng = random):
+    content = catalogue.current()
+    return create_homophones_test(review_homophones_pairs(seen, rng, content), rng, content)
 
 
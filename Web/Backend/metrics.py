@@ -0,0 +1,70 @@
+"""
+Metrics module
+
+This module keeps the counters and gauges of the API in memory and renders them in the Prometheus text format for '/metrics':
+    - inc(name, amount, **labels): add to a counter, e.g. inc('admission_decisions_total', group='learn', decision='degraded').
+    - observe(name, value, **labels): add a value to a summary (exported as '<name>_sum' and '<name>_count').
+    - add_collector(function): register a function returning current values [(name, labels, value)] for gauges
+      that are cheaper to read on demand than to keep up to date (queue depths, cache sizes...).
+Everything lives in the process, so with several uvicorn workers each one reports its own values.
+"""
+
+import logging
+import threading
+from collections import Counter
+
+
+logger = logging.getLogger(__name__)
+
+_counters = Counter()
+_collectors = []
+_lock = threading.Lock()
+
+
+def key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount = 1, **labels):
+    with _lock:
+        _counters[key(name, labels)] += amount
+
+
+def observe(name, value, **labels):
+    with _lock:
+        _counters[key(f'{name}_sum', labels)] += value
+        _counters[key(f'{name}_count', labels)] += 1
+
+
+def add_collector(function):
+    _collectors.append(function)
+    return function
+
+
+def value(name, **labels):
+    return _counters.get(key(name, labels), 0)
+
+
+def escape(text):
+    return str(text).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{label}="{escape(text)}"' for label, text in labels) + '}'
+
+
+def render():
+    with _lock:
+        samples = list(_counters.items())
+    for collector in _collectors:
+        try:
+            samples.extend((key(name, labels), sample) for name, labels, sample in collector())
+        except Exception:
+            logger.exception(f'Metrics collector {collector.__name__} failed')
+
+    lines = []
+    for (name, labels), sample in sorted(samples, key=lambda item: item[0]):
+        lines.append(f'{name}{format_labels(labels)} {sample:g}')
+    return '\n'.join(lines) + '\n'
@@ -2,24 +2,51 @@
 Phoneme API 
 
 This module provides the function 'get_phoneme()' that fetches the audio reproduction of the given phoneme, 
-if available, from the Free Dictionary API.
-'download_audio()' downloads the audio into the local directory to reduce API calls.
+if available, from the Free Dictionary API, and 'cached_audio()' that finds it locally without calling the API.
+Clips are looked for in the audio pack, then in AUDIO_DIR, where 'download_audio()' keeps every download
+(see 'hashed_audio_name()' and 'audio_pipeline'); API answers are kept in 'lookup_cache' (see 'lookup()').
 
 Dependencies:
     requests
 """
 
-import requests
-from requests.exceptions import RequestException
 from json import JSONDecodeError
 import logging
+import hashlib
+import os
 from pathlib import Path
+import audio_pack
+import audio_pipeline
+import bulkheads
+import http_client
+import lookup_cache
+import metrics
+from lazy_import import lazy_import
+
+requests = lazy_import('requests')
 
 
 logger = logging.getLogger(__name__)
 
-AUDIO_DIR = Path(__file__).parent / 'audio_repr'
-AUDIO_DIR.mkdir(exist_ok = True)
+AUDIO_DIR = Path(os.environ.get('EPT_AUDIO_DIR', Path(__file__).parent / 'audio_repr'))
+
+AUDIO_PACK = Path(os.environ.get('EPT_AUDIO_PACK', Path(__file__).parent / 'audio.pack'))
+
+LOOKUP_DB = Path(os.environ.get('EPT_LOOKUP_DB', Path(__file__).parent / 'lookups.sqlite3'))
+
+API_URL = os.environ.get('DICTIONARY_API_URL', 'https://api.dictionaryapi.dev/api/v2/entries/en/')
+
+
+def observe_request(host, outcome, seconds):
+    metrics.observe('outbound_request_seconds', seconds, host=host, outcome=outcome)
+
+
+http_client.observers.append(observe_request)
+
+
+@metrics.add_collector
+def collect():
+    return [(f'outbound_{name}_total', {}, value) for name, value in http_client.stats.items()]
 
 
 def log_error_return(msg, e):
@@ -40,6 +67,101 @@ def log_error_return(msg, e):
     return None
 
 
+def audio_stem(phoneme):
+    return phoneme.replace('/', '')
+
+
+def hashed_audio_name(phoneme, content, audio_format = 'mp3'):
+    """Name of the cached audio file of 'phoneme', including the first 12 hex digits of the sha256 of its content."""
+    return f'{audio_stem(phoneme)}.{hashlib.sha256(content).hexdigest()[:12]}.{audio_format}'
+
+
+def cached_audio(phoneme):
+    """Look for the cached audio file of 'phoneme' without calling the API.
+    
+    The clip the audio pack resolves the phoneme to comes first ('/audio' serves it from the pack, under the path it would
+    have in AUDIO_DIR), unless the audio manifest records a clip processed after the pack was built.
+    The processed file recorded in the audio manifest is preferred over the raw download.
+    Files cached before content hashing was introduced ('<phoneme>.mp3') are renamed on the fly.
+
+    Args:
+        phoneme (str): Phoneme being studied.
+
+    Returns:
+        Path | None: Path to the cached audio file, None if there is none.
+    """
+    stem = audio_stem(phoneme)
+    entry = audio_pipeline.manifest_entry(AUDIO_DIR, stem)
+    pack = audio_pack.shared(AUDIO_PACK)
+    packed = pack.find(stem) if pack is not None else None
+    if packed and not (entry and entry.get('processed_at', 0) > pack.mtime):
+        return AUDIO_DIR / packed
+    
+    if entry:
+        return AUDIO_DIR / entry['file']
+    
+    for local_audio_file in AUDIO_DIR.glob(f'{stem}.*.*'):
+        if local_audio_file.suffix in ('.mp3', '.wav'):
+            return local_audio_file
+    
+    legacy_file = AUDIO_DIR / f'{stem}.mp3'
+    if legacy_file.exists():
+        local_audio_file = AUDIO_DIR / hashed_audio_name(phoneme, legacy_file.read_bytes())
+        legacy_file.replace(local_audio_file)
+        logger.info(f'Renamed cached audio file {legacy_file.name} to {local_audio_file.name}')
+        return local_audio_file
+    return None
+
+
+def lookup(word, retries = http_client.RETRIES):
+    """Return the dictionary entries of 'word', from the lookup cache when they are fresh.
+    
+    A stale lookup is revalidated with a conditional request, and is still used if the API can't be reached.
+    A 404 from the API is cached too (for a shorter time), so a word it doesn't know isn't asked for again straight away.
+    Outcomes are counted in 'dictionary_lookups_total'.
+
+    Args:
+        word (str): Word to look up.
+        retries (int, optional): Retries of 'http_client.get()'. 'enrich' passes 0 and spaces its own retries.
+
+    Returns:
+        list | None:
+            - Entries parsed from the JSON returned by the API.
+            - None if the API doesn't know the word.
+
+    Raises:
+        requests.RequestException, ValueError, bulkheads.OutboundBusy: The API failed and nothing is cached for 'word'.
+    """
+    cached = lookup_cache.get(LOOKUP_DB, word)
+    if cached and cached.fresh():
+        metrics.inc('dictionary_lookups_total', outcome='hit')
+        return cached.entries
+    
+    try:
+        response = http_client.get(f'{API_URL}{word}', headers = lookup_cache.validators(cached) if cached else None,
+                                   retries = retries, slot = bulkheads.outbound.slot)
+        if cached and response.status_code == 304:
+            metrics.inc('dictionary_lookups_total', outcome='revalidated')
+            return lookup_cache.renew(LOOKUP_DB, cached).entries
+        if response.status_code == 404:
+            metrics.inc('dictionary_lookups_total', outcome='not_found')
+            return lookup_cache.store(LOOKUP_DB, word, None).entries
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, list):
+            raise ValueError('Unexpected json format returned')
+    except (requests.RequestException, ValueError, bulkheads.OutboundBusy) as e:
+        if not cached:
+            metrics.inc('dictionary_lookups_total', outcome='error')
+            raise
+        metrics.inc('dictionary_lookups_total', outcome='stale')
+        log_error_return(f'revalidating {word}, using the stale lookup', e)
+        return cached.entries
+    
+    metrics.inc('dictionary_lookups_total', outcome='fetched')
+    return lookup_cache.store(LOOKUP_DB, word, data, response.headers.get('ETag'), response.headers.get('Last-Modified')).entries
+
+
 def get_uk_audio(data, phoneme):
     """Parse API JSON and return British English audio (.mp3 or .wav) if available. 
 
@@ -67,6 +189,8 @@ def get_uk_audio(data, phoneme):
 
 def download_audio(audio, phoneme):
     """Convert and download audio into the local directory.
+    
+    The file gets the extension of its real format (the API serves some .wav clips), then it is queued for processing.
 
     Args:
         audio (str): URL of British audio.
@@ -77,16 +201,20 @@ def download_audio(audio, phoneme):
             - Path to the audio file downloaded.
             - None if a requests error occurs.
     """
-    local_audio_file = AUDIO_DIR / f"{phoneme.replace('/', '')}.mp3"
-    
     try:
-        get_audio_bytes = requests.get(audio, timeout = 5)
+        get_audio_bytes = http_client.get(audio, slot = bulkheads.outbound.slot)
         get_audio_bytes.raise_for_status()
+        audio_format = audio_pipeline.sniff_format(get_audio_bytes.content[:12])
+        if audio_format not in ('mp3', 'wav'):
+            raise ValueError(f'Downloaded audio for {phoneme} is not .mp3/.wav')
+        local_audio_file = AUDIO_DIR / hashed_audio_name(phoneme, get_audio_bytes.content, audio_format)
+        AUDIO_DIR.mkdir(exist_ok = True)
         with open(local_audio_file, 'wb') as f:
             f.write(get_audio_bytes.content)
         logger.info(f'Successful download of audio for {phoneme} in {AUDIO_DIR}')
+        audio_pipeline.submit(local_audio_file, audio_stem(phoneme))
         return str(local_audio_file)
-    except RequestException as e:
+    except (requests.RequestException, ValueError, bulkheads.OutboundBusy) as e:
         return log_error_return(f'Download error for {phoneme}', e)
 
 
@@ -98,7 +226,8 @@ def get_phoneme(phoneme):
     All exceptions related to the 'requests' module are caught as 'RequestException' for simplicity for the user,
     but all technical details are in 'log_file.py'.
     Only a JSON file is expected to be returned, so everything else is handled as an exception.
-    Since the maximum amount of calls to the API per run is only 2, requests.Session() is intentionally omitted as its overhead is not justified.
+    The JSON itself comes through 'lookup()', so only the first lesson of a word calls the API for it.
+    Calls go through 'http_client', whose session keeps the connections to the API open across lessons and threads.
     if __name__ == '__main__' is intentionally omitted as this module is meant to be imported.
 
     Args:
@@ -107,18 +236,16 @@ def get_phoneme(phoneme):
     Returns:
         str: Path to the audio file in the local directory.
     """
-    local_audio_file = AUDIO_DIR / f"{phoneme.replace('/', '')}.mp3"
+    local_audio_file = cached_audio(phoneme)
     
-    if local_audio_file.exists():
+    if local_audio_file:
         logger.info(f'Playing cached audio file for {phoneme}')
         return str(local_audio_file)
     
     try:
-        sound = requests.get(f'https://api.dictionaryapi.dev/api/v2/entries/en/{phoneme}', timeout=5)
-        sound.raise_for_status()
-        data = sound.json()
-        if not isinstance(data, list):
-            raise ValueError('Unexpected json format returned')
+        data = lookup(phoneme)
+        if data is None:
+            raise ValueError('Word not found in the dictionary')
         
         audio_online = get_uk_audio(data, phoneme)
         if not audio_online:
@@ -126,7 +253,7 @@ def get_phoneme(phoneme):
 
         local_audio_file = download_audio(audio_online, phoneme)    
         return local_audio_file
-    except (RequestException, ValueError) as e:
+    except (requests.RequestException, ValueError, bulkheads.OutboundBusy) as e:
         return log_error_return(f'for {phoneme}', e)
     except JSONDecodeError as e:
         return log_error_return(f'for {phoneme} -> Wrong file format: NOT JSON', e)
\ No newline at end of file
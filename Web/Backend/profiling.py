@@ -0,0 +1,164 @@
+"""
+Profiling module
+
+This module provides opt-in, per-request profiling of the API, so a slow endpoint can be looked at without redeploying:
+    - 'middleware' decides whether a request is profiled: always if it carries 'X-Profile: <admin token>',
+      otherwise with probability SAMPLE_RATE. The decision is passed down through a context variable.
+    - 'ProfiledRoute' wraps every endpoint so that, when the request is profiled, it runs under cProfile.
+      Endpoints are plain functions run in a worker thread, and cProfile only sees the thread it is enabled in,
+      which is why the profile is taken around the endpoint rather than in the middleware.
+    - Profiles are saved in pstats format (open them with 'python -m pstats', snakeviz...) with a small JSON
+      description next to them, in a ring of at most MAX_PROFILES files: the oldest are deleted first.
+The id of a profile is returned in the 'X-Profile-Id' header and the admin endpoints of 'fast_api' list and serve them.
+
+Everything is off unless EPT_PROFILING=1, and the admin side is off unless EPT_ADMIN_TOKEN is set.
+Only one request is profiled at a time (Python allows one active profiler); requests arriving meanwhile run normally.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from fastapi.routing import APIRoute
+
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('EPT_PROFILING') == '1'
+SAMPLE_RATE = float(os.environ.get('EPT_PROFILE_SAMPLE_RATE', '0'))
+ADMIN_TOKEN = os.environ.get('EPT_ADMIN_TOKEN', '')
+PROFILE_DIR = Path(os.environ.get('EPT_PROFILE_DIR', Path(__file__).parent / 'profiles'))
+MAX_PROFILES = 50
+TRIGGER_HEADER = 'X-Profile'
+
+_capture = ContextVar('profile_capture', default=None)
+_profiler_lock = threading.Lock()
+
+
+class Capture:
+    """Profile of one request, filled in by the endpoint wrapper."""
+
+    def __init__(self):
+        self.profile = None
+        self.endpoint = None
+
+
+def is_admin(token):
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token or '', ADMIN_TOKEN)
+
+
+def should_profile(request):
+    if not ENABLED or request.url.path.startswith('/admin'):
+        return False
+    if TRIGGER_HEADER in request.headers:
+        return is_admin(request.headers[TRIGGER_HEADER])
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+async def middleware(request, call_next):
+    if not should_profile(request):
+        return await call_next(request)
+
+    capture = Capture()
+    token = _capture.set(capture)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _capture.reset(token)
+    duration = time.perf_counter() - start
+
+    if capture.profile is not None:
+        profile_id = save(capture, request.method, request.url.path, response.status_code, duration)
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def run_profiled(function, *args, **kwargs):
+    capture = _capture.get()
+    if capture is None or not _profiler_lock.acquire(blocking=False):
+        return function(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            capture.profile = profiler
+            capture.endpoint = function.__name__
+    finally:
+        _profiler_lock.release()
+
+
+def profiled(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        return endpoint  #awaited work would mix with the other requests sharing the event loop; every endpoint here is synchronous anyway
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        return run_profiled(endpoint, *args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint runs under cProfile when the request is being profiled."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, self.wrap(path, endpoint), **kwargs)
+
+    def wrap(self, path, endpoint):
+        return profiled(endpoint) if ENABLED else endpoint
+
+
+def save(capture, method, path, status, duration):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_id = f'{time.time_ns() // 1_000_000}-{uuid.uuid4().hex[:8]}'
+    capture.profile.dump_stats(PROFILE_DIR / f'{profile_id}.prof')
+    meta = {'id': profile_id, 'method': method, 'path': path, 'endpoint': capture.endpoint,
+            'status': status, 'duration_ms': round(duration * 1000, 3), 'created': time.time()}
+    (PROFILE_DIR / f'{profile_id}.json').write_text(json.dumps(meta))
+    logger.info(f'Profile {profile_id} saved for {method} {path} ({meta["duration_ms"]} ms)')
+    trim()
+    return profile_id
+
+
+def trim():
+    profiles = sorted(PROFILE_DIR.glob('*.prof'))
+    for old in profiles[:max(0, len(profiles) - MAX_PROFILES)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.json').unlink(missing_ok=True)
+
+
+def list_profiles():
+    profiles = []
+    for meta_file in sorted(PROFILE_DIR.glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(meta_file.read_text()))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id):
+    path = PROFILE_DIR / f'{profile_id}.prof'
+    if path.parent != PROFILE_DIR or not path.is_file():
+        return None
+    return path
+
+
+def summary(path, limit = 40, sort = 'cumulative'):
+    stream = io.StringIO()
+    pstats.Stats(str(path), stream=stream).sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
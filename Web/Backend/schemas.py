@@ -16,6 +16,8 @@ class ReviewResponse(BaseModel):
 class PhonemesCoveredResponse(BaseModel):
     phoneme: StrictStr
     audio_url: Optional[StrictStr] = None
+    audio_duration: Optional[float] = None
+    audio_size: Optional[StrictInt] = None
     
     
     
@@ -36,7 +38,10 @@ class HomophResponse(BaseModel):
 class LearnResponse(BaseModel):
     phoneme: StrictStr
     ipa: StrictStr
+    audio_status: Literal['ready', 'pending', 'unavailable'] = 'ready'
     audio_url: Optional[StrictStr] = None
+    audio_duration: Optional[float] = None
+    audio_size: Optional[StrictInt] = None
     patterns: dict[StrictStr, tuple[StrictStr, StrictStr]]
     
     
@@ -110,4 +115,17 @@ class SaveProgress(BaseModel):
 
 class SaveProgressResponse(BaseModel):
     status: Literal['ok']
+
+
+class ProgressRecord(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    learner: StrictStr = Field(min_length=1, max_length=128)
+    phonemes_seen: dict[StrictStr, Optional[StrictStr]]
+
+
+class ProgressImportResponse(BaseModel):
+    imported: StrictInt
+    rejected: StrictInt
+    errors: list[dict]
+    errors_truncated: bool
     
\ No newline at end of file
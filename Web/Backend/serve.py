@@ -0,0 +1,182 @@
+"""
+Production launcher
+
+Runs the API with N pre-forked uvicorn workers sharing one listening socket.
+'uvicorn fast_api:app --workers N' spawns fresh interpreters, so every worker imports the app, builds the phonemes
+dictionary and the Pydantic validators and warms its caches on its own. Here the parent does that work once:
+    - imports 'fast_api' (content catalogue, schemas and the validators of every route) and builds the OpenAPI schema,
+    - loads the compiled catalogue if there is one and indexes its homophones ('catalogue.Catalogue.index()'),
+      loads the audio manifest and precompresses the frontend,
+then calls gc.freeze() and forks the workers. They start serving almost at once, and the pages holding that state
+stay shared copy-on-write between them: freezing moves it out of the collector's reach, so collections in a worker
+never write to those objects (and their pages are not copied).
+Threads and pools (exercise pools, bulkheads, audio pipeline) are only started by each worker, in the lifespan of the app.
+
+The parent restarts a worker that dies and, on SIGINT/SIGTERM, stops the workers and waits for them;
+a worker whose parent disappears stops on its own.
+Ongoing tests, idempotency keys and metrics live in each worker, as with 'uvicorn --workers'.
+Needs os.fork (Linux, macOS).
+
+Run from Web/Backend:
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import log_file
+
+
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 1.0
+PARENT_CHECK_INTERVAL = 1.0
+POLL_INTERVAL = 0.2
+
+
+def preload():
+    """Build in the parent everything the workers only read."""
+    start = time.perf_counter()
+    import fast_api
+    import audio_pipeline
+    import catalogue
+    from phoneme_api import AUDIO_DIR
+
+    fast_api.app.openapi()
+    catalogue.reload()
+    catalogue.current().index()
+    audio_pipeline.load_manifest(AUDIO_DIR)
+    fast_api.frontend.warm()
+    logger.info(f'App preloaded in {time.perf_counter() - start:.2f} s')
+    return fast_api.app
+
+
+def bind(host, port, backlog):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def watch_parent(parent):
+    """Stop the worker if the launcher dies without stopping it (e.g. SIGKILL)."""
+    while os.getppid() == parent:
+        time.sleep(PARENT_CHECK_INTERVAL)
+    logger.warning(f'Launcher {parent} is gone; worker {os.getpid()} stopping')
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def run_worker(app, sock, args, parent):
+    import uvicorn
+
+    gc.enable()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    threading.Thread(target=watch_parent, args=(parent,), name='parent-watch', daemon=True).start()
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_graceful_shutdown=args.graceful_timeout)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock, args):
+    parent = os.getpid()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock, args, parent)
+        except BaseException:
+            logger.exception('Worker crashed')
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f'Worker {pid} started')
+    return pid
+
+
+def stop(workers, timeout):
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + timeout
+    while workers and time.monotonic() < deadline:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.discard(pid)
+        else:
+            time.sleep(POLL_INTERVAL)
+    for pid in workers:
+        logger.warning(f'Worker {pid} did not stop in time; killing it')
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+
+def supervise(app, sock, args):
+    workers = {spawn(app, sock, args) for _ in range(args.workers)}
+    gc.enable()
+    stopping = []
+
+    def on_signal(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    while not stopping:  # polled: a blocking waitpid() would be resumed after the signal handler
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if not pid:
+            time.sleep(POLL_INTERVAL)
+            continue
+        if stopping or pid not in workers:
+            continue
+        workers.discard(pid)
+        logger.warning(f'Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting it')
+        time.sleep(RESTART_DELAY)
+        workers.add(spawn(app, sock, args))
+
+    logger.info(f'Stopping {len(workers)} workers')
+    stop(workers, args.graceful_timeout + 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--graceful-timeout', type=int, default=10, help='seconds a worker has to finish its requests')
+    args = parser.parse_args()
+    if not hasattr(os, 'fork'):
+        sys.exit('serve.py needs os.fork; use uvicorn fast_api:app --workers N on this platform')
+
+    log_file.activate_handler()
+    gc.disable()  # nothing collected (and moved) between preloading and freezing
+    app = preload()
+    sock = bind(args.host, args.port, args.backlog)
+    gc.freeze()
+    print(f'Serving on http://{args.host}:{args.port} with {args.workers} workers (pid {os.getpid()})', flush=True)
+    supervise(app, sock, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Testing module for admission.py
+
+Token buckets are aged by moving their 'updated' time back instead of sleeping.
+The middleware is called directly with a mocked request and 'call_next', on fresh limiters.
+
+"""
+
+
+import unittest
+from unittest.mock import patch, Mock
+import asyncio
+import logging
+import admission
+from admission import TokenBucket, RateLimiter, ConcurrencyLimiter, Shed
+
+logging.getLogger('admission').disabled = True
+
+
+def request(path = '/checkspellanswer', host = '10.0.0.1', forwarded = None):
+    headers = {'x-forwarded-for': forwarded} if forwarded else {}
+    return Mock(url = Mock(path = path), headers = headers, client = Mock(host = host))
+
+
+
+class TestRateLimit(unittest.TestCase):
+    """Test 'TokenBucket' and 'RateLimiter'"""
+
+    def test_bucket_empties_then_refills(self):
+        bucket = TokenBucket(rate = 2.0, capacity = 3)
+
+        self.assertEqual([bucket.take() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.take(), 0.5, places = 2)
+        bucket.updated -= 1
+        self.assertEqual([bucket.take() for _ in range(2)], [0, 0])
+        self.assertGreater(bucket.take(), 0)
+
+
+    def test_bucket_capped(self):
+        bucket = TokenBucket(rate = 10.0, capacity = 2)
+        bucket.updated -= 3600
+
+        self.assertEqual([bucket.take() == 0 for _ in range(3)], [True, True, False])
+
+
+    def test_clients_and_groups_separate(self):
+        limiter = RateLimiter({'answer': (1.0, 1), 'learn': (1.0, 1)})
+
+        self.assertEqual(limiter.take('a', 'answer'), 0)
+        self.assertGreater(limiter.take('a', 'answer'), 0)
+        self.assertEqual(limiter.take('a', 'learn'), 0)
+        self.assertEqual(limiter.take('b', 'answer'), 0)
+
+
+    def test_least_recent_client_forgotten(self):
+        limiter = RateLimiter({'answer': (1.0, 1)}, max_clients = 2)
+        for client in ('a', 'b', 'a', 'c'):
+            limiter.take(client, 'answer')
+
+        self.assertEqual(list(limiter.buckets), [('a', 'answer'), ('c', 'answer')])
+
+
+
+class TestClientId(unittest.TestCase):
+    """Test which address identifies a client"""
+
+    def test_forwarded_ignored_by_default(self):
+        with patch('admission.TRUSTED_PROXIES', 0):
+            self.assertEqual(admission.client_id(request(forwarded = '1.2.3.4')), '10.0.0.1')
+
+
+    def test_right_most_hops_trusted(self):
+        for proxies, forwarded, expected in ((1, 'spoofed, 1.2.3.4', '1.2.3.4'),
+                                             (2, 'spoofed, 1.2.3.4, 10.0.0.2', '1.2.3.4'),
+                                             (2, '1.2.3.4', '1.2.3.4'),
+                                             (1, ' , ', '10.0.0.1')):
+            with self.subTest(proxies = proxies, forwarded = forwarded), patch('admission.TRUSTED_PROXIES', proxies):
+                self.assertEqual(admission.client_id(request(forwarded = forwarded)), expected)
+
+
+
+class TestConcurrencyLimit(unittest.TestCase):
+    """Test the slots and the wait queue of 'ConcurrencyLimiter'"""
+
+    def test_queue_full_shed(self):
+        async def run():
+            limiter = ConcurrencyLimiter(limit = 1, queue_size = 1, timeout = 5)
+            await limiter.acquire()
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            with self.assertRaises(Shed) as raised:
+                await limiter.acquire()
+            limiter.release()
+            await waiter
+            return raised.exception.reason, limiter.in_flight
+
+        self.assertEqual(asyncio.run(run()), ('queue_full', 1))
+
+
+    def test_deadline_shed(self):
+        async def run():
+            limiter = ConcurrencyLimiter(limit = 1, queue_size = 1, timeout = 0.01)
+            await limiter.acquire()
+            with self.assertRaises(Shed) as raised:
+                await limiter.acquire()
+            return raised.exception.reason, limiter.waiting
+
+        self.assertEqual(asyncio.run(run()), ('deadline', 0))
+
+
+
+class TestMiddleware(unittest.TestCase):
+    """Test the decisions of 'middleware()'"""
+
+    def setUp(self):
+        for target, value in (('admission.rate_limiter', RateLimiter({'answer': (1.0, 2), 'learn': (1.0, 2)})),
+                              ('admission.limiter', ConcurrencyLimiter(limit = 1, queue_size = 0, timeout = 0.01)),
+                              ('admission.TRUSTED_PROXIES', 0)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.degraded = []
+
+
+    async def call_next(self, request):
+        self.degraded.append(admission.degraded())
+        return 'response'
+
+
+    def call(self, request):
+        return asyncio.run(admission.middleware(request, self.call_next))
+
+
+    def test_other_paths_untouched(self):
+        for _ in range(5):
+            self.assertEqual(self.call(request('/spell/i:')), 'response')
+
+
+    def test_rate_limited(self):
+        responses = [self.call(request()) for _ in range(3)]
+
+        self.assertEqual(responses[:2], ['response'] * 2)
+        self.assertEqual(responses[2].status_code, 429)
+        self.assertIn('retry-after', responses[2].headers)
+        self.assertEqual(self.call(request(host = '10.0.0.2')), 'response')
+
+
+    def test_saturated_answer_shed_and_learn_degraded(self):
+        async def run():
+            await admission.limiter.acquire()  #the only slot taken
+            shed = await admission.middleware(request(), self.call_next)
+            learn = await admission.middleware(request('/learn'), self.call_next)
+            return shed, learn
+
+        shed, learn = asyncio.run(run())
+
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual(learn, 'response')
+        self.assertEqual(self.degraded, [True])
+        self.assertFalse(admission.degraded())
+
+
+    def test_admitted_slot_released(self):
+        self.call(request('/learn'))
+
+        self.assertEqual(self.degraded, [False])
+        self.assertEqual(admission.limiter.in_flight, 0)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
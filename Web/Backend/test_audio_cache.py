@@ -0,0 +1,171 @@
+"""
+Testing module for audio_cache.py
+
+'TestParsing' tests the Range and conditional header helpers on their own;
+the other classes call 'AudioFiles' as an ASGI app on clips written to a temporary directory.
+
+"""
+
+
+import unittest
+import asyncio
+import tempfile
+import logging
+from pathlib import Path
+from audio_cache import AudioFiles, parse_range, not_modified
+
+logging.getLogger('audio_cache').disabled = True
+
+CONTENT = bytes(range(256)) * 10
+
+
+def call(app, name, headers = None, method = 'GET'):
+    """Request '/name' from 'app'. Return the status, the response headers and the body."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': f'/{name}', 'root_path': '',
+             'headers': [(key.encode('latin-1'), value.encode('latin-1')) for key, value in (headers or {}).items()]}
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], {key.decode(): value.decode() for key, value in start['headers']}, body
+
+
+
+class TestParsing(unittest.TestCase):
+    """Test 'parse_range()' and 'not_modified()'"""
+
+    def test_ranges(self):
+        for header, expected in (('bytes=0-9', (0, 9)), ('bytes=10-', (10, 99)), ('bytes=-10', (90, 99)),
+                                 ('bytes=90-500', (90, 99)), ('bytes=-500', (0, 99)),
+                                 ('bytes=100-', False), ('bytes=20-10', False), ('bytes=-0', False),
+                                 ('bytes=0-1,5-6', None), ('items=0-9', None), ('bytes=a-b', None)):
+            with self.subTest(header = header):
+                self.assertEqual(parse_range(header, 100), expected)
+
+
+    def test_not_modified(self):
+        headers = {'etag': '"abc"', 'last-modified': 'Mon, 19 Oct 2026 10:00:00 GMT'}
+
+        self.assertTrue(not_modified({'if-none-match': '"x", W/"abc"'}, headers))
+        self.assertTrue(not_modified({'if-none-match': '*'}, headers))
+        self.assertFalse(not_modified({'if-none-match': '"x"', 'if-modified-since': headers['last-modified']}, headers))
+        self.assertTrue(not_modified({'if-modified-since': 'Tue, 20 Oct 2026 10:00:00 GMT'}, headers))
+        self.assertFalse(not_modified({'if-modified-since': 'Sun, 18 Oct 2026 10:00:00 GMT'}, headers))
+        self.assertFalse(not_modified({}, headers))
+
+
+
+class AudioFilesTest(unittest.TestCase):
+    """Base class serving a temporary directory holding one clip"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.name = 'ear.0123456789ab.mp3'
+        (Path(self.tempdir.name) / self.name).write_bytes(CONTENT)
+        self.app = AudioFiles(self.tempdir.name)
+
+
+
+class TestServing(AudioFilesTest):
+    """Test whole files, ranges, conditional requests and errors"""
+
+    def test_whole_file(self):
+        status, headers, body = call(self.app, self.name)
+
+        self.assertEqual((status, body), (200, CONTENT))
+        self.assertEqual(headers['content-type'], 'audio/mpeg')
+        self.assertEqual(headers['content-length'], str(len(CONTENT)))
+        self.assertEqual(headers['accept-ranges'], 'bytes')
+
+
+    def test_range(self):
+        status, headers, body = call(self.app, self.name, {'range': 'bytes=100-199'})
+
+        self.assertEqual((status, body), (206, CONTENT[100:200]))
+        self.assertEqual(headers['content-range'], f'bytes 100-199/{len(CONTENT)}')
+
+
+    def test_unsatisfiable_range(self):
+        status, headers, _ = call(self.app, self.name, {'range': f'bytes={len(CONTENT)}-'})
+
+        self.assertEqual(status, 416)
+        self.assertEqual(headers['content-range'], f'bytes */{len(CONTENT)}')
+
+
+    def test_if_range(self):
+        etag = call(self.app, self.name)[1]['etag']
+
+        self.assertEqual(call(self.app, self.name, {'range': 'bytes=0-9', 'if-range': etag})[0], 206)
+        status, _, body = call(self.app, self.name, {'range': 'bytes=0-9', 'if-range': '"stale"'})
+        self.assertEqual((status, body), (200, CONTENT))
+
+
+    def test_not_modified(self):
+        etag = call(self.app, self.name)[1]['etag']
+
+        status, headers, body = call(self.app, self.name, {'if-none-match': etag})
+
+        self.assertEqual((status, body), (304, b''))
+        self.assertEqual(headers['etag'], etag)
+
+
+    def test_head(self):
+        status, headers, body = call(self.app, self.name, method = 'HEAD')
+
+        self.assertEqual((status, body), (200, b''))
+        self.assertEqual(headers['content-length'], str(len(CONTENT)))
+
+
+    def test_errors(self):
+        for name, method, status in (('missing.mp3', 'GET', 404), ('../secret', 'GET', 404), ('.hidden', 'GET', 404),
+                                     (self.name, 'POST', 405)):
+            with self.subTest(name = name, method = method):
+                self.assertEqual(call(self.app, name, method = method)[0], status)
+
+
+
+class TestMemoryCache(AudioFilesTest):
+    """Test admission into and eviction from the in-memory LRU"""
+
+    def test_admitted_after_repeated_requests(self):
+        for _ in range(3):
+            status, _, body = call(self.app, self.name, {'range': 'bytes=0-9'})
+            self.assertEqual((status, body), (206, CONTENT[:10]))
+
+        self.assertIn(self.name, self.app.cache)
+        self.assertEqual(self.app.stats['disk'], 2)
+        self.assertEqual(self.app.stats['memory'], 1)
+
+
+    def test_lru_bounded(self):
+        app = AudioFiles(self.tempdir.name, max_bytes = len(CONTENT) + 1)
+        other = 'air.0123456789ab.mp3'
+        (Path(self.tempdir.name) / other).write_bytes(CONTENT)
+
+        for name in (self.name, self.name, other, other):
+            call(app, name)
+
+        self.assertEqual(list(app.cache), [other])
+        self.assertEqual(app.stats['evicted'], 1)
+
+
+    def test_large_clip_never_admitted(self):
+        app = AudioFiles(self.tempdir.name, max_item = len(CONTENT) - 1)
+
+        for _ in range(3):
+            call(app, self.name)
+
+        self.assertEqual(len(app.cache), 0)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""
+Testing module for audio_pipeline.py
+
+MP3 streams are made of synthetic frames (a valid header followed by zeros), which is all 'mp3_duration()' reads.
+'process()' is called directly, without the process pool, and ffmpeg is mocked away so results don't depend on it.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import multiprocessing
+import tempfile
+import time
+import wave
+import logging
+from pathlib import Path
+import audio_pipeline
+from audio_pipeline import sniff_format, mp3_duration, audio_duration
+
+logging.getLogger('audio_pipeline').disabled = True
+
+
+def mp3_frame(bitrate_index = 9, padding = 0):
+    """One MPEG-1 Layer III frame at 44.1 kHz (bitrate index 9: 128 kbps)."""
+    bitrate = audio_pipeline.MP3_BITRATES['v1'][bitrate_index] * 1000
+    header = bytes([0xFF, 0xFB, bitrate_index << 4 | padding << 1, 0x00])
+    return header + bytes(144 * bitrate // 44100 + padding - 4)
+
+
+FRAME_SECONDS = 1152 / 44100
+CLIPS_PER_PROCESS = 40
+
+
+def manifest_entry(stem):
+    return {'file': f'{stem}.0123456789ab.mp3', 'source_file': f'{stem}.mp3', 'source_format': 'mp3', 'size': 0,
+            'duration': None, 'processed_at': time.time()}
+
+
+def record_clips(audio_dir, prefix):
+    """Run in a worker process of its own: record CLIPS_PER_PROCESS entries in the shared manifest."""
+    for number in range(CLIPS_PER_PROCESS):
+        audio_pipeline.record(audio_dir, f'{prefix}{number}', manifest_entry(f'{prefix}{number}'))
+
+
+class TestFormat(unittest.TestCase):
+    """Test 'sniff_format()' and 'mp3_duration()'"""
+
+    def test_sniff_format(self):
+        for head, expected in ((b'RIFF\x00\x00\x00\x00WAVE', 'wav'), (b'ID3\x04' + bytes(8), 'mp3'),
+                               (mp3_frame()[:12], 'mp3'), (b'OggS' + bytes(8), 'ogg'),
+                               (b'<html>', None), (b'', None)):
+            with self.subTest(head = head):
+                self.assertEqual(sniff_format(head), expected)
+
+
+    def test_constant_bitrate(self):
+        self.assertAlmostEqual(mp3_duration(mp3_frame() * 100), 100 * FRAME_SECONDS)
+
+
+    def test_variable_bitrate_and_padding(self):
+        content = (mp3_frame(9) + mp3_frame(5, padding = 1) + mp3_frame(14)) * 10
+
+        self.assertAlmostEqual(mp3_duration(content), 30 * FRAME_SECONDS)
+
+
+    def test_id3_tag_and_junk_skipped(self):
+        tag = b'ID3\x04\x00\x00\x00\x00\x01\x00' + mp3_frame()[:128]  #synchsafe size 128, holding a frame header
+        content = tag + mp3_frame() * 10 + b'junk' + mp3_frame() * 10
+
+        self.assertAlmostEqual(mp3_duration(content), 20 * FRAME_SECONDS)
+
+
+    def test_not_mp3(self):
+        self.assertEqual(mp3_duration(b''), 0)
+        self.assertEqual(mp3_duration(bytes(1000)), 0)
+
+
+
+class PipelineTest(unittest.TestCase):
+    """Base class with a temporary audio directory and its own manifest cache"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.dir = Path(self.tempdir.name)
+        for target, value in (('audio_pipeline._manifests', {}), ('audio_pipeline.transcode', lambda source, target: False)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+
+    def write_wav(self, name, seconds, rate = 8000):
+        path = self.dir / name
+        with wave.open(str(path), 'wb') as clip:
+            clip.setnchannels(1)
+            clip.setsampwidth(2)
+            clip.setframerate(rate)
+            clip.writeframes(bytes(2 * int(seconds * rate)))
+        return path
+
+
+
+class TestProcess(PipelineTest):
+    """Test 'process()' and the manifest it feeds"""
+
+    def test_wav_kept_and_described(self):
+        source = self.write_wav('ear.0123456789ab.wav', 1.5)
+
+        entry = audio_pipeline.process(source, 'ear')
+
+        self.assertEqual((entry['format'], entry['source_format'], entry['duration']), ('wav', 'wav', 1.5))
+        self.assertEqual(entry['source_file'], source.name)
+        self.assertRegex(entry['file'], r'^ear\.[0-9a-f]{12}\.wav$')
+        self.assertEqual(entry['size'], (self.dir / entry['file']).stat().st_size)
+        self.assertAlmostEqual(audio_duration(self.dir / entry['file'], 'wav'), 1.5)
+
+
+    def test_unknown_format_rejected(self):
+        path = self.dir / 'ear.0123456789ab.mp3'
+        path.write_bytes(b'<html>not found</html>')
+
+        with self.assertRaises(ValueError):
+            audio_pipeline.process(path, 'ear')
+
+
+    def test_recorded_entry_found_and_described(self):
+        entry = audio_pipeline.process(self.write_wav('ear.0123456789ab.wav', 0.5), 'ear')
+        audio_pipeline.record(self.dir, 'ear', entry)
+
+        with patch('audio_pipeline._manifests', {}):  #read back from disk
+            self.assertEqual(audio_pipeline.manifest_entry(self.dir, 'ear'), entry)
+            self.assertEqual(audio_pipeline.describe(self.dir / entry['file']),
+                             {'audio_duration': 0.5, 'audio_size': entry['size']})
+        self.assertIsNone(audio_pipeline.manifest_entry(self.dir, 'air'))
+
+
+    def test_entry_ignored_once_file_gone(self):
+        entry = audio_pipeline.process(self.write_wav('ear.0123456789ab.wav', 0.5), 'ear')
+        audio_pipeline.record(self.dir, 'ear', entry)
+        (self.dir / entry['file']).unlink()
+
+        self.assertIsNone(audio_pipeline.manifest_entry(self.dir, 'ear'))
+
+
+    def test_describe_unprocessed_and_missing(self):
+        path = self.dir / 'ear.0123456789ab.mp3'
+        path.write_bytes(mp3_frame())
+
+        self.assertEqual(audio_pipeline.describe(path), {'audio_duration': None, 'audio_size': len(mp3_frame())})
+        self.assertEqual(audio_pipeline.describe(self.dir / 'missing.mp3'), {'audio_duration': None, 'audio_size': None})
+        self.assertEqual(audio_pipeline.describe(None), {'audio_duration': None, 'audio_size': None})
+
+
+
+class TestCleanup(PipelineTest):
+    """Test that superseded downloads are deleted after GRACE_SECONDS only"""
+
+    def setUp(self):
+        super().setUp()
+        self.source = self.dir / 'ear.0123456789ab.mp3'
+        self.source.write_bytes(mp3_frame())
+        self.final = self.dir / 'ear.ba9876543210.mp3'
+        self.final.write_bytes(mp3_frame() * 2)
+
+
+    def record(self, age):
+        audio_pipeline.record(self.dir, 'ear', {'file': self.final.name, 'source_file': self.source.name,
+                                                'source_format': 'mp3', 'size': 0, 'duration': None,
+                                                'processed_at': time.time() - age})
+
+
+    def test_recent_download_kept(self):
+        self.record(0)
+        audio_pipeline.cleanup(self.dir)
+
+        self.assertTrue(self.source.exists())
+
+
+    def test_old_download_deleted(self):
+        self.record(audio_pipeline.GRACE_SECONDS + 1)
+        audio_pipeline.cleanup(self.dir)
+
+        self.assertFalse(self.source.exists())
+        self.assertTrue(self.final.exists())
+
+
+
+
+
+class TestSharedManifest(PipelineTest):
+    """Test the manifest written by two worker processes at once"""
+
+    def test_no_entry_lost(self):
+        self.assertEqual(audio_pipeline.load_manifest(self.dir), {})  #cached before the workers write
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target = record_clips, args = (self.dir, prefix)) for prefix in ('ear', 'air')]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(worker.exitcode, 0)
+
+        manifest = audio_pipeline.load_manifest(self.dir)
+
+        self.assertEqual(set(manifest), {f'{prefix}{number}' for prefix in ('ear', 'air') for number in range(CLIPS_PER_PROCESS)})
+        self.assertEqual(list(self.dir.glob('*.tmp')), [])
+
+
+    def test_entry_of_other_process_seen(self):
+        audio_pipeline.record(self.dir, 'ear', manifest_entry('ear'))
+        self.assertEqual(set(audio_pipeline.load_manifest(self.dir)), {'ear'})
+
+        with patch('audio_pipeline._manifests', {}):  #the other process, with a cache of its own
+            audio_pipeline.record(self.dir, 'air', manifest_entry('air'))
+
+        self.assertEqual(set(audio_pipeline.load_manifest(self.dir)), {'ear', 'air'})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
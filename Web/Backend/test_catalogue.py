@@ -0,0 +1,186 @@
+"""
+Testing module for catalogue.py
+
+Catalogues are compiled with 'content_build.build()' into a temporary directory, from JSON sources
+made of the built-in content with one change per version, then loaded with 'reload()' as the watcher would.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import copy
+import json
+import queue
+import tempfile
+import logging
+from pathlib import Path
+import catalogue
+import content_build
+import exercise_pool
+import logic
+from catalogue import Catalogue, BUILTIN
+from logic import HomophoneTest, check_spell_answer, check_homophone_answer
+from phonemes_dict import phonemes as builtin_phonemes
+
+logging.getLogger('catalogue').disabled = True
+logging.getLogger('exercise_pool').disabled = True
+
+PHONEME = 'ɔ:'
+WORD = '/wɔ:d/'
+HOMOPH = '/sɔ:/'
+
+
+class CatalogueTest(unittest.TestCase):
+    """Base class with the built-in catalogue in use, a listener recording the swaps and a temporary catalogue directory"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.dir = Path(self.tempdir.name) / 'catalogue'
+        self.content = content_build.compile_value(builtin_phonemes)
+        self.tests = {}
+        self.swaps = []
+        for target, value in (('catalogue._current', Catalogue(BUILTIN, builtin_phonemes)),
+                              ('catalogue._failed_version', None),
+                              ('catalogue._listeners', [lambda old, new: self.swaps.append((old.version, new.version))]),
+                              ('logic.ONGOING_TESTS', self.tests)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+
+    def publish(self):
+        """Compile 'self.content' into the catalogue directory and return its version."""
+        source = Path(self.tempdir.name) / 'phonemes.json'
+        source.write_text(json.dumps(self.content, ensure_ascii=False), encoding='utf-8')
+        report = content_build.build(source, self.dir, workers = 1)
+        self.assertEqual(report['errors'], [])
+        return catalogue.manifest_version(self.dir)
+
+
+
+class TestReload(CatalogueTest):
+    """Test when 'reload()' swaps the catalogue in use and when it keeps it"""
+
+    def test_swapped_on_new_version_only(self):
+        first = self.publish()
+
+        self.assertTrue(catalogue.reload(self.dir))
+        self.assertFalse(catalogue.reload(self.dir))
+        self.assertEqual(catalogue.current().version, first)
+
+        self.content[PHONEME]['homophones'][HOMOPH].remove('sore')
+        second = self.publish()
+
+        self.assertTrue(catalogue.reload(self.dir))
+        self.assertEqual(catalogue.current().version, second)
+        self.assertEqual(catalogue.current().homophone_group(PHONEME, HOMOPH).spellings, ('saw', 'soar'))
+        self.assertEqual(self.swaps, [(BUILTIN, first), (first, second)])
+
+
+    def test_nothing_to_load(self):
+        self.assertFalse(catalogue.reload(self.dir))
+        self.assertEqual(catalogue.current().version, BUILTIN)
+
+
+    def test_failed_load_keeps_current_and_not_retried(self):
+        first = self.publish()
+        catalogue.reload(self.dir)
+        self.content[PHONEME]['api'] = 'awe'
+        broken = self.publish()
+        manifest = json.loads((self.dir / content_build.MANIFEST_NAME).read_text(encoding='utf-8'))
+        (self.dir / manifest['phonemes'][PHONEME]['file']).unlink()
+
+        with patch('catalogue.load', wraps = catalogue.load) as load:
+            self.assertFalse(catalogue.reload(self.dir))
+            self.assertFalse(catalogue.reload(self.dir))
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual((catalogue.current().version, catalogue._failed_version), (first, broken))
+        self.assertEqual(self.swaps, [(BUILTIN, first)])
+
+        self.content[PHONEME]['api'] = 'ore'
+        fixed = self.publish()
+        self.assertTrue(catalogue.reload(self.dir))
+        self.assertEqual(self.swaps[-1], (first, fixed))
+
+
+
+class TestPinnedTests(CatalogueTest):
+    """Test that tests handed out before a swap are answered against the content they were built from"""
+
+    def setUp(self):
+        super().setUp()
+        self.publish()
+        catalogue.reload(self.dir)
+        content = catalogue.current()
+        spell, _ = logic.build_spell_tests([(WORD, PHONEME)], content = content)
+        self.tests.update(spell)
+        self.spell_id = next(iter(spell))
+        self.tests['homoph_test_1'] = HomophoneTest(content.homophone_group(PHONEME, HOMOPH))
+
+        self.content[PHONEME]['spelling'][WORD] = ['woard', 'ward', 'word']
+        self.content[PHONEME]['homophones'][HOMOPH].remove('sore')
+        self.publish()
+        catalogue.reload(self.dir)
+
+
+    def test_spell_answered_with_old_solution(self):
+        self.assertEqual(catalogue.current().phonemes[PHONEME]['spelling'][WORD][0], 'woard')
+
+        self.assertEqual(check_spell_answer({'test_id': self.spell_id, 'answer': 'ward'}), {'answered': 'correct'})
+
+
+    def test_homophone_answered_with_old_group(self):
+        self.assertNotIn('sore', catalogue.current().homophone_group(PHONEME, HOMOPH).spellings)
+
+        for answer, verdict in (('sore', 'correct'), ('saw', 'correct'), ('soar', 'done')):
+            with self.subTest(answer = answer):
+                self.assertEqual(check_homophone_answer({'test_id': 'homoph_test_1', 'answer': answer})['answered'], verdict)
+
+
+
+class TestPoolFlush(CatalogueTest):
+    """Test that the exercise pools never hand out a batch of a replaced catalogue"""
+
+    def setUp(self):
+        super().setUp()
+        for target, value in (('exercise_pool.POOLS', {}),
+                              ('exercise_pool._pending', set()),
+                              ('exercise_pool._refill_queue', queue.Queue()),
+                              ('catalogue._listeners', [exercise_pool.flush])):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.name = ('spell', PHONEME)
+        self.first = self.publish()
+        catalogue.reload(self.dir)
+        exercise_pool.schedule(self.name)
+        exercise_pool.refill(self.name)
+        self.batch = copy.deepcopy(exercise_pool.POOLS[self.name][0])
+
+        self.content[PHONEME]['spelling'][WORD] = ['woard', 'ward', 'word']
+        self.second = self.publish()
+        catalogue.reload(self.dir)
+
+
+    def test_pools_emptied_on_swap(self):
+        self.assertEqual(self.batch[0], self.first)
+        self.assertEqual(exercise_pool.POOLS, {})
+
+
+    def test_late_batch_of_old_version_rebuilt(self):
+        exercise_pool.schedule(self.name)
+        exercise_pool.POOLS[self.name].append(self.batch)  #a refill that started before the swap
+
+        payload = exercise_pool.take('spell', PHONEME)
+
+        self.assertNotEqual(payload, self.batch[2])
+        self.assertTrue(set(self.batch[1]).isdisjoint(self.tests))
+        self.assertEqual({test['version'] for test in self.tests.values()}, {self.second})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Testing module for content_build.py
+
+Entries are copies of the built-in content (phonemes_dict.py) with one defect each.
+Builds run in a single process, from JSON sources written to a temporary directory next to the catalogue they update.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import copy
+import json
+import tempfile
+from pathlib import Path
+import content_build
+from content_build import validate_entry, cross_problems, MANIFEST_NAME
+from phonemes_dict import phonemes as builtin_phonemes
+
+PHONEME = 'ɔ:'
+WORD = '/wɔ:d/'
+HOMOPH = '/sɔ:/'
+
+
+def entry():
+    return copy.deepcopy(builtin_phonemes[PHONEME])
+
+
+def problems(entry, phoneme = PHONEME):
+    return validate_entry((phoneme, entry))[1]
+
+
+
+class TestValidateEntry(unittest.TestCase):
+    """Test each rule of 'validate_entry()'"""
+
+    def test_builtin_content_valid(self):
+        for phoneme, content in builtin_phonemes.items():
+            with self.subTest(phoneme = phoneme):
+                self.assertEqual(problems(content, phoneme), [])
+
+
+    def test_wrong_option_count(self):
+        for options in (('ward', 'word'), ('ward', 'word', 'woard', 'wored')):
+            with self.subTest(options = options):
+                broken = entry()
+                broken['spelling'][WORD] = options
+                self.assertEqual(problems(broken), [f'[{PHONEME}] spelling {WORD}: {len(options)} words, expected exactly 3'])
+
+
+    def test_too_few_spelling_words(self):
+        broken = entry()
+        broken['spelling'] = dict(list(broken['spelling'].items())[:content_build.SPELL_BATCH - 1])
+
+        self.assertIn(f'[{PHONEME}]: spelling has {content_build.SPELL_BATCH - 1} entries, expected a dict of at least '
+                      f'{content_build.SPELL_BATCH} entries', problems(broken))
+
+
+    def test_too_few_homophones(self):
+        broken = entry()
+        broken['homophones'] = {HOMOPH: broken['homophones'][HOMOPH]}
+        one_spelling = entry()
+        one_spelling['homophones'][HOMOPH] = {'saw'}
+
+        self.assertEqual(problems(broken), [f'[{PHONEME}]: homophones has 1 entries, expected a dict of at least 2 entries'])
+        self.assertEqual(problems(one_spelling), [f'[{PHONEME}] homophone {HOMOPH}: 1 words, expected at least 2'])
+
+
+    def test_bad_transcriptions(self):
+        for transcription, expected in (('wɔ:d', 'is not a transcription between slashes'),
+                                        ('/wɔ:dx/', 'has symbols outside IPA_SYMBOLS: x'),
+                                        ('/wɔ:d\'/', 'ends with a stress mark'),
+                                        ("/ˈ'wɔd/", 'has a stress mark not followed by a sound'),
+                                        ('/:wɔd/', 'has a length mark not following a sound'),
+                                        ('/wɔ::d/', 'has a length mark not following a sound')):
+            with self.subTest(transcription = transcription):
+                broken = entry()
+                broken['spelling'][transcription] = broken['spelling'].pop(WORD)
+                found = problems(broken)
+                self.assertTrue(found)
+                self.assertTrue(all(transcription in problem and expected in problem for problem in found), found)
+
+
+    def test_sections(self):
+        missing = entry()
+        del missing['api']
+        unknown = entry()
+        unknown['extra'] = {}
+        bad_api = entry()
+        bad_api['api'] = 'Or'
+
+        self.assertEqual(problems(missing), [f"[{PHONEME}]: missing 'api'"])
+        self.assertEqual(problems(unknown), [f"[{PHONEME}]: unknown section 'extra'"])
+        self.assertEqual(problems(bad_api), [f"[{PHONEME}]: api 'Or' is not a word"])
+        self.assertEqual(problems([]), [f'[{PHONEME}]: entry is a list, expected a dict'])
+
+
+
+class TestCrossProblems(unittest.TestCase):
+    """Test content shared by two phonemes"""
+
+    def test_builtin_content_shares_nothing(self):
+        self.assertEqual(cross_problems(builtin_phonemes), [])
+
+
+    def test_shared_content_reported(self):
+        content = copy.deepcopy(builtin_phonemes)
+        other = next(phoneme for phoneme in content if phoneme != PHONEME)
+        content[other]['spelling'][WORD] = ('woard', 'wored', 'word')
+        content[other]['homophones'][HOMOPH] = {'saw', 'sore'}
+        content[other]['api'] = content[PHONEME]['api']
+        options = next(iter(content[other]['spelling'].values()))
+        content[other]['spelling']['/wɔ:dz/'] = (content[PHONEME]['spelling'][WORD][0], *options[1:])
+
+        found = cross_problems(content)
+
+        self.assertEqual(sorted(found), sorted([f"transcription '{WORD}' is used by both [{PHONEME}] and [{other}]",
+                                                f"homophone '{HOMOPH}' is used by both [{PHONEME}] and [{other}]",
+                                                f"api word 'or' is used by both [{PHONEME}] and [{other}]",
+                                                f"solution 'ward' is used by both [{PHONEME}] and [{other}]"]))
+
+
+
+class TestBuild(unittest.TestCase):
+    """Test incremental builds and that a build with errors publishes nothing"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.out = Path(self.tempdir.name) / 'catalogue'
+        self.content = content_build.compile_value(builtin_phonemes)
+        self.build()
+
+
+    def build(self, check = False):
+        source = Path(self.tempdir.name) / 'phonemes.json'
+        source.write_text(json.dumps(self.content, ensure_ascii=False), encoding='utf-8')
+        return content_build.build(source, self.out, workers = 1, check = check)
+
+
+    def files(self):
+        """Every file of the catalogue, with what tells a rewritten file from the one before."""
+        return {path.name: (path.stat().st_ino, path.stat().st_mtime_ns) for path in self.out.iterdir()}
+
+
+    def manifest(self):
+        return json.loads((self.out / MANIFEST_NAME).read_text(encoding='utf-8'))
+
+
+    def test_unchanged_build_validates_and_writes_nothing(self):
+        files = {name: stamp for name, stamp in self.files().items() if name != MANIFEST_NAME}
+
+        with patch('content_build.validate_entry', wraps = validate_entry) as validate:
+            report = self.build()
+
+        self.assertEqual((report['validated'], report['unchanged'], report['published']), (0, len(self.content), True))
+        validate.assert_not_called()
+        self.assertEqual({name: stamp for name, stamp in self.files().items() if name != MANIFEST_NAME}, files)
+
+
+    def test_changed_phoneme_only_rebuilt_and_stale_file_pruned(self):
+        before = self.manifest()
+        files = self.files()
+        self.content[PHONEME]['homophones'][HOMOPH].remove('sore')
+
+        with patch('content_build.validate_entry', wraps = validate_entry) as validate:
+            report = self.build()
+
+        after = self.manifest()
+        self.assertEqual((report['validated'], report['unchanged']), (1, len(self.content) - 1))
+        self.assertEqual([call.args[0][0] for call in validate.call_args_list], [PHONEME])
+        self.assertNotEqual(after['version'], before['version'])
+        self.assertFalse((self.out / before['phonemes'][PHONEME]['file']).exists())
+        self.assertEqual(set(self.files()), {MANIFEST_NAME} | {entry['file'] for entry in after['phonemes'].values()})
+        for phoneme, entry in after['phonemes'].items():
+            if phoneme != PHONEME:
+                with self.subTest(phoneme = phoneme):
+                    self.assertEqual(self.files()[entry['file']], files[entry['file']])
+
+
+    def test_errors_leave_catalogue_untouched(self):
+        files = self.files()
+        manifest = (self.out / MANIFEST_NAME).read_bytes()
+        self.content[PHONEME]['homophones'][HOMOPH].remove('sore')
+        self.content[PHONEME]['spelling'][WORD] = ['ward', 'word']
+
+        report = self.build()
+
+        self.assertEqual(report['errors'], [f'[{PHONEME}] spelling {WORD}: 2 words, expected exactly 3'])
+        self.assertFalse(report['published'])
+        self.assertEqual(self.files(), files)
+        self.assertEqual((self.out / MANIFEST_NAME).read_bytes(), manifest)
+
+
+    def test_check_writes_nothing(self):
+        files = self.files()
+        self.content[PHONEME]['homophones'][HOMOPH].remove('sore')
+
+        report = self.build(check = True)
+
+        self.assertEqual((report['validated'], report['errors'], report['published']), (len(self.content), [], False))
+        self.assertEqual(self.files(), files)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
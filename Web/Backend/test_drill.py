@@ -0,0 +1,150 @@
+"""
+Testing module for drill.py
+
+'TestAnswer' calls 'DrillSession.answer()' directly on spelling tests put in 'ONGOING_TESTS';
+'TestSocket' goes through a WebSocket of a small app serving only '/drill'.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import asyncio
+import logging
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+import admission
+import drill
+from drill import DrillSession
+from admission import RateLimiter
+
+logging.getLogger('drill').disabled = True
+
+
+def spell_test(solution = 'sea'):
+    return {'word': '/si:/', 'phoneme': 'i:', 'solution': solution, 'attempts_left': 5, 'with_help': False,
+            'version': 'builtin'}
+
+
+class DrillTest(unittest.TestCase):
+    """Base class with two spelling tests, a generous rate limit and no sessions"""
+
+    def setUp(self):
+        self.tests = {'spell_test_1': spell_test(), 'spell_test_2': spell_test()}
+        for target, value in (('logic.ONGOING_TESTS', self.tests),
+                              ('drill.SESSIONS', {}),
+                              ('admission.rate_limiter', RateLimiter({'answer': (1.0, 100)}))):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.session = DrillSession('session')
+
+
+    def answer(self, seq, answer = 'see', test_id = 'spell_test_1', kind = 'spell'):
+        message = {'seq': seq, 'kind': kind, 'test_id': test_id, 'answer': answer}
+        return asyncio.run(self.session.answer(message, 'client'))
+
+
+
+class TestAnswer(DrillTest):
+    """Test verdicts, sequence numbers and errors"""
+
+    def test_verdict_same_as_http(self):
+        self.assertEqual(self.answer(1), {'seq': 1, 'verdict': {'answered': 'incorrect', 'attempts_left': 4}})
+        self.assertEqual(self.answer(2, 'sea'), {'seq': 2, 'verdict': {'answered': 'correct'}})
+        self.assertNotIn('spell_test_1', self.tests)
+
+
+    def test_resend_replayed_not_checked_again(self):
+        first = self.answer(1)
+
+        self.assertEqual(self.answer(1), first)
+        self.assertEqual(self.tests['spell_test_1']['attempts_left'], 4)
+
+
+    def test_old_sequence_number_refused(self):
+        self.answer(5)
+
+        with patch('drill.MAX_REPLIES', 1):
+            self.answer(6, test_id = 'spell_test_2')
+            self.assertEqual(self.answer(5)['error']['status'], 409)
+            self.assertEqual(self.answer(3)['error']['status'], 409)
+        self.assertEqual(self.session.last_seq, 6)
+
+
+    def test_invalid_sequence_numbers(self):
+        for seq in (0, -1, True, '1', None):
+            with self.subTest(seq = seq):
+                self.assertEqual(self.answer(seq), {'seq': None, 'error': {'status': 400, 'detail': 'seq must be a positive integer'}})
+        self.assertEqual(self.session.last_seq, 0)
+
+
+    def test_errors_remembered_with_their_seq(self):
+        for seq, kwargs, status in ((1, {'kind': 'other'}, 400), (2, {'test_id': 'missing'}, 404), (3, {'answer': None}, 422)):
+            with self.subTest(kwargs = kwargs):
+                reply = self.answer(seq, **kwargs)
+                self.assertEqual((reply['seq'], reply['error']['status']), (seq, status))
+                self.assertEqual(self.answer(seq, **kwargs), reply)
+
+
+    def test_rate_limited_answer_can_be_resent(self):
+        with patch('admission.rate_limiter', RateLimiter({'answer': (1.0, 0)})):
+            reply = self.answer(1)
+        self.assertEqual(reply['error']['status'], 429)
+        self.assertIn('retry_after', reply['error'])
+
+        self.assertEqual(self.answer(1)['verdict']['answered'], 'incorrect')
+
+
+    def test_sessions_resumed_until_expired(self):
+        session = drill.open_session(None)
+
+        self.assertIs(drill.open_session(session.id), session)
+        session.time -= drill.SESSION_DURATION + 1
+        self.assertIsNot(drill.open_session(session.id), session)
+        self.assertNotIn(session.id, drill.SESSIONS)
+
+
+
+class TestSocket(DrillTest):
+    """Test the protocol over a WebSocket"""
+
+    def setUp(self):
+        super().setUp()
+        app = FastAPI()
+
+        @app.websocket('/drill')
+        async def drill_socket(websocket: WebSocket, session: str = None):
+            await drill.serve(websocket, session)
+
+        self.client = TestClient(app)
+
+
+    def test_reconnect_resumes_session(self):
+        with self.client.websocket_connect('/drill') as websocket:
+            ready = websocket.receive_json()
+            self.assertEqual((ready['type'], ready['last_seq']), ('ready', 0))
+            websocket.send_json({'seq': 1, 'kind': 'spell', 'test_id': 'spell_test_1', 'answer': 'see'})
+            first = websocket.receive_json()
+
+        with self.client.websocket_connect(f"/drill?session={ready['session']}") as websocket:
+            self.assertEqual(websocket.receive_json(), {'type': 'ready', 'session': ready['session'], 'last_seq': 1})
+            websocket.send_json({'seq': 1, 'kind': 'spell', 'test_id': 'spell_test_1', 'answer': 'see'})
+            self.assertEqual(websocket.receive_json(), first)
+            websocket.send_text('not json')
+            self.assertEqual(websocket.receive_json()['error']['status'], 400)
+
+
+    def test_rate_limited_per_forwarded_client(self):
+        with patch('admission.TRUSTED_PROXIES', 1):
+            with self.client.websocket_connect('/drill', headers = {'X-Forwarded-For': 'spoofed, 1.2.3.4'}) as websocket:
+                websocket.receive_json()
+                websocket.send_json({'seq': 1, 'kind': 'spell', 'test_id': 'spell_test_1', 'answer': 'see'})
+                websocket.receive_json()
+
+        self.assertEqual(list(admission.rate_limiter.buckets), [('1.2.3.4', 'answer')])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+Testing module for enrich.py
+
+Crawls run against the local stand-in of the dictionary API ('benchmarks.dictionary_stub'),
+with the lookup cache and the index in a temporary directory and no wait between retries.
+
+"""
+
+
+import unittest
+from unittest.mock import patch, Mock
+import tempfile
+import threading
+import time
+import logging
+from pathlib import Path
+import requests
+import catalogue
+import enrich
+import http_client
+from benchmarks.dictionary_stub import DictionaryStub, MEDIA_PATH
+
+logging.getLogger('enrich').disabled = True
+logging.getLogger('phoneme_api').disabled = True
+
+MISSING = ('awe', 'beet')
+RATE = 1000.0
+
+
+class TestHelpers(unittest.TestCase):
+    """Test 'content_words()' and 'RateLimiter'"""
+
+    def test_content_words(self):
+        content = {'i:': {'spelling': {'/si:/': ['sea', 'see', 'sey']}, 'homophones': {'/si:/': {'sea', 'see'}}},
+                   'eɪ': {'spelling': {'/seɪ/': ['say', 'sei', 'sae']}, 'homophones': {'/si:/': {'sea'}}}}
+
+        self.assertEqual(enrich.content_words(content), {'say': ['eɪ'], 'sea': ['eɪ', 'i:'], 'see': ['i:']})
+
+
+    def test_calls_spaced(self):
+        limiter = enrich.RateLimiter(50)
+        stop = threading.Event()
+
+        start = time.monotonic()
+        self.assertTrue(all(limiter.wait(stop) for _ in range(5)))
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 50 - 0.005)
+
+
+    def test_pause_and_stop(self):
+        limiter = enrich.RateLimiter(1000)
+        limiter.pause(5)
+        stop = threading.Event()
+        stop.set()
+
+        self.assertFalse(limiter.wait(stop))
+
+
+    def test_retry_after(self):
+        for headers, expected in (({'Retry-After': '7'}, 7.0), ({'Retry-After': 'soon'}, enrich.BACKOFF), ({}, enrich.BACKOFF)):
+            with self.subTest(headers = headers):
+                self.assertEqual(enrich.retry_after(type('Response', (), {'headers': headers})), expected)
+
+
+
+class CrawlTest(unittest.TestCase):
+    """Base class with a running stub, the built-in content and temporary lookup cache and index"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.stub = DictionaryStub(missing = MISSING).start()
+        self.addCleanup(self.stub.stop)
+        self.addCleanup(http_client.close)
+        self.index = Path(self.tempdir.name) / 'enrichment.sqlite3'
+        for target, value in (('phoneme_api.API_URL', self.stub.api_url),
+                              ('phoneme_api.LOOKUP_DB', Path(self.tempdir.name) / 'lookups.sqlite3'),
+                              ('catalogue.CATALOGUE_DIR', Path(self.tempdir.name) / 'catalogue'),
+                              ('http_client.backoff', lambda attempt, response = None: 0)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.words = enrich.content_words(catalogue.current().phonemes)
+
+
+    def crawl(self, **kwargs):
+        return enrich.crawl(self.index, concurrency = 4, rate = RATE, **kwargs)
+
+
+
+class TestCrawl(CrawlTest):
+    """Test what a crawl indexes and how a new one resumes"""
+
+    def test_every_word_indexed(self):
+        report = self.crawl()
+        index = enrich.load_index(self.index)
+
+        self.assertEqual(report['statuses'], {'ok': len(self.words) - len(MISSING), 'not_found': len(MISSING)})
+        self.assertEqual(set(index), set(self.words))
+        self.assertEqual(index['see']['phonemes'], self.words['see'])
+        self.assertEqual((index['see']['status'], index['see']['ipa']), ('ok', '/see/'))
+        self.assertEqual(index['see']['audio_url'], f'{self.stub.base_url}{MEDIA_PATH}see-uk.mp3')
+        self.assertEqual(index['awe']['status'], 'not_found')
+
+
+    def test_indexed_words_skipped(self):
+        self.crawl()
+        requests = self.stub.requests
+
+        report = self.crawl()
+
+        self.assertEqual((report['skipped'], report['statuses']), (len(self.words), {}))
+        self.assertEqual(self.stub.requests, requests)
+
+
+    def test_errors_retried_by_next_crawl(self):
+        self.stub.error_rate = 1.0
+        self.assertEqual(self.crawl()['statuses'], {'error': len(self.words)})
+        self.assertEqual({entry['status'] for entry in enrich.load_index(self.index).values()}, {'error'})
+
+        self.stub.error_rate = 0.0
+        report = self.crawl()
+
+        self.assertEqual(report['skipped'], 0)
+        self.assertNotIn('error', report['statuses'])
+
+
+    def test_refresh_looks_everything_up_again(self):
+        self.crawl()
+
+        self.assertEqual(self.crawl(refresh = True)['skipped'], 0)
+
+
+    def test_interrupted_word_not_looked_up(self):
+        stop = threading.Event()
+        stop.set()
+
+        result = enrich.enrich_word('see', ['i:'], enrich.RateLimiter(RATE), stop)
+
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('interrupted', result['error'])
+        self.assertEqual(self.stub.requests, 0)
+
+
+    def test_every_attempt_spaced_by_limiter(self):
+        self.stub.error_rate = 1.0
+        limiter = enrich.RateLimiter(RATE)
+
+        with patch.object(limiter, 'wait', wraps = limiter.wait) as wait:
+            result = enrich.enrich_word('see', ['i:'], limiter, threading.Event())
+
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual((self.stub.requests, wait.call_count), (enrich.ATTEMPTS, enrich.ATTEMPTS))
+
+
+    def test_retry_after_honoured_in_full(self):
+        limiter = Mock(wait = Mock(return_value = True))
+        busy = requests.HTTPError('503 Service Unavailable',
+                                  response = Mock(status_code = 503, headers = {'Retry-After': '600'}))
+
+        with patch('phoneme_api.lookup', side_effect = busy) as lookup:
+            result = enrich.enrich_word('see', ['i:'], limiter, threading.Event())
+
+        self.assertEqual(result['status'], 'error')
+        lookup.assert_called_with('see', retries = 0)
+        self.assertEqual([call.args for call in limiter.pause.call_args_list], [(600.0,)] * enrich.ATTEMPTS)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
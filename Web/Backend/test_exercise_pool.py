@@ -0,0 +1,141 @@
+"""
+Testing module for exercise_pool.py
+
+The refill thread is never started: pools are refilled by calling 'refill()' directly,
+so every test sees exactly which batches exist.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import queue
+import logging
+import catalogue
+import exercise_pool
+import logic
+from logic import HomophoneTest
+
+logging.getLogger('exercise_pool').disabled = True
+logging.getLogger('catalogue').disabled = True
+
+PHONEME = 'i:'
+
+
+class PoolTest(unittest.TestCase):
+    """Base class with empty pools, refill queue and ongoing tests"""
+
+    def setUp(self):
+        self.tests = {}
+        for target, value in (('exercise_pool.POOLS', {}),
+                              ('exercise_pool._pending', set()),
+                              ('exercise_pool._refill_queue', queue.Queue()),
+                              ('logic.ONGOING_TESTS', self.tests)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+
+    def queued(self):
+        names = []
+        while not exercise_pool._refill_queue.empty():
+            names.append(exercise_pool._refill_queue.get_nowait())
+        return names
+
+
+
+class TestTake(PoolTest):
+    """Test what 'take()' hands out and registers"""
+
+    def test_empty_pool_built_on_the_spot_and_scheduled(self):
+        payload = exercise_pool.take('spell', PHONEME)
+
+        self.assertEqual(len(payload), 5)
+        self.assertEqual({item['test_id'] for item in payload}, set(self.tests))
+        self.assertEqual(self.queued(), [('spell', PHONEME)])
+
+
+    def test_refill_fills_pool_without_registering(self):
+        exercise_pool.schedule(('homophones', PHONEME))
+        exercise_pool.refill(('homophones', PHONEME))
+
+        self.assertEqual(len(exercise_pool.POOLS[('homophones', PHONEME)]), exercise_pool.POOL_SIZE)
+        self.assertEqual(self.tests, {})
+        self.assertNotIn(('homophones', PHONEME), exercise_pool._pending)
+
+
+    def test_pooled_batch_handed_out_once(self):
+        name = ('homophones', PHONEME)
+        exercise_pool.schedule(name)
+        exercise_pool.refill(name)
+        _, tests, payload = exercise_pool.POOLS[name][0]
+
+        self.assertEqual(exercise_pool.take('homophones', PHONEME), payload)
+        self.assertEqual(set(self.tests), set(tests))
+        self.assertTrue(all(isinstance(test, HomophoneTest) for test in self.tests.values()))
+        self.assertEqual(len(exercise_pool.POOLS[name]), exercise_pool.POOL_SIZE - 1)
+
+
+    def test_pool_scheduled_once_below_low_water(self):
+        name = ('spell', PHONEME)
+        exercise_pool.schedule(name)
+        exercise_pool.refill(name)
+        self.queued()
+
+        for _ in range(exercise_pool.POOL_SIZE - exercise_pool.LOW_WATER + 2):
+            exercise_pool.take('spell', PHONEME)
+
+        self.assertEqual(self.queued(), [name])
+
+
+    def test_review_pools_keyed_whatever_the_order(self):
+        seen = ['i:', 'ɔ:']
+
+        self.assertEqual(exercise_pool.pool_key('reviewspell', seen), exercise_pool.pool_key('reviewspell', seen[::-1]))
+
+
+    def test_seeded_take_bypasses_pools(self):
+        rng = logic.session_rng(1, 'user', 'session')
+
+        payload = exercise_pool.take('spell', PHONEME, rng)
+
+        self.assertEqual(exercise_pool.POOLS, {})
+        self.assertEqual(self.queued(), [])
+        self.assertEqual({item['test_id'] for item in payload}, set(self.tests))
+
+
+
+class TestFlush(PoolTest):
+    """Test that batches of replaced content are never handed out"""
+
+    def setUp(self):
+        super().setUp()
+        self.name = ('spell', PHONEME)
+        exercise_pool.schedule(self.name)
+        exercise_pool.refill(self.name)
+        self.queued()
+
+
+    def test_swap_empties_pools(self):
+        old = catalogue.current()
+        self.addCleanup(catalogue.swap, old)
+
+        catalogue.swap(catalogue.Catalogue('new', old.phonemes))
+
+        self.assertEqual(exercise_pool.POOLS, {})
+
+
+    def test_batch_of_old_version_rebuilt(self):
+        pooled = exercise_pool.POOLS[self.name][0]
+        exercise_pool.POOLS[self.name][0] = ('replaced', *pooled[1:])
+
+        payload = exercise_pool.take('spell', PHONEME)
+
+        self.assertNotEqual(payload, pooled[2])
+        self.assertTrue(set(pooled[1]).isdisjoint(self.tests))
+        self.assertEqual(len(self.tests), 5)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Testing module for learner_store.py
+
+Imports are fed as lists of byte chunks, cut wherever the test needs them;
+progress.json and the learner database live in a temporary data directory.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import asyncio
+import json
+import tempfile
+import logging
+from pathlib import Path
+import bulkheads
+import catalogue
+import learner_store
+from learner_store import ImportReport, ndjson_lines, parse
+
+logging.getLogger('learner_store').disabled = True
+logging.getLogger('logic').disabled = True
+
+PHONEMES = list(catalogue.current().phonemes)
+
+
+async def chunked(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def ndjson(*records):
+    return b''.join(json.dumps(record, ensure_ascii=False).encode() + b'\n' for record in records)
+
+
+def record(learner, *phonemes, audio = None):
+    return {'learner': learner, 'phonemes_seen': {phoneme: audio for phoneme in phonemes}}
+
+
+def lines(chunks):
+    report = ImportReport()
+
+    async def collect():
+        return [line async for line in ndjson_lines(chunked(chunks), report)]
+
+    return asyncio.run(collect()), report
+
+
+
+class TestParsing(unittest.TestCase):
+    """Test how a body is cut into lines and how a line is validated"""
+
+    def test_lines_split_across_chunks(self):
+        found, report = lines([b'{"a":', b' 1}\n\n  \n{"b"', b': 2}\n{"c": 3}'])
+
+        self.assertEqual(found, [(1, b'{"a": 1}'), (4, b'{"b": 2}'), (5, b'{"c": 3}')])
+        self.assertEqual(report.rejected, 0)
+
+
+    def test_long_line_rejected_alone(self):
+        with patch('learner_store.MAX_LINE_BYTES', 16):
+            found, report = lines([b'{"a": 1}\n', b'x' * 10, b'x' * 10, b'x' * 10, b'\n{"b": 2}\n'])
+
+        self.assertEqual(found, [(1, b'{"a": 1}'), (3, b'{"b": 2}')])
+        self.assertEqual([error['line'] for error in report.errors], [2])
+
+
+    def test_valid_record(self):
+        report = ImportReport()
+        line = json.dumps(record('ann', PHONEMES[0], audio = '/somewhere/else/ear.0123456789ab.mp3')).encode()
+
+        self.assertEqual(parse(1, line, report), ('ann', {PHONEMES[0]: 'ear.0123456789ab.mp3'}))
+
+
+    def test_invalid_records_rejected(self):
+        for name, line in (('not JSON', b'{"learner": '), ('extra field', json.dumps({**record('ann'), 'x': 1}).encode()),
+                           ('empty learner', json.dumps(record('', PHONEMES[0])).encode()),
+                           ('unknown phoneme', json.dumps(record('ann', 'zz')).encode())):
+            with self.subTest(name = name):
+                report = ImportReport()
+                self.assertIsNone(parse(7, line, report))
+                self.assertEqual((report.rejected, report.errors[0]['line']), (1, 7))
+
+
+    def test_reported_errors_capped(self):
+        report = ImportReport()
+        with patch('learner_store.MAX_REPORTED_ERRORS', 2):
+            for number in range(5):
+                report.reject(number, 'bad')
+
+        self.assertEqual(report.summary(), {'imported': 0, 'rejected': 5, 'errors': report.errors, 'errors_truncated': True})
+        self.assertEqual(len(report.errors), 2)
+
+
+
+class TestImport(unittest.TestCase):
+    """Test the merge and replace modes, for the local learner and the database, across batches"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        data = Path(self.tempdir.name)
+        for target, value in (('logic.DATA_DIR', data), ('logic.file_path', data / 'progress.json'),
+                              ('learner_store.BATCH_SIZE', 2)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.addCleanup(bulkheads.shutdown)
+
+
+    def load(self, *records, mode = 'merge'):
+        return asyncio.run(learner_store.import_ndjson(chunked([ndjson(*records)]), mode))
+
+
+    def exported(self):
+        return {line['learner']: line['phonemes_seen']
+                for line in map(json.loads, ''.join(learner_store.export_ndjson()).splitlines())}
+
+
+    def test_round_trip(self):
+        records = [record('local', PHONEMES[0], audio = 'ear.0123456789ab.mp3'), record('ann', PHONEMES[1]),
+                   record('bob', *PHONEMES[:3])]
+
+        self.assertEqual(self.load(*records)['imported'], 3)
+        self.assertEqual(self.exported(), {line['learner']: line['phonemes_seen'] for line in records})
+
+
+    def test_merge_keeps_existing_progress(self):
+        self.load(record('local', PHONEMES[0]), record('ann', PHONEMES[0]))
+        self.load(record('local', PHONEMES[1]), record('ann', PHONEMES[1]))
+
+        self.assertEqual(self.exported(), {'local': dict.fromkeys(PHONEMES[:2]), 'ann': dict.fromkeys(PHONEMES[:2])})
+
+
+    def test_replace_overwrites_existing_progress(self):
+        self.load(record('local', PHONEMES[0]), record('ann', PHONEMES[0]), record('bob', PHONEMES[0]))
+        self.load(record('local', PHONEMES[1]), record('ann', PHONEMES[1]), mode = 'replace')
+
+        self.assertEqual(self.exported(), {'local': {PHONEMES[1]: None}, 'ann': {PHONEMES[1]: None},
+                                           'bob': {PHONEMES[0]: None}})
+
+
+    def test_replace_keeps_lines_of_earlier_batches(self):
+        self.load(record('local', PHONEMES[3]), record('ann', PHONEMES[3]))
+
+        summary = self.load(record('ann', PHONEMES[0]), record('local', PHONEMES[0]),
+                            record('ann', PHONEMES[1]), record('local', PHONEMES[1]),
+                            record('ann', PHONEMES[2]), mode = 'replace')
+
+        self.assertEqual(summary['imported'], 5)
+        self.assertEqual(self.exported(), {'local': dict.fromkeys(PHONEMES[:2]), 'ann': dict.fromkeys(PHONEMES[:3])})
+
+
+    def test_each_import_replaces_again(self):
+        self.load(record('ann', PHONEMES[0]), record('bob', PHONEMES[0]), record('cid', PHONEMES[0]), mode = 'replace')
+        self.load(record('bob', PHONEMES[1]), mode = 'replace')
+
+        self.assertEqual(self.exported(), {'ann': {PHONEMES[0]: None}, 'bob': {PHONEMES[1]: None}, 'cid': {PHONEMES[0]: None}})
+
+
+    def test_bad_line_rejects_that_learner_only(self):
+        summary = self.load(record('ann', PHONEMES[0]), record('bob', 'zz'), record('cid', PHONEMES[1]))
+
+        self.assertEqual((summary['imported'], summary['rejected']), (2, 1))
+        self.assertEqual(summary['errors'][0]['learner'], 'bob')
+        self.assertEqual(set(self.exported()), {'ann', 'cid'})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Testing module for logic.py
+
+'TestHomophoneParity' replays random answer sequences for every homophone of the content against both
+'check_homophone_answer()' and the set-based version it replaced ('set_based_answer()' below, kept as the reference),
+and expects the same verdicts.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import random
+from fastapi import HTTPException
+import catalogue
+import logic
+from logic import HomophoneTest, check_homophone_answer
+
+ANSWERS_PER_TEST = 12
+
+
+def set_based_test(spellings):
+    """Test record of the set-based version."""
+    return {'solution': set(spellings), 'solutions_left': set(spellings), 'amount': len(spellings),
+            'to_guess': len(spellings), 'attempts_left': 5}
+
+
+def set_based_answer(test, answer):
+    """'check_homophone_answer()' as it was before homophone tests became bitmasks."""
+    if answer in test['solutions_left']:
+        test['to_guess'] -= 1
+        test['solutions_left'].discard(answer)
+        if test['to_guess'] == 0:
+            return {'answered': 'done'}
+        return {'answered': 'correct', 'attempts_left': test['attempts_left']}
+
+    if test['attempts_left'] > 1:
+        test['attempts_left'] -= 1
+        return {'answered': 'incorrect', 'attempts_left': test['attempts_left']}
+
+    if test['to_guess'] == test['amount']:
+        return {'answered': 'failed_all', 'solution': test['solution']}
+    return {'answered': 'failed', 'solution': test['solutions_left']}
+
+
+def comparable(verdict):
+    """Solutions were sets, they are lists now: compare them as sets."""
+    if 'solution' in verdict:
+        return {**verdict, 'solution': set(verdict['solution'])}
+    return verdict
+
+
+class HomophoneTestCase(unittest.TestCase):
+    """Base class with its own ongoing tests"""
+
+    def setUp(self):
+        self.tests = {}
+        patcher = patch('logic.ONGOING_TESTS', self.tests)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+
+    def start(self, phoneme, homoph):
+        test_id = logic.new_test_id('homoph')
+        self.tests[test_id] = HomophoneTest(catalogue.current().homophone_group(phoneme, homoph))
+        return test_id
+
+
+    def answer(self, test_id, answer):
+        return check_homophone_answer({'test_id': test_id, 'answer': answer})
+
+
+
+class TestHomophoneParity(HomophoneTestCase):
+    """Test that bitmask tests answer exactly like the set-based ones"""
+
+    def test_random_answer_sequences(self):
+        rng = random.Random(42)
+        for phoneme, entry in catalogue.current().phonemes.items():
+            for homoph, spellings in entry['homophones'].items():
+                candidates = sorted(spellings) + ['wrong', 'other', '']
+                for _ in range(20):
+                    answers = [rng.choice(candidates) for _ in range(ANSWERS_PER_TEST)]
+                    with self.subTest(homoph = homoph, answers = answers):
+                        test_id = self.start(phoneme, homoph)
+                        reference = set_based_test(spellings)
+                        for answer in answers:
+                            self.assertEqual(comparable(self.answer(test_id, answer)), set_based_answer(reference, answer))
+
+
+
+class TestHomophoneAnswer(HomophoneTestCase):
+    """Test the verdicts of 'check_homophone_answer()' one by one"""
+
+    def setUp(self):
+        super().setUp()
+        self.phoneme, self.homoph = 'ɔ:', '/sɔ:/'
+        self.spellings = sorted(catalogue.current().phonemes[self.phoneme]['homophones'][self.homoph])
+        self.test_id = self.start(self.phoneme, self.homoph)
+
+
+    def test_all_found(self):
+        verdicts = [self.answer(self.test_id, spelling)['answered'] for spelling in self.spellings]
+
+        self.assertEqual(verdicts, ['correct'] * (len(self.spellings) - 1) + ['done'])
+
+
+    def test_repeated_answer_counts_as_wrong(self):
+        self.answer(self.test_id, self.spellings[0])
+
+        self.assertEqual(self.answer(self.test_id, self.spellings[0]), {'answered': 'incorrect', 'attempts_left': 4})
+
+
+    def test_failed_lists_what_is_left(self):
+        self.answer(self.test_id, self.spellings[0])
+        for _ in range(4):
+            self.answer(self.test_id, 'wrong')
+
+        self.assertEqual(self.answer(self.test_id, 'wrong'), {'answered': 'failed', 'solution': self.spellings[1:]})
+
+
+    def test_failed_all_lists_every_spelling(self):
+        for _ in range(4):
+            self.answer(self.test_id, 'wrong')
+
+        self.assertEqual(self.answer(self.test_id, 'wrong'), {'answered': 'failed_all', 'solution': self.spellings})
+
+
+    def test_unknown_and_spelling_tests_rejected(self):
+        self.tests['spell_test_1'] = {'solution': 'sea'}
+
+        for test_id in ('missing', 'spell_test_1'):
+            with self.subTest(test_id = test_id), self.assertRaises(HTTPException) as raised:
+                self.answer(test_id, 'saw')
+            self.assertEqual(raised.exception.status_code, 404)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
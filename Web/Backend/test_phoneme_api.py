@@ -0,0 +1,89 @@
+"""
+Testing module for phoneme_api.py
+
+'TestCachedAudio' checks which clip 'cached_audio()' resolves a phoneme to when the audio pack,
+the audio manifest and the files of the audio directory disagree. Everything lives in a temporary directory.
+
+"""
+
+
+import unittest
+from unittest.mock import patch
+import os
+import tempfile
+import time
+import logging
+from pathlib import Path
+import audio_pack
+import audio_pipeline
+import phoneme_api
+
+logging.getLogger('phoneme_api').disabled = True
+logging.getLogger('audio_pack').disabled = True
+logging.getLogger('audio_pipeline').disabled = True
+
+PHONEME = '/ɪə/'
+STEM = 'ɪə'
+
+
+class TestCachedAudio(unittest.TestCase):
+    """Test the pack against the processed clips of the audio manifest"""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.dir = Path(self.tempdir.name) / 'audio_repr'
+        self.dir.mkdir()
+        self.pack = Path(self.tempdir.name) / 'audio.pack'
+        for target, value in (('phoneme_api.AUDIO_DIR', self.dir), ('phoneme_api.AUDIO_PACK', self.pack),
+                              ('audio_pack._packs', {}), ('audio_pipeline._manifests', {})):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        self.addCleanup(self.close_packs)
+
+
+    def close_packs(self):
+        for pack in audio_pack._packs.values():
+            if pack is not None:
+                pack.close()
+
+
+    def clip(self, name, processed_at = None):
+        (self.dir / name).write_bytes(name.encode())
+        if processed_at is not None:
+            audio_pipeline.record(self.dir, STEM, {'file': name, 'source_file': name, 'source_format': 'mp3',
+                                                   'size': 0, 'duration': None, 'processed_at': processed_at})
+
+
+    def test_packed_choice_of_the_manifest(self):
+        self.clip(f'{STEM}.ffffffffffff.mp3', processed_at = time.time() - 60)
+        os.utime(self.dir / f'{STEM}.ffffffffffff.mp3', (time.time() - 60, time.time() - 60))
+        self.clip(f'{STEM}.0123456789ab.mp3')  #newer, and first in name order
+        audio_pack.build(self.dir, self.pack)
+
+        self.assertEqual(phoneme_api.cached_audio(PHONEME), self.dir / f'{STEM}.ffffffffffff.mp3')
+
+
+    def test_clip_processed_after_the_pack_preferred(self):
+        self.clip(f'{STEM}.0123456789ab.mp3', processed_at = time.time() - 60)
+        audio_pack.build(self.dir, self.pack)
+        self.assertEqual(phoneme_api.cached_audio(PHONEME), self.dir / f'{STEM}.0123456789ab.mp3')
+
+        self.clip(f'{STEM}.ba9876543210.mp3', processed_at = time.time() + 1)
+
+        self.assertEqual(phoneme_api.cached_audio(PHONEME), self.dir / f'{STEM}.ba9876543210.mp3')
+
+
+    def test_packed_clip_without_manifest(self):
+        self.clip(f'{STEM}.0123456789ab.mp3')
+        audio_pack.build(self.dir, self.pack)
+        (self.dir / f'{STEM}.0123456789ab.mp3').unlink()
+
+        self.assertEqual(phoneme_api.cached_audio(PHONEME), self.dir / f'{STEM}.0123456789ab.mp3')
+        self.assertIsNone(phoneme_api.cached_audio('/ʊə/'))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
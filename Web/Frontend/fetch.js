@@ -10,7 +10,14 @@ const ENDPOINTS = {
     homophones: '/homophones/',
     checkSpellAnswer: '/checkspellanswer',
     checkHomophAnswer: '/checkhomophanswer',
-    saveProgress: '/saveprogress'
+    saveProgress: '/saveprogress',
+    drill: '/drill',
+    audioEvents: '/audioevents/'
+};
+
+const DRILL_KINDS = {
+    checkSpellAnswer: 'spell',
+    checkHomophAnswer: 'homophones'
 };
 
 
@@ -120,6 +127,39 @@ export const fetchLearn = () =>
     fetchValidate({key: 'learn', type: 'object'});
 
 
+// When /learn answers with audio_status 'pending' the audio is still being fetched: the server pushes one
+// 'audio_ready' or 'audio_unavailable' event carrying {audio_url, audio_duration, audio_size} once it's done
+export const waitForAudio = (phoneme, timeout = 65000) => new Promise(resolve => {
+    const unavailable = {audio_url: null, audio_duration: null, audio_size: null};
+    if (typeof EventSource === 'undefined') {
+        resolve(unavailable);
+        return;
+    }
+
+    const source = new EventSource(createURL('audioEvents', encodeURIComponent(phoneme)));
+    const finish = (audio) => {
+        clearTimeout(timer);
+        source.close();
+        resolve(audio);
+    };
+    const timer = setTimeout(() => finish(unavailable), timeout);
+
+    const onEvent = (event) => {
+        try {
+            finish({...unavailable, ...JSON.parse(event.data)});
+        } catch (err) {
+            finish(unavailable);
+        }
+    };
+    source.addEventListener('audio_ready', onEvent);
+    source.addEventListener('audio_unavailable', onEvent);
+    // A dropped stream is reopened by EventSource itself; only give up if it won't be (e.g. a 404)
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) finish(unavailable);
+    };
+});
+
+
 export const fetchSpell = (phoneme) =>
     fetchValidate({key: 'spell', path_param : encodeURIComponent(phoneme), type: 'array'});
 
@@ -143,6 +183,120 @@ export const submitAnswer = (test_id, answer, endpoint, idempotencyKey) =>
     });
 
 
+class DrillChannel {
+    constructor(timeout = 5000) {
+        this.timeout = timeout;
+        this.socket = null;
+        this.session = null;
+        this.seq = 0;
+        this.pending = new Map();
+        this.opening = null;
+        // Set once the socket can't be opened: the rest of the session goes over plain POSTs
+        this.unavailable = !('WebSocket' in window);
+    }
+
+    get available() {
+        return !this.unavailable;
+    }
+
+    open() {
+        if (this.socket?.readyState === WebSocket.OPEN) return Promise.resolve();
+        if (this.opening) return this.opening;
+
+        const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
+        const session = this.session ? `?session=${this.session}` : '';
+        const url = `${protocol}://${location.host}${API_BASE}${ENDPOINTS.drill}${session}`;
+
+        this.opening = new Promise((resolve, reject) => {
+            const socket = new WebSocket(url);
+            const timer = setTimeout(() => socket.close(), this.timeout);
+
+            socket.addEventListener('message', (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'ready') {
+                    clearTimeout(timer);
+                    this.socket = socket;
+                    this.session = message.session;
+                    this.opening = null;
+                    for (const entry of this.pending.values()) socket.send(entry.payload);
+                    resolve();
+                    return;
+                }
+                this.settle(message);
+            });
+
+            socket.addEventListener('close', () => {
+                clearTimeout(timer);
+                if (this.socket === socket) {
+                    this.socket = null;
+                    // Answers still waiting for a verdict are resent (same seq) once reconnected
+                    if (this.pending.size && !this.unavailable) setTimeout(() => this.open().catch(() => {}), 500);
+                }
+                if (this.opening) {
+                    this.opening = null;
+                    this.unavailable = true;
+                    reject(new APIError('Drill connection failed', {kind: 'network', retry: true}));
+                }
+            });
+        });
+        return this.opening;
+    }
+
+    settle(message) {
+        const entry = this.pending.get(message.seq);
+        if (!entry) return;
+        this.pending.delete(message.seq);
+        clearTimeout(entry.timer);
+
+        if (message.error) {
+            const {status, detail} = message.error;
+            const retry = status >= 500 || status === 429;
+            entry.reject(new APIError(`${status} - ${detail}`, {status, kind: 'http', retry, detail}));
+            return;
+        }
+        entry.resolve(message.verdict);
+    }
+
+    // 'fallback' checks the same answer over HTTP, used right away if the socket can't be opened
+    async check(kind, test_id, answer, fallback) {
+        const seq = ++this.seq;
+        const payload = JSON.stringify({seq, kind, test_id, answer});
+
+        const verdict = new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                this.pending.delete(seq);
+                reject(new APIError('Request timed out', {kind: 'timeout', retry: true}));
+            }, this.timeout);
+            this.pending.set(seq, {payload, resolve, reject, timer});
+        });
+
+        try {
+            await this.open();
+        } catch (err) {
+            // Never sent, so checking it over HTTP can't check it twice
+            clearTimeout(this.pending.get(seq)?.timer);
+            this.pending.delete(seq);
+            return fallback();
+        }
+        // If the connection drops now, the answer is resent with the same seq once it is back, so it is never checked twice
+        this.socket.send(payload);
+        return verdict;
+    }
+}
+
+const drill = new DrillChannel();
+
+
+// Answers go through the drill WebSocket; plain POSTs are used from the first time it can't be opened
+export const checkAnswer = (test_id, answer, endpoint, idempotencyKey) => {
+    const post = () => submitAnswer(test_id, answer, endpoint, idempotencyKey);
+    if (drill.available) {
+        return drill.check(DRILL_KINDS[endpoint], test_id, answer, post);
+    }
+    return post();
+};
+
+
 export const saveProgress = (new_phoneme, audio_path, endpoint) =>
     fetchValidate({
         key: endpoint, 
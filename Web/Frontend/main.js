@@ -4,9 +4,10 @@ import {
     fetchReviewSpell, 
     fetchReviewHomoph, 
     fetchLearn, 
+    waitForAudio,
     fetchSpell, 
     fetchHomophones,
-    submitAnswer,
+    checkAnswer,
     saveProgress
 } from './fetch.js';
 
@@ -263,6 +264,16 @@ async function learn(div) {
     const audioBtn = playAudio(phoneme);
 
     intro.append(audioBtn);
+
+    if (phoneme.audio_status === 'pending') {
+        waitForAudio(phoneme.phoneme).then(audio => {
+            Object.assign(phoneme, audio, {audio_status: audio.audio_url ? 'ready' : 'unavailable'});
+            if (phoneme.phoneme in newSoundToStoreInProgress) {
+                newSoundToStoreInProgress[phoneme.phoneme] = phoneme.audio_url;
+            }
+            audioBtn.replaceWith(playAudio(phoneme));
+        });
+    }
     
     const introPatterns = document.createElement('h3');
     introPatterns.textContent = 'The most common spelling patterns for this phoneme are:';
@@ -305,6 +316,12 @@ async function learn(div) {
 function playAudio(phoneme) {               
     const btn = document.createElement('button');
     
+    if (phoneme.audio_status === 'pending') {
+        btn.textContent = '⏳ Loading audio';
+        btn.disabled = true;
+        return btn;
+    }
+
     if (!phoneme.audio_url) {
         btn.textContent = 'Audio unavailable';
         btn.disabled = true;
@@ -451,7 +468,7 @@ async function testNoHelp(word, retry, index, host) {
             btn.disabled = true;   
 
             try {
-                const check = await submitAnswer(word.test_id, answer, 'checkSpellAnswer', idempotencyKey);
+                const check = await checkAnswer(word.test_id, answer, 'checkSpellAnswer', idempotencyKey);
                 
                 if (check.answered === 'correct') {
                     input.disabled = true;
@@ -530,7 +547,7 @@ async function testHelp(word, host) {
             btn.disabled = true;
                 
             try {
-                const check = await submitAnswer(word.test_id, answer, 'checkSpellAnswer', idempotencyKey);
+                const check = await checkAnswer(word.test_id, answer, 'checkSpellAnswer', idempotencyKey);
 
                 if (check.answered === 'correct') {
                     input.disabled = true;
@@ -677,7 +694,7 @@ async function testHomophone(homoph, index, host) {
             btn.disabled = true;
 
             try {    
-                const check = await submitAnswer(homoph.test_id, answer, 'checkHomophAnswer', idempotencyKey);
+                const check = await checkAnswer(homoph.test_id, answer, 'checkHomophAnswer', idempotencyKey);
 
                 if (check.answered === 'correct') {
                     pending = false;